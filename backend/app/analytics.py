@@ -0,0 +1,151 @@
+"""Training-load analytics over the daily rollups, vectorized with NumPy.
+
+The daily session-RPE load (duration x RPE, summed per day) is read from
+``DailyTrainingRollup`` straight off the DBAPI cursor into a dense array with
+one slot per day, zero on rest days. Every indicator is then computed over
+the whole history with array operations:
+
+- acute (7 days) and chronic (28 days) rolling mean load and their ratio,
+  the acute:chronic workload ratio (ACWR);
+- fitness (42 days) and fatigue (7 days) as exponentially weighted moving
+  averages, and form = fitness - fatigue;
+- Foster's monotony (mean / standard deviation of the last 7 daily loads)
+  and strain (weekly load x monotony).
+
+Days before the first session count as rest days. Ratios that divide by
+zero are ``NaN`` and serialized as ``null``.
+"""
+from __future__ import annotations
+
+from datetime import date
+from itertools import chain
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlmodel import Session
+
+from .models import DailyTrainingRollup
+from .timeseries import UNIX_EPOCH_JULIAN_DAY
+
+ACUTE_DAYS = 7
+CHRONIC_DAYS = 28
+FITNESS_DAYS = 42
+FATIGUE_DAYS = 7
+MONOTONY_DAYS = 7
+
+# Largest weight growth allowed inside one EWMA chunk before rescaling.
+_MAX_CHUNK_GROWTH = 1e12
+
+
+class LoadSeries(NamedTuple):
+    days: np.ndarray  # datetime64[D]
+    load: np.ndarray
+    acute_load: np.ndarray
+    chronic_load: np.ndarray
+    acwr: np.ndarray
+    fitness: np.ndarray
+    fatigue: np.ndarray
+    form: np.ndarray
+    monotony: np.ndarray
+    strain: np.ndarray
+
+
+def daily_load(session: Session, end: date) -> Tuple[np.datetime64, np.ndarray]:
+    """Return the first day of history and the dense daily load up to ``end``.
+
+    Days without a session are zero. An empty history starts at ``end``.
+    """
+
+    rollup = DailyTrainingRollup.__table__.c
+    query = (
+        select(cast(func.julianday(rollup.day) - UNIX_EPOCH_JULIAN_DAY, Integer), rollup.training_load)
+        .where(rollup.day <= end, rollup.sessions > 0)
+        .order_by(rollup.day)
+    )
+    result = session.connection().execute(query)
+    rows = result.cursor.fetchall()
+    result.close()
+
+    end_day = np.datetime64(end, "D")
+    if not rows:
+        return end_day, np.zeros(1)
+    pairs = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=2 * len(rows)).reshape(-1, 2)
+    first_day = np.datetime64(int(pairs[0, 0]), "D")
+    load = np.zeros(int((end_day - first_day).astype(np.int64)) + 1)
+    load[pairs[:, 0] - pairs[0, 0]] = pairs[:, 1]
+    return first_day, load
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum of the trailing ``window`` values at each index, zeros before the start."""
+
+    totals = np.concatenate(([0.0], np.cumsum(values)))
+    return totals[1:] - totals[np.maximum(np.arange(1, len(totals)) - window, 0)]
+
+
+def ewma(values: np.ndarray, span: int) -> np.ndarray:
+    """Exponentially weighted moving average with ``alpha = 2 / (span + 1)``.
+
+    The recurrence ``y[t] = alpha * x[t] + (1 - alpha) * y[t - 1]`` (with
+    ``y[-1] = 0``) is evaluated in closed form per chunk: inside a chunk
+    starting after ``y0``, ``y[i] = d**i * (d * y0 + alpha * cumsum(x[k] / d**k))``
+    with ``d = 1 - alpha``. Chunks are sized so ``1 / d**k`` stays below
+    ``_MAX_CHUNK_GROWTH``, which keeps the cumulative sum accurate.
+    """
+
+    alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    chunk = max(1, int(np.log(_MAX_CHUNK_GROWTH) / -np.log(decay)))
+    powers = decay ** np.arange(min(chunk, len(values)))
+    result = np.empty(len(values))
+    level = 0.0
+    for offset in range(0, len(values), chunk):
+        block = values[offset : offset + chunk]
+        scale = powers[: len(block)]
+        result[offset : offset + len(block)] = scale * (decay * level + alpha * np.cumsum(block / scale))
+        level = result[offset + len(block) - 1]
+    return result
+
+
+def _divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    result = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=result, where=denominator > 1e-9)
+    return result
+
+
+def load_series(session: Session, start: date, end: date) -> LoadSeries:
+    """Compute every load indicator over the history and keep ``start``..``end``."""
+
+    first_day, load = daily_load(session, end)
+    # Pad with rest days when the range starts before the history does.
+    missing = int((first_day - np.datetime64(start, "D")).astype(np.int64))
+    if missing > 0:
+        load = np.concatenate((np.zeros(missing), load))
+        first_day -= missing
+
+    acute = rolling_sum(load, ACUTE_DAYS) / ACUTE_DAYS
+    chronic = rolling_sum(load, CHRONIC_DAYS) / CHRONIC_DAYS
+    fitness = ewma(load, FITNESS_DAYS)
+    fatigue = ewma(load, FATIGUE_DAYS)
+
+    weekly = rolling_sum(load, MONOTONY_DAYS)
+    # n * sum(x^2) - sum(x)^2 is exact on integer loads, so a flat week gives
+    # a zero deviation rather than rounding noise.
+    spread = np.maximum(MONOTONY_DAYS * rolling_sum(load * load, MONOTONY_DAYS) - weekly * weekly, 0.0)
+    monotony = _divide(weekly, np.sqrt(spread))
+
+    window = slice(int((np.datetime64(start, "D") - first_day).astype(np.int64)), len(load))
+    days = first_day + np.arange(len(load))
+    return LoadSeries(
+        days=days[window],
+        load=load[window],
+        acute_load=acute[window],
+        chronic_load=chronic[window],
+        acwr=_divide(acute, chronic)[window],
+        fitness=fitness[window],
+        fatigue=fatigue[window],
+        form=(fitness - fatigue)[window],
+        monotony=monotony[window],
+        strain=(weekly * monotony)[window],
+    )
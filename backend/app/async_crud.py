@@ -0,0 +1,28 @@
+"""Async entry points over the read helpers of ``crud``, for ``app.loadtest``.
+
+Each function runs its ``crud`` counterpart through ``AsyncSession.run_sync``:
+the query code is shared, but it executes on the event loop inside a
+greenlet and awaits the aiosqlite driver. The routes do not use them: under
+``app.loadtest`` this path serves fewer requests per second than blocking
+sessions in the threadpool (see the README), so it is kept only to measure
+the difference again.
+"""
+from __future__ import annotations
+
+from typing import List
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from . import crud, schemas
+
+
+async def get_dashboard_summary(session: AsyncSession) -> schemas.DashboardSummary:
+    return await session.run_sync(crud.get_dashboard_summary)
+
+
+async def get_recent_sessions(session: AsyncSession, limit: int = 5) -> List[schemas.SessionSummary]:
+    return await session.run_sync(crud.get_recent_sessions, limit)
+
+
+async def get_calendar(session: AsyncSession, month: int, year: int) -> schemas.CalendarMonth:
+    return await session.run_sync(crud.get_calendar, month, year)
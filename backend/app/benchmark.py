@@ -0,0 +1,213 @@
+"""Per-function benchmarks of ``crud`` on synthetic histories.
+
+For every scale (in athlete-years, see ``app.synthetic``) a database is
+generated once under ``data/bench/`` and reused by later runs. Each function
+is then timed over ``--repeat`` calls; the report gives p50/p95 latency, the
+SQL statements issued by one call and the peak Python memory of one call.
+Results are written as JSON so two commits can be compared::
+
+    python -m app.benchmark --scales 1 10 --output before.json
+    python -m app.benchmark --scales 1 10 --output after.json --compare before.json
+
+Functions in ``WRITES`` run on a connection whose transaction is rolled back
+after each call: their commits do not reach the file, so the database
+stays the same from one run to the next. They are timed without the final
+COMMIT.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from . import crud, schemas, synthetic
+from .database import DB_PATH, init_db, record_statements, sqlite_engine
+from .models import DailyHabitLog, MetricLog, SessionLog
+
+BENCH_DIR = DB_PATH.parent / "bench"
+# Functions that commit.
+WRITES = {"log_session"}
+
+
+def _functions() -> Dict[str, Callable[[Session], Any]]:
+    today = date.today()
+    payload = schemas.SessionLogIn(workout_id=1, duration_minutes=45, rpe=7, energy_level="Solide")
+    return {
+        "get_dashboard_summary": crud.get_dashboard_summary,
+        "build_dashboard_summary": crud.build_dashboard_summary,
+        "get_calendar": lambda session: crud.get_calendar(session, today.month, today.year),
+        "list_workouts": crud.list_workouts,
+        "get_recent_sessions": lambda session: crud.get_recent_sessions(session, limit=20),
+        "log_session": lambda session: crud.log_session(session, payload),
+    }
+
+
+def database_for(scale: float, metric_interval: int = 60, rebuild: bool = False) -> Engine:
+    """Return an engine on the synthetic database of ``scale``, generating it if needed."""
+
+    path = BENCH_DIR / f"sf-{scale:g}-{metric_interval}s.db"
+    if rebuild:
+        for suffix in ("", "-wal", "-shm"):
+            Path(f"{path}{suffix}").unlink(missing_ok=True)
+    exists = path.exists()
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    bind = sqlite_engine(path)
+    if exists:
+        # Bring a database generated by an earlier version to the current schema.
+        init_db(bind)
+    else:
+        synthetic.populate(bind, scale, metric_interval=metric_interval)
+    return bind
+
+
+def _row_counts(bind: Engine) -> Dict[str, int]:
+    with Session(bind) as session:
+        return {
+            model.__tablename__: session.exec(select(func.count()).select_from(model)).one()
+            for model in (SessionLog, DailyHabitLog, MetricLog)
+        }
+
+
+@contextmanager
+def _session(bind: Engine, rollback: bool) -> Iterator[Session]:
+    """Yield a session on ``bind``; with ``rollback``, undo everything it commits on exit."""
+
+    if not rollback:
+        with Session(bind) as session:
+            yield session
+        return
+    with bind.connect() as connection:
+        transaction = connection.begin()
+        try:
+            # Joined to an outer transaction, ``session.commit`` leaves it open.
+            with Session(bind=connection) as session:
+                yield session
+        finally:
+            transaction.rollback()
+
+
+def measure(
+    bind: Engine, call: Callable[[Session], Any], repeat: int, warmup: int = 3, rollback: bool = False
+) -> Dict[str, float]:
+    """Time ``call`` on fresh sessions and return its latency, query and memory figures.
+
+    With ``rollback``, the writes of every call are rolled back.
+    """
+
+    for _ in range(warmup):
+        with _session(bind, rollback) as session:
+            call(session)
+
+    latencies: List[float] = []
+    for _ in range(repeat):
+        with _session(bind, rollback) as session:
+            started = time.perf_counter()
+            call(session)
+            latencies.append(time.perf_counter() - started)
+
+    # Statements and memory are measured on separate calls: tracing would
+    # distort the timings above.
+    with _session(bind, rollback) as session, record_statements(bind) as statements:
+        call(session)
+    tracemalloc.start()
+    try:
+        with _session(bind, rollback) as session:
+            call(session)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[min(len(latencies) - 1, round(0.95 * (len(latencies) - 1)))] * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "queries": len(statements),
+        "peak_kib": peak / 1024,
+    }
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scales: List[float], repeat: int, metric_interval: int = 60, rebuild: bool = False) -> Dict[str, Any]:
+    """Benchmark every function at every scale and return the JSON-ready report."""
+
+    report: Dict[str, Any] = {
+        "commit": _commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "repeat": repeat,
+        "scales": {},
+    }
+    for scale in scales:
+        bind = database_for(scale, metric_interval, rebuild)
+        report["scales"][f"{scale:g}"] = {
+            "rows": _row_counts(bind),
+            "functions": {
+                name: measure(bind, call, repeat, rollback=name in WRITES) for name, call in _functions().items()
+            },
+        }
+        bind.dispose()
+    return report
+
+
+def _print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> None:
+    for scale, result in report["scales"].items():
+        rows = ", ".join(f"{table} {count}" for table, count in result["rows"].items())
+        print(f"scale {scale} ({rows})")
+        print(f"  {'function':<24} {'p50 ms':>9} {'p95 ms':>9} {'queries':>8} {'peak KiB':>9}")
+        previous = (baseline or {}).get("scales", {}).get(scale, {}).get("functions", {})
+        for name, stats in result["functions"].items():
+            line = (
+                f"  {name:<24} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f}"
+                f" {stats['queries']:>8d} {stats['peak_kib']:>9.1f}"
+            )
+            before = previous.get(name)
+            if before:
+                line += (
+                    f"   p50 x{stats['p50_ms'] / before['p50_ms']:.2f}"
+                    f", queries {before['queries']} -> {stats['queries']}"
+                )
+            print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1.0], help="athlete-years per database")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--metric-interval", type=int, default=60, help="seconds between heart-rate samples")
+    parser.add_argument("--rebuild", action="store_true", help="regenerate the synthetic databases")
+    parser.add_argument("--output", type=Path, help="write the results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    report = run(args.scales, args.repeat, args.metric_interval, args.rebuild)
+    _print_report(report, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
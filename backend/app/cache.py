@@ -0,0 +1,270 @@
+"""In-process caches invalidated by committed writes.
+
+Every table has a version counter that is bumped when a session commits a
+write to it. ORM flushes and Core statements run through ``Session.execute``
+are tracked automatically; code writing through a bare connection must call
+``record_writes`` in its transaction and ``bump`` after the commit. Cached
+values are keyed by the versions of the tables they were computed from, so a
+commit makes the stale entries unreachable. Listeners registered with
+``add_listener`` are told which tables changed, to rebuild eagerly what would
+otherwise be recomputed on the next read.
+
+The counters also live in the ``TableVersion`` table, incremented in the
+transaction of every write, so commits from other processes (the command
+line tools, another server worker) are seen too: ``poll_writes`` bumps the
+tables whose stored version moved past the last one this process knows of.
+``VersionedCache.versions`` calls ``check_writes`` on the reading session's
+connection first, which only runs ``poll_writes`` when ``PRAGMA
+data_version`` says another connection committed since that connection
+last looked, so a cached value is never served past a committed write. The
+server also polls in the background, only to rebuild snapshots early.
+"""
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict, defaultdict
+from itertools import chain
+from typing import Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence, Set, Tuple, TypeVar
+
+from sqlalchemy import event, select, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .models import TableVersion
+
+T = TypeVar("T")
+
+_WRITTEN_TABLES = "cache.written_tables"
+_STORED_VERSIONS = "cache.stored_versions"
+_DATABASE_FILE = "cache.database_file"
+_DATA_VERSION = "cache.data_version"
+
+_stored = TableVersion.__table__
+
+_lock = threading.Lock()
+_table_versions: Dict[str, int] = defaultdict(int)
+# Last ``TableVersion`` seen by this process, by database file and table.
+_stored_versions: Dict[Tuple[str, str], int] = {}
+_caches: List["VersionedCache"] = []
+_listeners: List[Callable[[FrozenSet[str]], None]] = []
+
+
+def table_versions(tables: Sequence[str]) -> Tuple[int, ...]:
+    """Return the current version of each table in ``tables``."""
+
+    with _lock:
+        return tuple(_table_versions[table] for table in tables)
+
+
+def bump(*tables: str) -> None:
+    """Invalidate every cached value computed from ``tables``."""
+
+    with _lock:
+        for table in tables:
+            _table_versions[table] += 1
+        listeners = list(_listeners)
+    changed = frozenset(tables)
+    for listener in listeners:
+        listener(changed)
+
+
+def add_listener(listener: Callable[[FrozenSet[str]], None]) -> None:
+    """Call ``listener`` with the written tables after every ``bump``, in the committing thread."""
+
+    with _lock:
+        _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[FrozenSet[str]], None]) -> None:
+    with _lock:
+        _listeners.remove(listener)
+
+
+def _database_file(connection: Connection) -> str:
+    """Path of the main database of ``connection``, the same for read-only and writer connections."""
+
+    info = connection.info
+    if _DATABASE_FILE not in info:
+        info[_DATABASE_FILE] = next(
+            row.file for row in connection.execute(text("PRAGMA database_list")) if row.name == "main"
+        )
+    return info[_DATABASE_FILE]
+
+
+def _remember(database: str, versions: Iterable[Tuple[str, int]]) -> Set[str]:
+    """Store the newest known version of each table and return the tables that moved."""
+
+    moved = set()
+    with _lock:
+        for table, version in versions:
+            if version > _stored_versions.get((database, table), 0):
+                _stored_versions[(database, table)] = version
+                moved.add(table)
+    return moved
+
+
+def record_writes(connection: Connection, tables: Iterable[str]) -> Dict[str, int]:
+    """Count one write to each of ``tables`` in ``TableVersion``, in the current transaction.
+
+    Returns the new stored version of each table.
+    """
+
+    statement = insert(_stored).values([{"name": table, "version": 1} for table in sorted(tables)])
+    statement = statement.on_conflict_do_update(
+        index_elements=[_stored.c.name], set_={"version": _stored.c.version + 1}
+    ).returning(_stored.c.name, _stored.c.version)
+    return dict(connection.execute(statement).all())
+
+
+def poll_writes(connection: Connection) -> FrozenSet[str]:
+    """Bump the tables written by other processes since the last poll and return them."""
+
+    database = _database_file(connection)
+    moved = frozenset(_remember(database, connection.execute(select(_stored.c.name, _stored.c.version)).all()))
+    if moved:
+        bump(*moved)
+    return moved
+
+
+def check_writes(connection: Connection) -> FrozenSet[str]:
+    """Run ``poll_writes`` if another connection committed since ``connection`` last checked.
+
+    ``PRAGMA data_version`` changes on a connection whenever another
+    connection commits to its database, so in the common case this costs
+    one statement and reads no table.
+    """
+
+    data_version = connection.exec_driver_sql("PRAGMA data_version").scalar()
+    if connection.info.get(_DATA_VERSION) == data_version:
+        return frozenset()
+    moved = poll_writes(connection)
+    connection.info[_DATA_VERSION] = data_version
+    return moved
+
+
+def _written_tables(session: Session) -> Set[str]:
+    return session.info.setdefault(_WRITTEN_TABLES, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_tables(session: Session, flush_context) -> None:
+    written = _written_tables(session)
+    for instance in chain(session.new, session.dirty, session.deleted):
+        table = getattr(type(instance), "__tablename__", None)
+        if table:
+            written.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_executed_tables(orm_execute_state: ORMExecuteState) -> None:
+    if orm_execute_state.is_select:
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is not None:
+        _written_tables(orm_execute_state.session).add(table.name)
+
+
+@event.listens_for(Session, "before_commit")
+def _store_written_tables(session: Session) -> None:
+    # Commit flushes after this event; flush first so every write is counted.
+    session.flush()
+    written = session.info.get(_WRITTEN_TABLES)
+    if written:
+        connection = session.connection()
+        session.info[_STORED_VERSIONS] = (_database_file(connection), record_writes(connection, written))
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_committed_tables(session: Session) -> None:
+    written = session.info.pop(_WRITTEN_TABLES, None)
+    stored = session.info.pop(_STORED_VERSIONS, None)
+    if stored:
+        # Our own writes are bumped below, the poller need not bump them again.
+        database, versions = stored
+        _remember(database, versions.items())
+    if written:
+        bump(*written)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _forget_rolled_back_tables(session: Session, previous_transaction) -> None:
+    session.info.pop(_WRITTEN_TABLES, None)
+    session.info.pop(_STORED_VERSIONS, None)
+
+
+class VersionedCache:
+    """Bounded LRU cache whose entries expire when ``tables`` are written."""
+
+    def __init__(self, name: str, *tables: str, maxsize: int = 128) -> None:
+        self.name = name
+        self.tables = tables
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def versions(self, session: Session) -> Tuple[int, ...]:
+        """Return the current versions of ``tables``, to pass to ``get``.
+
+        Writes committed by other processes are checked for first, on the
+        connection ``session`` reads from.
+        """
+
+        check_writes(session.connection())
+        return table_versions(self.tables)
+
+    def get(
+        self,
+        session: Session,
+        key: Hashable,
+        compute: Callable[[], T],
+        versions: Optional[Tuple[int, ...]] = None,
+    ) -> T:
+        """Return the cached value for ``key`` or compute and store it.
+
+        ``compute`` must only read data loaded after the table versions were
+        taken, otherwise a commit in between would store a stale value under
+        the new versions. By default they are taken here; a caller that loads
+        the data before calling ``get`` passes ``versions(session)`` read
+        first.
+        """
+
+        if versions is None:
+            versions = self.versions(session)
+        full_key = (id(session.get_bind()), key, versions)
+        with self._lock:
+            if full_key in self._entries:
+                self.hits += 1
+                self._entries.move_to_end(full_key)
+                return self._entries[full_key]  # type: ignore[return-value]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[full_key] = value
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def all_stats() -> Dict[str, Dict[str, int]]:
+    """Return hit/miss counters and occupancy of every cache, by name."""
+
+    return {cache.name: cache.stats() for cache in _caches}
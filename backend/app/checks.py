@@ -0,0 +1,1302 @@
+"""Self-checks for the performance guarantees of the data layer.
+
+Run with ``python -m app.checks``. Every check builds a throwaway in-memory
+database, so the real ``data/sport.db`` is never touched.
+"""
+from __future__ import annotations
+
+import asyncio
+import csv
+import gzip
+import io
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+from starlette.concurrency import run_in_threadpool
+
+from . import (
+    cache,
+    crud,
+    export,
+    heatmap,
+    ingest,
+    instrumentation,
+    main,
+    refresh,
+    rollups,
+    schemas,
+    windows,
+)
+from .database import init_db, record_statements, sqlite_engine
+from .migrations import upgrade
+from .models import (
+    DEFAULT_ATHLETE_ID,
+    Athlete,
+    DailyHabitLog,
+    Exercise,
+    ExerciseVolume,
+    MetricLog,
+    MetricRollup,
+    ProgramSchedule,
+    SessionLog,
+    SetLog,
+    WorkoutExercise,
+    WorkoutTemplate,
+)
+
+# Tables that grow with the athlete's history or are read on every request.
+INDEXED_TABLES = {
+    "activityrun",
+    "dailyhabitlog",
+    "dailytrainingrollup",
+    "exercisevolume",
+    "metriclog",
+    "metricrollup",
+    "programschedule",
+    "sessionlog",
+    "setlog",
+    "workoutexercise",
+}
+
+
+_database_names = itertools.count()
+
+
+def memory_engines() -> Tuple[Engine, Engine]:
+    """Return a setup engine and a pooled route engine bound to one private in-memory database."""
+
+    url = f"file:checks-{next(_database_names)}?mode=memory&cache=shared&uri=true"
+    # The static pool keeps one connection open, which keeps the database alive.
+    engine = create_engine(
+        f"sqlite:///{url}",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    SQLModel.metadata.create_all(engine)
+    upgrade(engine)
+    # Pooled like the server's readers, so connections keep their ``PRAGMA data_version``.
+    pooled = _pooled_engine(f"sqlite:///{url}")
+    return engine, pooled
+
+
+def _pooled_engine(url: str, **options: Any) -> Engine:
+    """Engine with a single pooled connection, like the server's writer."""
+
+    return create_engine(
+        url, connect_args={"check_same_thread": False}, poolclass=QueuePool, pool_size=1, max_overflow=0, **options
+    )
+
+
+def _call_route(bind: Engine, route: Callable[..., Any], **kwargs: Any) -> Any:
+    with Session(bind, expire_on_commit=False) as session:
+        return route(session=session, **kwargs)
+
+
+def _populate_workouts(engine: Engine, count: int) -> None:
+    with Session(engine) as session:
+        exercises = [
+            Exercise(
+                name=f"Exercice {index}",
+                category="Force",
+                primary_muscles="Quadriceps",
+                instructions="Contrôle la descente.",
+            )
+            for index in range(6)
+        ]
+        session.add_all(exercises)
+        session.flush()
+        for index in range(count):
+            template = WorkoutTemplate(
+                title=f"Séance {index}",
+                description="Séance générée",
+                difficulty="Intermédiaire",
+                focus_area=("Force", "Cardio", "Mobilité")[index % 3],
+                estimated_duration=45,
+            )
+            session.add(template)
+            session.flush()
+            for sequence in range(1, 4):
+                exercise = exercises[(index + sequence) % len(exercises)]
+                session.add(
+                    WorkoutExercise(
+                        workout_id=template.id,
+                        exercise_id=exercise.id,
+                        sequence=sequence,
+                        sets=4,
+                        reps="8",
+                        rest_seconds=90,
+                    )
+                )
+        session.commit()
+
+
+def _populate_history(engine: Engine, days: int) -> None:
+    today = date.today()
+    with Session(engine) as session:
+        workout_ids = session.exec(select(WorkoutTemplate.id).order_by(WorkoutTemplate.id)).all()
+        for day_of_week in (0, 2, 4):
+            session.add(ProgramSchedule(day_of_week=day_of_week, workout_id=workout_ids[day_of_week], focus="Force"))
+        for delta in range(days):
+            day = today - timedelta(days=delta)
+            session.add(
+                DailyHabitLog(day=day, sleep_hours=7.5, water_intake_liters=2.5, mood="Motivé", readiness_score=80)
+            )
+            session.add(
+                MetricLog(
+                    metric="Variabilité HRV",
+                    value=78.0,
+                    unit="ms",
+                    logged_at=datetime.combine(day, datetime.min.time()),
+                )
+            )
+        session.commit()
+        for delta in range(0, days, 2):
+            crud.log_session(
+                session,
+                schemas.SessionLogIn(
+                    workout_id=workout_ids[delta % len(workout_ids)],
+                    duration_minutes=45,
+                    rpe=7,
+                    energy_level="Bonne",
+                    performed_at=datetime.combine(today - timedelta(days=delta), datetime.min.time()),
+                ),
+            )
+
+
+def _get_request(path: str, **headers: str) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": path,
+            "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+        }
+    )
+
+
+def _count_workout_statements(template_count: int) -> int:
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, template_count)
+    with record_statements(pooled) as statements:
+        response = _call_route(pooled, main.read_workouts, request=_get_request("/api/workouts"))
+    workouts = json.loads(response.body)
+    assert len(workouts) == template_count
+    assert all(len(workout["exercises"]) == 3 for workout in workouts)
+    return len(statements)
+
+
+def check_workout_query_count() -> None:
+    """``/api/workouts`` issues a fixed number of statements."""
+
+    small = _count_workout_statements(3)
+    large = _count_workout_statements(3000)
+    assert small == large, f"/api/workouts ran {small} statements for 3 templates, {large} for 3000"
+
+
+def check_catalog_etag_revalidation() -> None:
+    """A matching ``If-None-Match`` gets a 304 after only the write check; writes change the ETag."""
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 3)
+
+    def get(**headers: str) -> Response:
+        return _call_route(pooled, main.read_exercises, request=_get_request("/api/exercises", **headers))
+
+    first = get()
+    etag = first.headers["etag"]
+    with record_statements(pooled) as statements:
+        revalidated = get(if_none_match=etag)
+    assert revalidated.status_code == 304, "ETag revalidation missed"
+    assert [statement for statement, _ in statements] == ["PRAGMA data_version"], "ETag revalidation read tables"
+
+    with Session(engine) as session:
+        session.add(Exercise(name="Gainage", category="Core", primary_muscles="Abdominaux", instructions="Tiens."))
+        session.commit()
+    changed = get(if_none_match=etag)
+    assert changed.status_code == 200 and changed.headers["etag"] != etag
+    assert len(json.loads(changed.body)) == 7
+
+
+# Adds an exercise from a separate process, like ``python -m app.seed``.
+_OTHER_PROCESS_WRITE = """
+from app.database import get_session
+from app.models import Exercise
+
+with get_session() as session:
+    session.add(Exercise(name="Gainage", category="Core", primary_muscles="Abdominaux", instructions="Tiens."))
+    session.commit()
+"""
+
+
+def check_cache_sees_other_processes() -> None:
+    """A commit from another process invalidates the cached catalog on the next read, without polling."""
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / "sport.db"
+        engine = sqlite_engine(path)
+        init_db(engine)
+        _populate_workouts(engine, 3)
+        pooled = _pooled_engine(f"sqlite:///{path}")
+        poller = refresh.WritePoller(pooled, interval=60)
+
+        def get() -> Response:
+            return _call_route(pooled, main.read_exercises, request=_get_request("/api/exercises"))
+
+        etag = get().headers["etag"]
+        with Session(engine) as session:
+            crud.log_session(
+                session, schemas.SessionLogIn(workout_id=1, duration_minutes=30, rpe=6, energy_level="Bonne")
+            )
+        assert not asyncio.run(poller.poll()), "Poller bumped again the tables this process wrote"
+
+        subprocess.run(
+            [sys.executable, "-c", _OTHER_PROCESS_WRITE],
+            cwd=Path(__file__).resolve().parent.parent,
+            env={**os.environ, "SPORT_DB_PATH": str(path)},
+            check=True,
+        )
+        changed = get()
+        assert changed.headers["etag"] != etag and len(json.loads(changed.body)) == 7, "Catalog stale until polled"
+        assert not asyncio.run(poller.poll()), "The read did not record the other process's write"
+        pooled.dispose()
+        engine.dispose()
+
+
+def check_metric_series_downsampling() -> None:
+    """``/api/metrics/{name}`` returns at most ``max_points`` and keeps extremes."""
+
+    engine, pooled = memory_engines()
+    start = datetime(2024, 1, 1)
+    samples = [
+        schemas.MetricLogIn(
+            metric="heart_rate",
+            value=1000.0 if minute == 3000 else 60.0 + minute % 7,
+            unit="bpm",
+            logged_at=start + timedelta(minutes=minute),
+        )
+        for minute in range(0, 7 * 24 * 60, 5)
+    ]
+    with Session(engine) as session:
+        crud.log_metrics(session, samples)
+
+    async def read(response: Response) -> bytes:
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    def call(**kwargs: Any) -> schemas.MetricSeries:
+        response = _call_route(pooled, main.read_metric_series, name="heart_rate", **kwargs)
+        return schemas.MetricSeries.parse_raw(asyncio.run(read(response)))
+
+    week = call(start=start, end=start + timedelta(days=7), max_points=100)
+    assert week.resolution_seconds == 3600 and len(week.data) == 100, "Week not downsampled from the hourly tier"
+    assert week.data[0].timestamp == start and max(point.value for point in week.data) > 100, "LTTB lost the peak"
+
+    hour = call(start=start, end=start + timedelta(hours=1), max_points=500)
+    assert hour.resolution_seconds == 0 and len(hour.data) == 12, "Short ranges should return the raw samples"
+
+
+def check_request_instrumentation() -> None:
+    """The middleware attributes statements and fetched rows to the route that ran them.
+
+    Rows are counted as they are fetched: a result read only in part counts
+    only the rows that were read.
+    """
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 3)
+    registry = instrumentation.Registry()
+
+    async def endpoint(scope, receive, send) -> None:
+        with Session(engine) as session:
+            crud.list_workouts(session)
+            session.connection().execute(select(WorkoutTemplate.id)).fetchone()
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"[]"})
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message) -> None:
+        pass
+
+    middleware = instrumentation.InstrumentationMiddleware(endpoint, registry, slow_request_ms=float("inf"))
+    route = next(route for route in main.app.routes if getattr(route, "path", None) == "/api/workouts")
+    scope = {"type": "http", "method": "GET", "path": "/api/workouts", "route": route}
+    asyncio.run(middleware(scope, receive, send))
+
+    text = registry.render()
+    labels = 'method="GET",route="/api/workouts"'
+    assert f'sport_http_requests_total{{{labels},status="200"}} 1' in text
+    assert f"sport_sql_statements_total{{{labels}}} 3" in text, "Statements not attributed to the route"
+    assert f"sport_sql_rows_fetched_total{{{labels}}} 13" in text, "Fetched rows miscounted"
+
+
+def check_bootstrap_matches_endpoints() -> None:
+    """``/api/bootstrap`` returns the five startup payloads in fewer statements than their endpoints.
+
+    A commit landing while it loads never leaves a stale dashboard in the cache.
+    """
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 6)
+    _populate_history(engine, 60)
+    today = date.today()
+    # Sessions logged at the same instant: the recent lists must break the tie alike.
+    tied_at = datetime.combine(today, datetime.min.time()) + timedelta(hours=23)
+    with Session(engine) as session:
+        for workout_id in (3, 1, 2):
+            crud.log_session(
+                session,
+                schemas.SessionLogIn(
+                    workout_id=workout_id, duration_minutes=40, rpe=6, energy_level="Bonne", performed_at=tied_at
+                ),
+            )
+    main._catalog_cache.clear()
+    with record_statements(pooled) as separate_statements:
+        separate = {
+            "dashboard": _call_route(pooled, main.read_dashboard),
+            "workouts": _call_route(pooled, main.read_workouts, request=_get_request("/api/workouts")),
+            "calendar": _call_route(pooled, main.read_calendar, month=today.month, year=today.year),
+            "exercises": _call_route(pooled, main.read_exercises, request=_get_request("/api/exercises")),
+            "recent_sessions": _call_route(pooled, main.read_recent_sessions, limit=5),
+        }
+    with record_statements(pooled) as bootstrap_statements:
+        response = _call_route(pooled, main.read_bootstrap, month=today.month, year=today.year, recent_limit=5)
+
+    bootstrap = json.loads(response.body)
+    for name, part in separate.items():
+        assert bootstrap[name] == json.loads(part.body), f"Bootstrap {name} differs from its endpoint"
+    assert len(bootstrap_statements) < len(separate_statements), (
+        f"Bootstrap ran {len(bootstrap_statements)} statements, the endpoints {len(separate_statements)}"
+    )
+
+    # A session committed once the bootstrap has loaded the rollups must not
+    # leave its dashboard cached under the versions that include the commit.
+    schedule_labels = crud._schedule_labels
+
+    def labels_after_commit(*args: Any) -> Any:
+        with Session(pooled) as session:
+            crud.log_session(
+                session, schemas.SessionLogIn(workout_id=2, duration_minutes=45, rpe=8, energy_level="Bonne")
+            )
+        return schedule_labels(*args)
+
+    crud._schedule_labels = labels_after_commit
+    try:
+        with Session(engine) as session:
+            crud.get_bootstrap(session, today.month, today.year)
+    finally:
+        crud._schedule_labels = schedule_labels
+    with Session(engine) as session:
+        assert crud.get_dashboard_summary(session) == crud.build_dashboard_summary(session), (
+            "Bootstrap cached a dashboard older than its table versions"
+        )
+
+
+def _brute_force_streak(days: Set[date], today: date) -> Tuple[int, int]:
+    current = 0
+    while today - timedelta(days=current) in days:
+        current += 1
+    longest = run = 0
+    previous = None
+    for day in sorted(days):
+        run = run + 1 if previous == day - timedelta(days=1) else 1
+        longest = max(longest, run)
+        previous = day
+    return current, longest
+
+
+def check_streak_incremental_updates() -> None:
+    """Backdated sessions merge runs correctly, in a bounded number of statements."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 1)
+    today = date.today()
+    rng = random.Random(7)
+    offsets = [offset for offset in range(120) if rng.random() < 0.7]
+    rng.shuffle(offsets)
+    logged: Set[date] = set()
+    most_statements = 0
+    with Session(engine) as session:
+        for offset in offsets:
+            day = today - timedelta(days=offset)
+            payload = schemas.SessionLogIn(
+                workout_id=1,
+                duration_minutes=30,
+                rpe=6,
+                energy_level="Bonne",
+                performed_at=datetime.combine(day, datetime.min.time()),
+            )
+            with record_statements(engine) as statements:
+                crud.log_session(session, payload)
+            most_statements = max(most_statements, len(statements))
+            logged.add(day)
+            streak = rollups.read_streak(session, today)
+            expected = _brute_force_streak(logged, today)
+            assert (streak.current_days, streak.longest_days) == expected, f"{streak} != {expected} after {day}"
+        incremental = rollups.read_streak(session, today)
+        rollups.rebuild_streaks(session)
+        session.commit()
+        assert rollups.read_streak(session, today) == incremental, "Rebuilt streak differs from the incremental one"
+    assert most_statements <= 12, f"log_session ran {most_statements} statements"
+
+
+def check_load_analytics_matches_loops() -> None:
+    """The vectorized load indicators equal a day-by-day Python computation."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 1)
+    today = date.today()
+    rng = random.Random(3)
+    loads = {today - timedelta(days=offset): rng.randint(1, 12) * 45 for offset in range(400) if rng.random() < 0.6}
+    with Session(engine) as session:
+        crud.log_sessions_bulk(
+            session,
+            [
+                schemas.SessionLogIn(
+                    workout_id=1,
+                    duration_minutes=load // 9,
+                    rpe=9,
+                    energy_level="Bonne",
+                    performed_at=datetime.combine(day, datetime.min.time()),
+                )
+                for day, load in loads.items()
+            ],
+        )
+        start = today - timedelta(days=450)
+        series = crud.get_load_analytics(session, start, today)
+
+    daily = [float(loads.get(start + timedelta(days=offset), 0)) for offset in range((today - start).days + 1)]
+    fitness = fatigue = 0.0
+    for index, load in enumerate(daily):
+        fitness += 2 / 43 * (load - fitness)
+        fatigue += 2 / 8 * (load - fatigue)
+        week = daily[max(0, index - 6) : index + 1]
+        acute = sum(week) / 7
+        chronic = sum(daily[max(0, index - 27) : index + 1]) / 28
+        deviation = (sum(value * value for value in week) / 7 - acute * acute) ** 0.5
+        expected = {
+            "acute_load": acute,
+            "acwr": acute / chronic if chronic else None,
+            "fitness": fitness,
+            "form": fitness - fatigue,
+            "monotony": acute / deviation if deviation > 1e-6 else None,
+        }
+        for name, value in expected.items():
+            actual = float(getattr(series, name)[index])
+            if value is None:
+                assert actual != actual, f"{name} should be undefined on day {index}"
+            else:
+                assert abs(actual - value) < 1e-6 * max(1.0, abs(value)), f"{name}[{index}]: {actual} != {value}"
+
+
+def check_ingest_releases_writer() -> None:
+    """A bulk import stalled on a slow client does not hold the single writer connection."""
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 1)
+    row = b'{"workout_id": 1, "duration_minutes": 30, "rpe": 6, "energy_level": "Bonne"}\n'
+
+    def log_session() -> None:
+        with Session(writer, expire_on_commit=False) as session:
+            crud.log_session(
+                session, schemas.SessionLogIn(workout_id=1, duration_minutes=45, rpe=7, energy_level="Bonne")
+            )
+
+    async def scenario() -> None:
+        stalled, resume = asyncio.Event(), asyncio.Event()
+
+        async def body():
+            yield row
+            stalled.set()
+            await resume.wait()
+            yield row
+
+        with Session(writer, expire_on_commit=False) as ingest_session:
+            task = asyncio.create_task(ingest.ingest_sessions(ingest_session, ingest.iter_ndjson(body()), 100))
+            await stalled.wait()
+            try:
+                await run_in_threadpool(log_session)
+            finally:
+                resume.set()
+                result = await task
+        assert result.inserted == 2, result
+
+    # The production writer pool: one connection, no overflow.
+    writer = _pooled_engine(pooled.url, pool_timeout=0.5)
+    asyncio.run(scenario())
+    writer.dispose()
+
+
+def check_ingest_parsers_bound_malformed_bodies() -> None:
+    """Bodies split anywhere parse like ``json.loads``; malformed ones fail without reading the rest."""
+
+    rows = [
+        {"workout_id": 1, "rpe": -7.5e-3, "notes": "Séance \U0001f4aa \"longue\""},
+        {"flag": True, "other": False, "missing": None, "nested": [1, [2, {"a": 3}]]},
+        12345678901234567890,
+        "fin",
+    ]
+    # Escaped in one body, raw UTF-8 in the other, so chunks split both.
+    array_body = json.dumps(rows).encode()
+    ndjson_body = b"\n".join(json.dumps(row, ensure_ascii=False).encode() for row in rows)
+
+    async def collect(parse: Callable[..., Any], chunks: List[bytes]) -> Tuple[List[Any], int]:
+        consumed = 0
+
+        async def body() -> Any:
+            nonlocal consumed
+            for chunk in chunks:
+                consumed += 1
+                yield chunk
+
+        return [value async for value in parse(body())], consumed
+
+    for size in (1, 2, 3, 7, 64):
+        for parse, body in ((ingest.iter_json_array, array_body), (ingest.iter_ndjson, ndjson_body)):
+            chunks = [body[offset : offset + size] for offset in range(0, len(body), size)]
+            values, _ = asyncio.run(collect(parse, chunks))
+            assert values == rows, f"{parse.__name__} misparsed a body split every {size} bytes"
+
+    # A syntax error far from the end of the buffer is reported at once.
+    garbage = [b'[{"workout_id": 1}, {"workout_id": garbage, "rpe": 7, "notes": "'] + [b"x" * 1024] * 1000
+    values, consumed = asyncio.run(collect(ingest.iter_json_array, garbage))
+    assert isinstance(values[-1], ingest.MalformedJSON) and consumed == 1, f"Read {consumed} chunks of garbage"
+
+    # An element or a line that never ends stops at MAX_ROW_SIZE.
+    chunk_count = 4 * ingest.MAX_ROW_SIZE // 4096
+    endless = [b'[{"notes": "'] + [b"x" * 4096] * chunk_count
+    values, consumed = asyncio.run(collect(ingest.iter_json_array, endless))
+    assert isinstance(values[-1], ingest.MalformedJSON) and consumed < chunk_count // 2
+    endless = [b'{"notes": "'] + [b"x" * 4096] * chunk_count + [b'"}\n{"workout_id": 2}\n']
+    values, consumed = asyncio.run(collect(ingest.iter_ndjson, endless))
+    assert len(values) == 2 and isinstance(values[0], ingest.MalformedJSON) and values[1] == {"workout_id": 2}
+
+
+def check_writes_reject_unknown_athletes() -> None:
+    """Sessions and metrics of an athlete that does not exist are refused and write nothing."""
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 3)
+    missing = 42
+    for route, payload in (
+        (
+            main.create_session,
+            schemas.SessionLogIn(
+                athlete_id=missing, workout_id=1, duration_minutes=30, rpe=6, energy_level="Bonne"
+            ),
+        ),
+        (
+            main.create_metrics,
+            [
+                schemas.MetricLogIn(metric="Variabilité HRV", value=80.0, unit="ms"),
+                schemas.MetricLogIn(athlete_id=missing, metric="Variabilité HRV", value=80.0, unit="ms"),
+            ],
+        ),
+    ):
+        try:
+            _call_route(pooled, route, payload=payload)
+        except HTTPException as exc:
+            assert exc.status_code == 422 and str(missing) in exc.detail, exc.detail
+        else:
+            raise AssertionError(f"{route.__name__} accepted athlete {missing}")
+
+    async def body() -> Any:
+        for athlete_id in (DEFAULT_ATHLETE_ID, missing, DEFAULT_ATHLETE_ID):
+            payload = {"athlete_id": athlete_id, "workout_id": 1, "duration_minutes": 30, "rpe": 6}
+            yield json.dumps({**payload, "energy_level": "Bonne"}).encode() + b"\n"
+
+    with Session(pooled) as session:
+        result = asyncio.run(ingest.ingest_sessions(session, ingest.iter_ndjson(body()), 100))
+    assert result.inserted == 2 and [error.index for error in result.errors] == [1]
+    assert result.errors[0].errors[0]["type"] == "value_error.missing_athlete"
+    with Session(engine) as session:
+        for model in (SessionLog, MetricLog):
+            orphans = session.exec(select(model).where(model.athlete_id == missing)).all()
+            assert not orphans, f"{model.__tablename__} has rows of athlete {missing}"
+        assert not session.exec(select(MetricLog)).all(), "A refused metric batch was partly written"
+
+
+def check_session_history_pagination() -> None:
+    """Keyset pages cover the filtered history once, in order, including tied timestamps."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 3)
+    rng = random.Random(5)
+    start = datetime(2024, 1, 1, 7)
+    payloads = [
+        schemas.SessionLogIn(
+            workout_id=rng.randint(1, 3),
+            duration_minutes=40,
+            rpe=rng.randint(4, 9),
+            energy_level="Bonne",
+            # Every timestamp is shared by three sessions.
+            performed_at=start + timedelta(days=index // 3),
+        )
+        for index in range(300)
+    ]
+    with Session(engine) as session:
+        crud.log_sessions_bulk(session, payloads)
+        for filters in ({}, {"workout_id": 2, "min_rpe": 6}, {"start": start + timedelta(days=30), "max_rpe": 7}):
+            expected = sorted(
+                (
+                    (payload.performed_at, index + 1)
+                    for index, payload in enumerate(payloads)
+                    if payload.workout_id == filters.get("workout_id", payload.workout_id)
+                    and filters.get("min_rpe", 1) <= payload.rpe <= filters.get("max_rpe", 10)
+                    and payload.performed_at >= filters.get("start", start)
+                ),
+                reverse=True,
+            )
+            seen: List[int] = []
+            cursor = None
+            while True:
+                page = crud.get_session_history(session, limit=7, cursor=cursor, **filters)
+                seen += [item.id for item in page.items]
+                cursor = page.next_cursor
+                if cursor is None:
+                    break
+            assert seen == [session_id for _, session_id in expected], f"Pages differ from the history for {filters}"
+
+
+def check_exercise_search() -> None:
+    """Search ignores accents and case, matches prefixes, pages, and follows catalog writes."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 1)
+    with Session(engine) as session:
+        session.add(
+            Exercise(
+                name="Élévations latérales",
+                category="Hypertrophie",
+                primary_muscles="Épaules",
+                equipment="Haltères",
+                instructions="Monte les coudes jusqu'à l'horizontale.",
+            )
+        )
+        session.commit()
+
+        def names(query: str, **kwargs: int) -> List[str]:
+            return [exercise.name for exercise in crud.search_exercises(session, query, **kwargs).items]
+
+        assert names("epaule halt") == ["Élévations latérales"], "Accents or prefixes not matched"
+        assert names('exerc" OR') == [], "User input must not be parsed as FTS5 syntax"
+        first = crud.search_exercises(session, "exercice", limit=4)
+        second = crud.search_exercises(session, "exercice", limit=4, offset=first.next_offset)
+        assert len(first.items) == 4 and len(second.items) == 2 and second.next_offset is None
+        assert not {item.id for item in first.items} & {item.id for item in second.items}, "Pages overlap"
+
+        exercise = session.exec(select(Exercise).where(Exercise.name == "Élévations latérales")).one()
+        exercise.name = "Oiseau"
+        session.add(exercise)
+        session.commit()
+        assert names("elevations") == [] and names("oiseau") == ["Oiseau"], "Index not updated"
+        session.delete(exercise)
+        session.commit()
+        assert names("oiseau") == [], "Index not updated on delete"
+
+
+def check_export_streams_every_row() -> None:
+    """CSV and NDJSON exports, gzipped or not, hold every row of the date range in order."""
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 6)
+    _populate_history(engine, 40)
+    start, end = date.today() - timedelta(days=20), date.today() - timedelta(days=5)
+    with Session(engine) as session:
+        expected = session.exec(
+            select(MetricLog.id)
+            .where(MetricLog.logged_at >= datetime.combine(start, datetime.min.time()))
+            .where(MetricLog.logged_at < datetime.combine(end, datetime.min.time()))
+            # Bounded exports follow the time index.
+            .order_by(MetricLog.logged_at, MetricLog.id)
+        ).all()
+
+    for export_format in export.ExportFormat:
+        for compress in (False, True):
+            options = dict(table=export.ExportTable.metrics, export_format=export_format, start=start, end=end)
+            body = b"".join(export.stream_export(pooled, compress=compress, **options))
+            with engine.connect() as connection:
+                assert body == b"".join(export.iter_export(connection, compress=compress, **options))
+            text = (gzip.decompress(body) if compress else body).decode("utf-8")
+            if export_format is export.ExportFormat.csv:
+                rows = list(csv.DictReader(io.StringIO(text)))
+            else:
+                rows = [json.loads(line) for line in text.splitlines()]
+            assert [int(row["id"]) for row in rows] == expected, f"{export_format.value} export misses rows"
+            first_day = min(row["logged_at"] for row in rows)
+            assert first_day == datetime.combine(start, datetime.min.time()).isoformat(timespec="microseconds")
+
+
+def check_dashboard_snapshot_refresh() -> None:
+    """Dashboard reads are lookups after the write check, never stale after a commit, and rebuilt in the background."""
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 6)
+    _populate_history(engine, 20)
+    with Session(engine) as session:
+        first = crud.get_dashboard_summary(session)
+        with record_statements(engine) as statements:
+            assert crud.get_dashboard_summary(session) is first
+        assert [statement for statement, _ in statements] == ["PRAGMA data_version"], "Snapshot read ran queries"
+        crud.log_session(
+            session,
+            schemas.SessionLogIn(workout_id=1, duration_minutes=30, rpe=9, energy_level="Bonne"),
+        )
+        updated = crud.get_dashboard_summary(session)
+        assert updated != first and updated == crud.build_dashboard_summary(session), "Snapshot stale after commit"
+
+    def read_dashboard() -> None:
+        with Session(pooled) as session:
+            crud.get_dashboard_summary(session)
+
+    async def scenario() -> None:
+        async def rebuild() -> None:
+            await run_in_threadpool(read_dashboard)
+
+        async def rebuilt(count: int) -> None:
+            for _ in range(200):
+                if refresher.rebuilds >= count:
+                    return
+                await asyncio.sleep(0.01)
+            raise AssertionError(f"{refresher.rebuilds} rebuilds, expected {count}")
+
+        refresher = refresh.SnapshotRefresher(
+            "dashboard", crud.DASHBOARD_TABLES, rebuild, lambda now: now + timedelta(days=1)
+        )
+        refresher.start()
+        await rebuilt(1)
+        with Session(pooled) as session:
+            session.add(
+                DailyHabitLog(
+                    day=date.today() - timedelta(days=40),
+                    sleep_hours=8,
+                    water_intake_liters=2,
+                    mood="Calme",
+                    readiness_score=70,
+                )
+            )
+            session.commit()
+        await rebuilt(2)
+        with record_statements(pooled) as statements:
+            read_dashboard()
+        assert [statement for statement, _ in statements] == ["PRAGMA data_version"], "Read after a rebuild ran SQL"
+        cache.bump("unrelated")
+        await asyncio.sleep(0.05)
+        assert refresher.rebuilds == 2, "Unrelated write triggered a rebuild"
+        await refresher.stop()
+
+        # A rollover every 20 ms rebuilds without any write.
+        refresher = refresh.SnapshotRefresher(
+            "dashboard", crud.DASHBOARD_TABLES, rebuild, lambda now: now + timedelta(milliseconds=20)
+        )
+        refresher.start()
+        await rebuilt(3)
+        await refresher.stop()
+
+    asyncio.run(scenario())
+
+
+def check_coach_roster_aggregates() -> None:
+    """The roster matches the default athlete's dashboard and per-athlete loops, in one statement.
+
+    Sessions of other athletes leave the default athlete's views unchanged.
+    """
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 6)
+    _populate_history(engine, 30)
+    today = date.today()
+    rng = random.Random(7)
+    with Session(engine) as session:
+        dashboard = crud.build_dashboard_summary(session, today)
+        personal = (crud.get_calendar(session, today.month, today.year), crud.get_recent_sessions(session))
+        athletes = [Athlete(name=f"Athlète {index}") for index in range(3)]
+        session.add_all(athletes)
+        session.flush()
+        # The last athlete has no history at all.
+        for athlete in athletes[:2]:
+            for day_of_week in rng.sample(range(7), 3):
+                session.add(
+                    ProgramSchedule(athlete_id=athlete.id, day_of_week=day_of_week, workout_id=1, focus="Force")
+                )
+            for delta in range(20):
+                session.add(
+                    DailyHabitLog(
+                        athlete_id=athlete.id,
+                        day=today - timedelta(days=delta),
+                        sleep_hours=7,
+                        water_intake_liters=2,
+                        mood="Bien",
+                        readiness_score=rng.randint(40, 100),
+                    )
+                )
+        session.commit()
+        payloads = [
+            schemas.SessionLogIn(
+                athlete_id=athletes[index % 2].id,
+                workout_id=1,
+                duration_minutes=rng.randint(20, 90),
+                rpe=rng.randint(3, 9),
+                energy_level="Bonne",
+                performed_at=datetime.combine(today - timedelta(days=rng.randint(0, 13)), datetime.min.time()),
+            )
+            for index in range(40)
+        ]
+        crud.log_sessions_bulk(session, payloads)
+        assert crud.build_dashboard_summary(session, today) == dashboard, "Other athletes changed the dashboard"
+        assert (
+            crud.get_calendar(session, today.month, today.year),
+            crud.get_recent_sessions(session),
+        ) == personal, "Other athletes changed the calendar or the recent sessions"
+
+        with record_statements(engine) as statements:
+            roster = crud.get_roster(session, today)
+        assert len(statements) == 1, f"Roster ran {len(statements)} statements"
+        assert roster.athlete_id == [DEFAULT_ATHLETE_ID] + [athlete.id for athlete in athletes]
+        rows = [dict(zip(roster._fields[4:], values)) for values in zip(*roster[4:])]
+
+        own = rows[0]
+        progress, recovery = dashboard.weekly_progress, dashboard.recovery_summary
+        assert (own["sessions"], own["total_duration"], own["completion_rate"]) == (
+            progress.total_sessions,
+            progress.total_duration,
+            progress.completion_rate,
+        ), "Default athlete's week differs from the dashboard"
+        assert (own["average_readiness_score"], own["logged_days"]) == (
+            recovery.average_readiness_score,
+            recovery.logged_days,
+        ), "Default athlete's readiness differs from the dashboard"
+
+        week_start = today - timedelta(days=today.weekday())
+        for athlete, row in zip(athletes, rows[1:]):
+            week = [
+                payload
+                for payload in payloads
+                if payload.athlete_id == athlete.id
+                and week_start <= payload.performed_at.date() < week_start + timedelta(days=7)
+            ]
+            scheduled = {
+                entry.day_of_week
+                for entry in session.exec(select(ProgramSchedule).where(ProgramSchedule.athlete_id == athlete.id))
+            }
+            habits = session.exec(
+                select(DailyHabitLog)
+                .where(DailyHabitLog.athlete_id == athlete.id, DailyHabitLog.day > today - timedelta(days=7))
+                .order_by(DailyHabitLog.day)
+            ).all()
+            completed = len({payload.performed_at.date() for payload in week})
+            expected = {
+                "sessions": len(week),
+                "total_duration": sum(payload.duration_minutes for payload in week),
+                "training_load": sum(payload.duration_minutes * payload.rpe for payload in week),
+                "scheduled_days": len(scheduled),
+                "completed_days": completed,
+                "completion_rate": min(100.0, round(completed / len(scheduled) * 100, 1)) if scheduled else 100.0,
+                "average_readiness_score": (
+                    round(sum(habit.readiness_score for habit in habits) / len(habits), 1) if habits else None
+                ),
+                "latest_readiness_score": habits[-1].readiness_score if habits else None,
+                "logged_days": len(habits),
+            }
+            assert row == expected, f"Roster of {athlete.name} differs: {row} != {expected}"
+
+
+def check_calendar_range_matches_months() -> None:
+    """The columnar range calendar agrees day by day with the monthly calendars and the session log."""
+
+    engine, pooled = memory_engines()
+    _populate_workouts(engine, 6)
+    _populate_history(engine, 420)
+    today = date.today()
+    start, end = today - timedelta(days=400), today + timedelta(days=40)
+    with Session(engine) as session:
+        other = Athlete(name="Autre athlète")
+        session.add(other)
+        session.commit()
+        # A second session every few days, and sessions of another athlete that must not show.
+        crud.log_sessions_bulk(
+            session,
+            [
+                schemas.SessionLogIn(
+                    athlete_id=athlete_id,
+                    workout_id=1,
+                    duration_minutes=30,
+                    rpe=5,
+                    energy_level="Bonne",
+                    performed_at=datetime.combine(today - timedelta(days=delta), datetime.min.time()),
+                )
+                for delta in range(0, 400, 6)
+                for athlete_id in (DEFAULT_ATHLETE_ID, other.id)
+            ],
+        )
+        with record_statements(engine) as statements:
+            calendar = crud.get_calendar_range(session, start, end)
+        # Past the cached schedule's check for writes from other connections.
+        queries = [
+            statement
+            for statement, _ in statements
+            if statement != "PRAGMA data_version" and "tableversion" not in statement
+        ]
+        assert len(queries) <= 2, f"Range calendar ran {len(queries)} statements"
+        logs = session.exec(select(SessionLog).where(SessionLog.athlete_id == DEFAULT_ATHLETE_ID)).all()
+        months = {}
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            if (day.month, day.year) not in months:
+                month = crud.get_calendar(session, day.month, day.year)
+                months[day.month, day.year] = {entry.date: entry for entry in month.days}
+
+    assert len(calendar.sessions) == (end - start).days + 1
+    for offset in range(len(calendar.sessions)):
+        day = start + timedelta(days=offset)
+        expected = months[day.month, day.year][day]
+        label = calendar.workout[offset]
+        sessions = [log for log in logs if log.performed_at.date() == day]
+        assert (calendar.workout_titles[label], calendar.focuses[label]) == (
+            expected.workout_title,
+            expected.focus,
+        ), f"Workout of {day} differs"
+        assert bool(calendar.completed[offset]) == expected.is_completed, f"Completion of {day} differs"
+        assert (calendar.sessions[offset], calendar.training_load[offset]) == (
+            len(sessions),
+            sum(log.duration_minutes * log.rpe for log in sessions),
+        ), f"Sessions of {day} differ"
+
+    response = _call_route(pooled, main.read_calendar_range, start=start, end=end)
+    assert schemas.CalendarRange(**json.loads(response.body)).workout == calendar.workout.tolist()
+    for bounds in ((end, start), (start, start + timedelta(days=heatmap.MAX_DAYS))):
+        try:
+            _call_route(pooled, main.read_calendar_range, start=bounds[0], end=bounds[1])
+        except HTTPException as exc:
+            assert exc.status_code == 422
+        else:
+            raise AssertionError(f"Range {bounds} was accepted")
+
+
+def check_rolling_windows_match_loops() -> None:
+    """Single-pass sliding windows equal a brute-force aggregation of each window."""
+
+    rng = random.Random(11)
+    first = date(2024, 1, 1)
+    rows = sorted(
+        (
+            (
+                first + timedelta(days=rng.randint(0, 120)),
+                rng.choice([None, rng.randint(0, 20)]),
+                rng.choice([None, "Motivé", "Calme", "Fatigué"]),
+            )
+            for _ in range(300)
+        ),
+        key=lambda row: row[0],
+    )
+    fields = {"value": lambda row: row[1], "mood": lambda row: row[2]}
+    start, end = first + timedelta(days=10), first + timedelta(days=130)
+    for size in (1, 3, 7, 30):
+        for result in windows.rolling(rows, lambda row: row[0], fields, start, end, size):
+            inside = [row for row in rows if result.start <= row[0] <= result.end]
+            values = [row[1] for row in inside if row[1] is not None]
+            moods = [row[2] for row in inside if row[2] is not None]
+            # Ties go to the value seen last.
+            mode = max(moods[::-1], key=moods.count) if moods else None
+            expected = (
+                len(inside),
+                len({row[0] for row in inside}),
+                (len(values), sum(values), min(values, default=None), max(values, default=None)),
+                (len(moods), mode),
+            )
+            value, mood = result.stats["value"], result.stats["mood"]
+            actual = (result.rows, result.days, (value.count, value.sum, value.min, value.max), (mood.count, mood.mode))
+            assert actual == expected, f"{size}-day window ending {result.end}: {actual} != {expected}"
+            assert value.mean == (sum(values) / len(values) if values else None)
+    week_end = start + timedelta(days=6)
+    fixed = windows.window(rows, lambda row: row[0], fields, start, week_end)
+    assert fixed == windows.rolling(rows, lambda row: row[0], fields, week_end, week_end, 7)[0]
+
+
+def check_set_volumes_incremental() -> None:
+    """Exercise volumes updated on each set insert equal a rebuild from the sets; invalid sets write nothing."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 3)
+    today = date.today()
+    rng = random.Random(13)
+    with Session(engine) as session:
+        other = Athlete(name="Autre athlète")
+        session.add(other)
+        session.commit()
+        logs = [
+            crud.log_session(
+                session,
+                schemas.SessionLogIn(
+                    athlete_id=DEFAULT_ATHLETE_ID if index % 4 else other.id,
+                    workout_id=index % 3 + 1,
+                    duration_minutes=60,
+                    rpe=7,
+                    energy_level="Bonne",
+                    performed_at=datetime.combine(today - timedelta(days=index // 2), datetime.min.time()),
+                ),
+            )
+            for index in range(12)
+        ]
+        prescriptions = session.exec(select(WorkoutExercise)).all()
+        expected: Dict[Tuple[int, int], List[float]] = {}
+        for log in logs:
+            payloads = [
+                schemas.SetLogIn(
+                    workout_exercise_id=prescription.id,
+                    set_index=set_index,
+                    reps=rng.randint(3, 12),
+                    load_kg=rng.randint(0, 80) * 2.5,
+                    rir=rng.randint(0, 4),
+                )
+                for prescription in prescriptions
+                if prescription.workout_id == log.workout_id
+                for set_index in range(1, prescription.sets + 1)
+            ]
+            # A set outside the prescription, on an exercise of the catalog.
+            payloads.append(schemas.SetLogIn(exercise_id=6, set_index=9, reps=10, load_kg=12.5))
+            # Logged in two requests, so volumes are upserted onto existing rows.
+            crud.log_sets(session, log.id, payloads[:3])
+            sets = crud.log_sets(session, log.id, payloads[3:])
+            assert len(sets.sets) == len(payloads)
+            exercises = {prescription.id: prescription.exercise_id for prescription in prescriptions}
+            for payload in payloads:
+                key = (log.athlete_id, exercises.get(payload.workout_exercise_id, payload.exercise_id))
+                totals = expected.setdefault(key, [0, 0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += payload.reps
+                totals[2] += payload.reps * payload.load_kg
+                totals[3] = max(totals[3], payload.load_kg)
+            assert abs(sets.tonnage_kg - sum(payload.reps * payload.load_kg for payload in payloads)) < 1e-6
+
+        incremental = session.exec(select(ExerciseVolume.__table__)).all()
+        rollups.rebuild_exercise_volumes(session)
+        rebuilt = session.exec(select(ExerciseVolume.__table__)).all()
+        assert sorted(incremental) == sorted(rebuilt), "Incremental exercise volumes differ from a rebuild"
+
+        for athlete_id in (DEFAULT_ATHLETE_ID, other.id):
+            volumes = crud.get_exercise_volume(session, today - timedelta(days=30), today, athlete_id)
+            actual = {
+                (athlete_id, volume.exercise_id): [volume.sets, volume.reps, volume.tonnage_kg, volume.top_load_kg]
+                for volume in volumes
+            }
+            wanted = {key: totals for key, totals in expected.items() if key[0] == athlete_id}
+            assert actual.keys() == wanted.keys() and all(
+                actual[key][:2] == wanted[key][:2] and abs(actual[key][2] - wanted[key][2]) < 1e-6
+                and actual[key][3] == wanted[key][3]
+                for key in wanted
+            ), f"Volume of athlete {athlete_id} differs"
+
+        metrics = {metric.name: metric for metric in crud.build_dashboard_summary(session, today).metrics}
+        tonnage = metrics["Charge tonnage"]
+        assert tonnage.data[-1].value == sum(
+            volume.tonnage_kg for volume in crud.get_exercise_volume(session, today, today)
+        ), "Dashboard tonnage differs from the volumes"
+
+        before = len(session.exec(select(SetLog)).all())
+        invalid = [
+            # A prescription of another workout, an index already logged, an
+            # exercise missing from the catalog, and no exercise at all.
+            {"workout_exercise_id": prescriptions[-1].id, "set_index": 9},
+            {"exercise_id": 6, "set_index": 9},
+            {"exercise_id": 999, "set_index": 1},
+            {"set_index": 1},
+        ]
+        for fields in invalid:
+            try:
+                crud.log_sets(session, logs[1].id, [schemas.SetLogIn(reps=5, load_kg=50, **fields)])
+            except ValueError:
+                pass
+            else:
+                raise AssertionError(f"Invalid set was accepted: {fields}")
+        try:
+            crud.log_sets(session, 999, [])
+        except LookupError:
+            pass
+        else:
+            raise AssertionError("Sets of an unknown session were accepted")
+        assert len(session.exec(select(SetLog)).all()) == before
+        table_sql = session.connection().exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = ?", (SetLog.__tablename__,)
+        ).scalar_one()
+        assert table_sql.rstrip().endswith("WITHOUT ROWID"), "Sets are stored with a rowid"
+
+
+def _query_plan(engine: Engine, statement: str, parameters) -> List[str]:
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+def check_legacy_tonnage_metric_dropped() -> None:
+    """An upgraded database keeps a single tonnage curve, read from the exercise volumes."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 3)
+    today = date.today()
+    with Session(engine) as session:
+        log = crud.log_session(
+            session,
+            schemas.SessionLogIn(workout_id=1, duration_minutes=60, rpe=7, energy_level="Bonne"),
+        )
+        crud.log_sets(session, log.id, [schemas.SetLogIn(exercise_id=1, set_index=1, reps=5, load_kg=100)])
+        # Samples stored under the tonnage name by the seeds before the volumes existed.
+        legacy = [
+            schemas.MetricLogIn(
+                metric=rollups.TONNAGE_METRIC,
+                value=4000 + day,
+                unit="kg",
+                logged_at=datetime.combine(today - timedelta(days=day), datetime.min.time()),
+            )
+            for day in range(5)
+        ]
+        crud.log_metrics(session, legacy)
+        names = [metric.name for metric in crud.build_dashboard_summary(session, today).metrics]
+        assert names.count(rollups.TONNAGE_METRIC) == 1, "Legacy tonnage samples show on the dashboard"
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql("PRAGMA user_version = 7")
+    upgrade(engine)
+    with Session(engine) as session:
+        for model in (MetricLog, MetricRollup):
+            left = session.exec(select(model).where(model.metric == rollups.TONNAGE_METRIC)).all()
+            assert not left, f"Migration left legacy tonnage rows in {model.__tablename__}"
+        metrics = crud.build_dashboard_summary(session, today).metrics
+        assert [metric.name for metric in metrics].count(rollups.TONNAGE_METRIC) == 1
+        assert metrics[0].data[-1].value == 500, "Dashboard tonnage does not come from the volumes"
+
+
+def _unindexed_scans(engine: Engine, statement: str, parameters) -> Set[str]:
+    scans = set()
+    for detail in _query_plan(engine, statement, parameters):
+        words = detail.split()
+        if words[0] == "SCAN" and words[1] in INDEXED_TABLES and "INDEX" not in detail:
+            scans.add(detail)
+    return scans
+
+
+def check_crud_queries_use_indexes() -> None:
+    """No crud query scans a history or hot-path table without an index, and exports never sort."""
+
+    engine, _ = memory_engines()
+    _populate_workouts(engine, 6)
+    _populate_history(engine, 60)
+    today, now = date.today(), datetime.utcnow()
+    calls = {
+        "build_dashboard_summary": crud.build_dashboard_summary,
+        "get_calendar": lambda session: crud.get_calendar(session, today.month, today.year),
+        "get_recent_sessions": crud.get_recent_sessions,
+        "get_session_history": lambda session: crud.get_session_history(
+            session, cursor=crud._encode_cursor(datetime.utcnow() - timedelta(days=20), 1), workout_id=2
+        ),
+        "get_bootstrap": lambda session: crud.get_bootstrap(session, today.month, today.year),
+        "get_workout": lambda session: crud.get_workout(session, 1),
+        "list_workouts": crud.list_workouts,
+        "list_exercises": crud.list_exercises,
+        "search_exercises": lambda session: crud.search_exercises(session, "quadri"),
+        "get_roster": lambda session: crud.get_roster(session, today),
+        "get_calendar_range": lambda session: crud.get_calendar_range(session, today - timedelta(days=400), today),
+        "get_exercise_volume": lambda session: crud.get_exercise_volume(session, today - timedelta(days=27), today),
+        "get_session_sets": lambda session: crud.get_session_sets(session, 1),
+        "log_sets": lambda session: crud.log_sets(
+            session, 1, [schemas.SetLogIn(exercise_id=1, set_index=1, reps=5, load_kg=60)]
+        ),
+        "log_session": lambda session: crud.log_session(
+            session,
+            schemas.SessionLogIn(workout_id=1, duration_minutes=30, rpe=6, energy_level="Bonne"),
+        ),
+        "log_sessions_bulk": lambda session: crud.log_sessions_bulk(
+            session,
+            [
+                schemas.SessionLogIn(
+                    workout_id=2,
+                    duration_minutes=40,
+                    rpe=7,
+                    energy_level="Bonne",
+                    performed_at=datetime.combine(today - timedelta(days=delta), datetime.min.time()),
+                )
+                for delta in (0, 3, 90)
+            ],
+        ),
+        "log_metrics": lambda session: crud.log_metrics(
+            session,
+            [
+                schemas.MetricLogIn(
+                    metric="Variabilité HRV", value=80.0, unit="ms", logged_at=now - timedelta(days=delta)
+                )
+                for delta in (0, 2)
+            ],
+        ),
+        "get_load_analytics": lambda session: crud.get_load_analytics(session, today - timedelta(days=89), today),
+        # A short range reads the raw samples, a long one the daily tier.
+        "get_metric_series (raw)": lambda session: crud.get_metric_series(
+            session, "Variabilité HRV", now - timedelta(days=2), now, 500
+        ),
+        "get_metric_series (tiers)": lambda session: crud.get_metric_series(
+            session, "Variabilité HRV", now - timedelta(days=365), now, 50
+        ),
+    }
+    failures = []
+    for name, call in calls.items():
+        with Session(engine) as session, record_statements(engine) as statements:
+            call(session)
+        for statement, parameters in statements:
+            for scan in _unindexed_scans(engine, statement, parameters):
+                failures.append(f"{name}: {scan}\n    {statement}")
+    assert not failures, "Full table scans:\n" + "\n".join(failures)
+
+    # Exports read whole tables, but must stream: sorting the rows first would
+    # hold back the first byte until the whole range is read.
+    for table, bounds in itertools.product(export.ExportTable, [(None, None), (today - timedelta(days=20), today)]):
+        with engine.connect() as connection, record_statements(engine) as statements:
+            for _ in export.iter_export(connection, table, export.ExportFormat.ndjson, *bounds):
+                pass
+        for statement, parameters in statements:
+            sorts = [detail for detail in _query_plan(engine, statement, parameters) if "TEMP B-TREE" in detail]
+            assert not sorts, f"Export of {table.value} between {bounds} sorts its rows: {sorts}\n    {statement}"
+
+
+CHECKS: List[Callable[[], None]] = [
+    check_workout_query_count,
+    check_catalog_etag_revalidation,
+    check_cache_sees_other_processes,
+    check_crud_queries_use_indexes,
+    check_metric_series_downsampling,
+    check_request_instrumentation,
+    check_bootstrap_matches_endpoints,
+    check_streak_incremental_updates,
+    check_load_analytics_matches_loops,
+    check_ingest_releases_writer,
+    check_ingest_parsers_bound_malformed_bodies,
+    check_writes_reject_unknown_athletes,
+    check_session_history_pagination,
+    check_exercise_search,
+    check_export_streams_every_row,
+    check_dashboard_snapshot_refresh,
+    check_coach_roster_aggregates,
+    check_calendar_range_matches_months,
+    check_rolling_windows_match_loops,
+    check_set_volumes_incremental,
+    check_legacy_tonnage_metric_dropped,
+]
+
+
+def run() -> None:
+    for check in CHECKS:
+        check()
+        print(f"ok  {check.__name__}")
+
+
+if __name__ == "__main__":
+    run()
@@ -1,21 +1,32 @@
 """Data access helpers for the API."""
 from __future__ import annotations
 
+from base64 import urlsafe_b64decode, urlsafe_b64encode
 from calendar import monthrange
-from collections import Counter, defaultdict
+from collections import defaultdict
 from datetime import date, datetime, time, timedelta
-from typing import Dict, Iterable, List, Sequence
+from operator import attrgetter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
+from sqlalchemy import and_, func, insert, or_, tuple_
 from sqlmodel import Session, select
 
-from . import schemas
+from . import analytics, cache, downsample, heatmap, rollups, roster, schemas, search, timeseries, windows
 from .models import (
+    DEFAULT_ATHLETE_ID,
+    ActivityRun,
+    Athlete,
     DailyHabitLog,
+    DailyTrainingRollup,
     Exercise,
+    ExerciseVolume,
     FocusRecommendation,
     MetricLog,
+    MetricRollup,
     ProgramSchedule,
     SessionLog,
+    SetLog,
+    TrainingStreak,
     WorkoutExercise,
     WorkoutTemplate,
 )
@@ -39,20 +50,58 @@ def _exercise_to_schema(exercise: Exercise) -> schemas.ExerciseOut:
     )
 
 
-def _build_workout(session: Session, template: WorkoutTemplate) -> schemas.WorkoutOut:
-    exercise_links = session.exec(
-        select(WorkoutExercise)
-        .where(WorkoutExercise.workout_id == template.id)
-        .order_by(WorkoutExercise.sequence)
-    ).all()
-    exercises: List[schemas.WorkoutExerciseOut] = []
-    for link in exercise_links:
-        exercise = session.get(Exercise, link.exercise_id)
-        if not exercise:
+def _load_workouts(
+    session: Session,
+    template_ids: Optional[Iterable[int]] = None,
+    exercises: Optional[Dict[int, schemas.ExerciseOut]] = None,
+) -> Dict[int, schemas.WorkoutOut]:
+    """Load workout graphs in two queries, whatever the number of templates.
+
+    Templates are fetched first (all of them when ``template_ids`` is ``None``),
+    then every exercise link is fetched joined to its exercise. When the
+    caller already holds the exercises (``exercises``, keyed by id) the links
+    are read on their own instead. The result is keyed by template id and
+    keeps the template query ordering.
+    """
+
+    template_query = select(WorkoutTemplate).order_by(WorkoutTemplate.focus_area)
+    link_query = (
+        select(WorkoutExercise, Exercise)
+        .join(Exercise, Exercise.id == WorkoutExercise.exercise_id)
+        .order_by(WorkoutExercise.workout_id, WorkoutExercise.sequence)
+    )
+    if exercises is not None:
+        link_query = select(WorkoutExercise).order_by(WorkoutExercise.workout_id, WorkoutExercise.sequence)
+    if template_ids is not None:
+        ids = sorted(set(template_ids))
+        if not ids:
+            return {}
+        template_query = template_query.where(WorkoutTemplate.id.in_(ids))
+        link_query = link_query.where(WorkoutExercise.workout_id.in_(ids))
+
+    templates = session.exec(template_query).all()
+    if exercises is not None:
+        pairs: Iterable[Tuple[WorkoutExercise, Optional[schemas.ExerciseOut]]] = (
+            (link, exercises.get(link.exercise_id)) for link in session.exec(link_query)
+        )
+    else:
+        exercise_cache: Dict[int, schemas.ExerciseOut] = {}
+
+        def convert(exercise: Exercise) -> schemas.ExerciseOut:
+            exercise_out = exercise_cache.get(exercise.id)
+            if exercise_out is None:
+                exercise_out = exercise_cache[exercise.id] = _exercise_to_schema(exercise)
+            return exercise_out
+
+        pairs = ((link, convert(exercise)) for link, exercise in session.exec(link_query))
+
+    exercises_by_workout: Dict[int, List[schemas.WorkoutExerciseOut]] = defaultdict(list)
+    for link, exercise_out in pairs:
+        if exercise_out is None:
             continue
-        exercises.append(
+        exercises_by_workout[link.workout_id].append(
             schemas.WorkoutExerciseOut(
-                exercise=_exercise_to_schema(exercise),
+                exercise=exercise_out,
                 sets=link.sets,
                 reps=link.reps,
                 rest_seconds=link.rest_seconds,
@@ -61,85 +110,57 @@ def _build_workout(session: Session, template: WorkoutTemplate) -> schemas.Worko
                 notes=link.notes,
             )
         )
-    return schemas.WorkoutOut(
-        id=template.id,
-        title=template.title,
-        description=template.description,
-        difficulty=template.difficulty,
-        focus_area=template.focus_area,
-        estimated_duration=template.estimated_duration,
-        exercises=exercises,
-    )
-
 
-def _calculate_training_streak(logs: Sequence[SessionLog], today: date) -> int:
-    """Return the number of consecutive days with at least one session."""
-
-    log_dates = {log.performed_at.date() for log in logs}
-    streak = 0
-    cursor = today
-    while cursor in log_dates:
-        streak += 1
-        cursor -= timedelta(days=1)
-    return streak
+    return {
+        template.id: schemas.WorkoutOut(
+            id=template.id,
+            title=template.title,
+            description=template.description,
+            difficulty=template.difficulty,
+            focus_area=template.focus_area,
+            estimated_duration=template.estimated_duration,
+            exercises=exercises_by_workout.get(template.id, []),
+        )
+        for template in templates
+    }
 
 
 def _calculate_weekly_progress(
     today: date,
     weekday: int,
     schedule_by_day: Dict[int, List[ProgramSchedule]],
-    logs: Sequence[SessionLog],
+    rollups: Sequence[DailyTrainingRollup],
 ) -> schemas.WeeklyProgress:
     """Compute aggregated statistics for the current training week."""
 
     week_start = today - timedelta(days=weekday)
-    week_end = week_start + timedelta(days=6)
-    start_dt = datetime.combine(week_start, time.min)
-    end_dt = datetime.combine(week_end + timedelta(days=1), time.min)
-
-    weekly_logs = [
-        log
-        for log in logs
-        if start_dt <= log.performed_at < end_dt
-    ]
-
-    total_sessions = len(weekly_logs)
-    total_duration = sum(log.duration_minutes for log in weekly_logs)
-    average_rpe = (
-        round(sum(log.rpe for log in weekly_logs) / total_sessions, 1)
-        if total_sessions
-        else 0.0
+    week = windows.window(
+        (rollup for rollup in rollups if rollup.sessions),
+        _by_day,
+        _ROLLUP_FIELDS,
+        week_start,
+        week_start + timedelta(days=6),
     )
-    calories = sum((log.calories_burned or 0) for log in weekly_logs)
-
     scheduled_days = sum(1 for day in range(7) if schedule_by_day.get(day))
-    unique_completed_days = {log.performed_at.date() for log in weekly_logs}
-    completion_rate = 100.0
-    if scheduled_days:
-        completion_rate = min(
-            100.0,
-            round(len(unique_completed_days) / scheduled_days * 100, 1),
-        )
 
     return schemas.WeeklyProgress(
-        total_sessions=total_sessions,
-        total_duration=total_duration,
-        average_rpe=average_rpe,
-        calories_burned=calories,
-        completion_rate=completion_rate,
+        total_sessions=week.stats["sessions"].sum,
+        total_duration=week.stats["total_duration"].sum,
+        average_rpe=_average_rpe(week),
+        calories_burned=week.stats["calories_burned"].sum,
+        completion_rate=roster.completion_rate(week.days, scheduled_days),
     )
 
 
 def get_workout(session: Session, workout_id: int) -> schemas.WorkoutOut:
-    template = session.get(WorkoutTemplate, workout_id)
-    if not template:
+    workout = _load_workouts(session, [workout_id]).get(workout_id)
+    if not workout:
         raise ValueError(f"Workout {workout_id} not found")
-    return _build_workout(session, template)
+    return workout
 
 
 def list_workouts(session: Session) -> List[schemas.WorkoutOut]:
-    templates = session.exec(select(WorkoutTemplate).order_by(WorkoutTemplate.focus_area)).all()
-    return [_build_workout(session, template) for template in templates]
+    return list(_load_workouts(session).values())
 
 
 def list_exercises(session: Session) -> List[schemas.ExerciseOut]:
@@ -147,8 +168,38 @@ def list_exercises(session: Session) -> List[schemas.ExerciseOut]:
     return [_exercise_to_schema(exercise) for exercise in exercises]
 
 
+def search_exercises(session: Session, query: str, limit: int = 20, offset: int = 0) -> schemas.ExerciseSearchPage:
+    """Rank exercises matching ``query`` with BM25, best first.
+
+    Every word of ``query`` must match the start of a word in one of the
+    indexed columns, accents and case aside. Pages are taken by ``offset``;
+    ``next_offset`` is ``None`` on the last one.
+    """
+
+    expression = search.match_expression(query)
+    if not expression:
+        return schemas.ExerciseSearchPage(items=[], next_offset=None)
+    exercises = session.exec(
+        select(Exercise)
+        .join(search.fts, search.fts.c.rowid == Exercise.id)
+        .where(search.matches(expression))
+        .order_by(search.rank(), Exercise.id)
+        .offset(offset)
+        .limit(limit + 1)
+    ).all()
+    return schemas.ExerciseSearchPage(
+        items=[_exercise_to_schema(exercise) for exercise in exercises[:limit]],
+        next_offset=offset + limit if len(exercises) > limit else None,
+    )
+
+
 def log_session(session: Session, payload: schemas.SessionLogIn) -> SessionLog:
+    """Store one session and update the rollups. Raises ``ValueError`` for an unknown athlete."""
+
+    if session.get(Athlete, payload.athlete_id) is None:
+        raise ValueError(f"Athlete {payload.athlete_id} not found")
     session_log = SessionLog(
+        athlete_id=payload.athlete_id,
         workout_id=payload.workout_id,
         duration_minutes=payload.duration_minutes,
         rpe=payload.rpe,
@@ -159,55 +210,422 @@ def log_session(session: Session, payload: schemas.SessionLogIn) -> SessionLog:
     if payload.performed_at is not None:
         session_log.performed_at = payload.performed_at
     session.add(session_log)
+    rollups.record_session(session, session_log)
     session.commit()
     session.refresh(session_log)
     return session_log
 
 
-def _group_metrics(metric_logs: Iterable[MetricLog]) -> List[schemas.TrendMetric]:
-    grouped: Dict[str, List[MetricLog]] = defaultdict(list)
-    for log in metric_logs:
-        grouped[log.metric].append(log)
-    trends: List[schemas.TrendMetric] = []
-    for metric, rows in grouped.items():
-        if not rows:
-            continue
-        rows.sort(key=lambda row: row.logged_at)
-        trends.append(
-            schemas.TrendMetric(
-                name=metric,
-                unit=rows[0].unit,
-                data=[
-                    schemas.MetricPoint(timestamp=row.logged_at, value=row.value)
-                    for row in rows[-21:]
-                ],
+def list_workout_ids(session: Session) -> Set[int]:
+    return set(session.exec(select(WorkoutTemplate.id)).all())
+
+
+def list_athlete_ids(session: Session) -> Set[int]:
+    return set(session.exec(select(Athlete.id)).all())
+
+
+def log_sessions_bulk(session: Session, payloads: Sequence[schemas.SessionLogIn]) -> int:
+    """Insert validated sessions in one transaction and return how many were written.
+
+    Callers check the workouts and athletes first, like ``ingest.ingest_sessions``.
+
+    Rows go through a single Core ``executemany`` and the daily rollups are
+    updated once per distinct day, instead of a commit and refresh per row.
+    """
+
+    if not payloads:
+        return 0
+    now = datetime.utcnow()
+    rows = [
+        {
+            "athlete_id": payload.athlete_id,
+            "workout_id": payload.workout_id,
+            "performed_at": payload.performed_at or now,
+            "duration_minutes": payload.duration_minutes,
+            "rpe": payload.rpe,
+            "energy_level": payload.energy_level,
+            "notes": payload.notes,
+            "calories_burned": payload.calories_burned,
+        }
+        for payload in payloads
+    ]
+    session.execute(insert(SessionLog.__table__), rows)
+    rollups.record_sessions(session, rows)
+    session.commit()
+    return len(rows)
+
+
+def _grams(kilograms: float) -> int:
+    return round(kilograms * 1000)
+
+
+def _kilograms(grams: int) -> float:
+    return grams / 1000
+
+
+def log_sets(session: Session, session_id: int, payloads: Sequence[schemas.SetLogIn]) -> schemas.SessionSets:
+    """Store strength sets of a logged session and fold them into the exercise volumes.
+
+    A set linked to a prescription takes its exercise from it, and the
+    prescription must belong to the session's workout. Raises ``LookupError``
+    for an unknown session and ``ValueError`` for an invalid or already
+    logged set; nothing is written then.
+    """
+
+    log = session.get(SessionLog, session_id)
+    if log is None:
+        raise LookupError(f"Session {session_id} not found")
+    prescription_ids = {payload.workout_exercise_id for payload in payloads} - {None}
+    prescriptions = {
+        entry.id: entry
+        for entry in session.exec(select(WorkoutExercise).where(WorkoutExercise.id.in_(prescription_ids)))
+    }
+    rows = []
+    for index, payload in enumerate(payloads):
+        exercise_id = payload.exercise_id
+        if payload.workout_exercise_id is not None:
+            prescription = prescriptions.get(payload.workout_exercise_id)
+            if prescription is None or prescription.workout_id != log.workout_id:
+                raise ValueError(
+                    f"Set {index}: prescription {payload.workout_exercise_id} is not part of workout {log.workout_id}"
+                )
+            if exercise_id is None:
+                exercise_id = prescription.exercise_id
+            elif exercise_id != prescription.exercise_id:
+                raise ValueError(f"Set {index}: exercise {exercise_id} differs from its prescription")
+        elif exercise_id is None:
+            raise ValueError(f"Set {index}: exercise_id or workout_exercise_id is required")
+        rows.append(
+            {
+                "session_id": session_id,
+                "exercise_id": exercise_id,
+                "set_index": payload.set_index,
+                "workout_exercise_id": payload.workout_exercise_id,
+                "reps": payload.reps,
+                "load_grams": _grams(payload.load_kg),
+                "rir": payload.rir,
+            }
+        )
+
+    exercise_ids = {row["exercise_id"] for row in rows}
+    unknown = exercise_ids - set(session.exec(select(Exercise.id).where(Exercise.id.in_(exercise_ids))))
+    if unknown:
+        raise ValueError(f"Unknown exercises: {sorted(unknown)}")
+    keys = [(row["exercise_id"], row["set_index"]) for row in rows]
+    logged = session.exec(
+        select(SetLog.exercise_id).where(
+            SetLog.session_id == session_id, tuple_(SetLog.exercise_id, SetLog.set_index).in_(keys)
+        )
+    ).first()
+    if logged is not None or len(set(keys)) < len(keys):
+        raise ValueError("A set index can only be logged once per exercise and session")
+
+    if rows:
+        session.execute(insert(SetLog.__table__), rows)
+        rollups.record_sets(session, log.athlete_id, log.performed_at.date(), rows)
+        session.commit()
+    return get_session_sets(session, session_id)
+
+
+def get_session_sets(session: Session, session_id: int) -> schemas.SessionSets:
+    """Return the sets of one session, read from its primary key range."""
+
+    rows = session.exec(
+        select(
+            SetLog.exercise_id,
+            SetLog.set_index,
+            SetLog.workout_exercise_id,
+            SetLog.reps,
+            SetLog.load_grams,
+            SetLog.rir,
+        )
+        .where(SetLog.session_id == session_id)
+        .order_by(SetLog.exercise_id, SetLog.set_index)
+    ).all()
+    return schemas.SessionSets(
+        session_id=session_id,
+        sets=[
+            schemas.SetLogOut(
+                exercise_id=exercise_id,
+                workout_exercise_id=workout_exercise_id,
+                set_index=set_index,
+                reps=reps,
+                load_kg=_kilograms(load_grams),
+                rir=rir,
             )
+            for exercise_id, set_index, workout_exercise_id, reps, load_grams, rir in rows
+        ],
+        tonnage_kg=_kilograms(sum(row.reps * row.load_grams for row in rows)),
+    )
+
+
+def get_exercise_volume(
+    session: Session, start: date, end: date, athlete_id: int = DEFAULT_ATHLETE_ID
+) -> List[schemas.ExerciseVolumeOut]:
+    """Per-exercise volume of ``athlete_id`` from ``start`` to ``end`` inclusive, heaviest tonnage first."""
+
+    tonnage = func.sum(ExerciseVolume.tonnage_grams)
+    rows = session.exec(
+        select(
+            ExerciseVolume.exercise_id,
+            Exercise.name,
+            func.sum(ExerciseVolume.sets),
+            func.sum(ExerciseVolume.reps),
+            tonnage,
+            func.max(ExerciseVolume.top_load_grams),
         )
-    return trends
+        .join(Exercise, Exercise.id == ExerciseVolume.exercise_id)
+        .where(ExerciseVolume.athlete_id == athlete_id, ExerciseVolume.day.between(start, end))
+        .group_by(ExerciseVolume.exercise_id)
+        .order_by(tonnage.desc(), ExerciseVolume.exercise_id)
+    )
+    return [
+        schemas.ExerciseVolumeOut(
+            exercise_id=exercise_id,
+            name=name,
+            sets=sets,
+            reps=reps,
+            tonnage_kg=_kilograms(tonnage_grams),
+            top_load_kg=_kilograms(top_load_grams),
+        )
+        for exercise_id, name, sets, reps, tonnage_grams, top_load_grams in rows
+    ]
 
 
-def get_dashboard_summary(session: Session) -> schemas.DashboardSummary:
-    today = date.today()
-    weekday = today.weekday()
+def log_metrics(session: Session, payloads: Sequence[schemas.MetricLogIn]) -> int:
+    """Store raw metric samples and fold them into the hourly and daily tiers.
+
+    Raises ``ValueError`` naming the first sample of an unknown athlete; nothing is written then.
+    """
+
+    if not payloads:
+        return 0
+    athlete_ids = {payload.athlete_id for payload in payloads}
+    known_athletes = set(session.exec(select(Athlete.id).where(Athlete.id.in_(athlete_ids))).all())
+    for index, payload in enumerate(payloads):
+        if payload.athlete_id not in known_athletes:
+            raise ValueError(f"Metric {index}: athlete {payload.athlete_id} not found")
+    now = datetime.utcnow()
+    rows = [
+        {
+            "athlete_id": payload.athlete_id,
+            "metric": payload.metric,
+            "value": payload.value,
+            "unit": payload.unit,
+            "logged_at": payload.logged_at or now,
+        }
+        for payload in payloads
+    ]
+    session.execute(insert(MetricLog.__table__), rows)
+    timeseries.record_samples(session, rows)
+    session.commit()
+    return len(rows)
+
+
+def get_metric_series(
+    session: Session, name: str, start: datetime, end: datetime, max_points: int
+) -> timeseries.SeriesArrays:
+    """Return at most ``max_points`` points of ``name``, LTTB-downsampled.
+
+    The tier is picked so that it holds at least ``max_points`` buckets over
+    the range; LTTB then keeps the points that preserve the chart's shape.
+    """
+
+    series = timeseries.query_arrays(session, name, start, end, (end - start) / max_points)
+    timestamps, values = downsample.lttb(series.timestamps, series.values, max_points)
+    return series._replace(timestamps=timestamps, values=values)
 
-    schedule_entries = session.exec(
-        select(ProgramSchedule).order_by(ProgramSchedule.day_of_week)
+
+def get_load_analytics(session: Session, start: date, end: date) -> analytics.LoadSeries:
+    """Daily load indicators from ``start`` to ``end``, computed over the full history."""
+
+    return analytics.load_series(session, start, end)
+
+
+def _dashboard_metrics(session: Session, since: datetime) -> List[schemas.TrendMetric]:
+    """Daily means of every metric since ``since``, last 21 days per metric.
+
+    Samples named like the tonnage curve are skipped: that curve comes from the
+    exercise volumes and a second entry would shadow it.
+    """
+
+    rows = session.exec(
+        select(
+            MetricRollup.metric,
+            MetricRollup.unit,
+            MetricRollup.bucket_start,
+            MetricRollup.total,
+            MetricRollup.count,
+        )
+        .where(
+            MetricRollup.resolution == timeseries.DAY,
+            MetricRollup.bucket_start >= timeseries.bucket_start(since, timeseries.DAY),
+            MetricRollup.metric != rollups.TONNAGE_METRIC,
+        )
+        .order_by(MetricRollup.metric, MetricRollup.bucket_start)
+    )
+    units: Dict[str, str] = {}
+    points: Dict[str, List[schemas.MetricPoint]] = defaultdict(list)
+    for metric, unit, bucket, total, count in rows:
+        units.setdefault(metric, unit)
+        points[metric].append(schemas.MetricPoint(timestamp=bucket, value=round(total / count, 2)))
+    return [
+        schemas.TrendMetric(name=metric, unit=units[metric], data=data[-21:])
+        for metric, data in points.items()
+    ]
+
+
+def _tonnage_trend(session: Session, since: date) -> List[schemas.TrendMetric]:
+    """Daily tonnage of the default athlete since ``since``, from the exercise volumes."""
+
+    rows = session.exec(
+        select(ExerciseVolume.day, func.sum(ExerciseVolume.tonnage_grams))
+        .where(ExerciseVolume.athlete_id == DEFAULT_ATHLETE_ID, ExerciseVolume.day >= since)
+        .group_by(ExerciseVolume.day)
+        .order_by(ExerciseVolume.day)
     ).all()
+    if not rows:
+        return []
+    data = [
+        schemas.MetricPoint(timestamp=datetime.combine(day, time.min), value=_kilograms(tonnage_grams))
+        for day, tonnage_grams in rows
+    ]
+    return [schemas.TrendMetric(name=rollups.TONNAGE_METRIC, unit="kg", data=data[-21:])]
+
+
+def _load_schedule(session: Session) -> Dict[int, List[ProgramSchedule]]:
+    """Group the default athlete's weekly program by weekday, in schedule order."""
+
     grouped_schedule: Dict[int, List[ProgramSchedule]] = defaultdict(list)
-    for entry in schedule_entries:
+    for entry in session.exec(
+        select(ProgramSchedule)
+        .where(ProgramSchedule.athlete_id == DEFAULT_ATHLETE_ID)
+        .order_by(ProgramSchedule.day_of_week, ProgramSchedule.id)
+    ):
         grouped_schedule[entry.day_of_week].append(entry)
+    return grouped_schedule
+
+
+def _dashboard_days(today: date) -> Tuple[date, date]:
+    """First and last day of the rollups read by the dashboard."""
+
+    week_start = today - timedelta(days=today.weekday())
+    return min(week_start, today - timedelta(days=6)), week_start + timedelta(days=6)
+
+
+# Fields aggregated over day windows by the dashboard.
+_by_day = attrgetter("day")
+_ROLLUP_FIELDS = {
+    name: attrgetter(name) for name in ("sessions", "total_duration", "total_rpe", "training_load", "calories_burned")
+}
+_HABIT_FIELDS = {
+    "sleep_hours": attrgetter("sleep_hours"),
+    "water_intake_liters": attrgetter("water_intake_liters"),
+    "readiness_score": attrgetter("readiness_score"),
+    "mood": lambda habit: habit.mood or None,
+}
+
+
+def _average_rpe(rollup_window: windows.Window) -> float:
+    sessions = rollup_window.stats["sessions"].sum
+    return round(rollup_window.stats["total_rpe"].sum / sessions, 1) if sessions else 0.0
+
+
+# The dashboard is materialized: it only changes when one of these tables is
+# written or when the day changes, local (schedule, habits, streak) or UTC
+# (metric buckets).
+_dashboard_snapshot = cache.VersionedCache(
+    "dashboard",
+    ProgramSchedule.__tablename__,
+    WorkoutTemplate.__tablename__,
+    WorkoutExercise.__tablename__,
+    Exercise.__tablename__,
+    DailyTrainingRollup.__tablename__,
+    FocusRecommendation.__tablename__,
+    DailyHabitLog.__tablename__,
+    MetricRollup.__tablename__,
+    ActivityRun.__tablename__,
+    TrainingStreak.__tablename__,
+    ExerciseVolume.__tablename__,
+    maxsize=8,
+)
+DASHBOARD_TABLES = _dashboard_snapshot.tables
+
+
+def _dashboard_clock() -> Tuple[date, date]:
+    return date.today(), datetime.utcnow().date()
+
 
-    all_logs = session.exec(select(SessionLog).order_by(SessionLog.performed_at.desc())).all()
+def next_dashboard_rollover(now: datetime) -> datetime:
+    """First local time after ``now`` at which the local or the UTC date changes."""
+
+    local_midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    utc_offset = now.astimezone().utcoffset() or timedelta()
+    utc_midnight = datetime.combine((now - utc_offset).date() + timedelta(days=1), time.min) + utc_offset
+    return min(local_midnight, utc_midnight)
+
+
+def get_dashboard_summary(session: Session) -> schemas.DashboardSummary:
+    """Return the dashboard snapshot, building it only if a write or the date made it stale.
+
+    The background refresher in ``main`` rebuilds it after each commit to
+    ``DASHBOARD_TABLES`` and at every rollover, so reads are a lookup.
+    """
+
+    clock = _dashboard_clock()
+    return _dashboard_snapshot.get(session, clock, lambda: build_dashboard_summary(session, clock[0]))
+
+
+def build_dashboard_summary(session: Session, today: Optional[date] = None) -> schemas.DashboardSummary:
+    today = today or date.today()
+    grouped_schedule = _load_schedule(session)
+    first_day, last_day = _dashboard_days(today)
+    daily_rollups = session.exec(
+        select(DailyTrainingRollup)
+        .where(DailyTrainingRollup.day >= first_day, DailyTrainingRollup.day <= last_day)
+        .order_by(DailyTrainingRollup.day)
+    ).all()
+    week_days = [(today.weekday() + offset) % 7 for offset in range(0, 6)]
+    scheduled_workouts = _load_workouts(
+        session,
+        [entry.workout_id for day_index in week_days for entry in grouped_schedule.get(day_index, [])],
+    )
+    return _build_dashboard(session, today, grouped_schedule, scheduled_workouts, daily_rollups)
+
+
+def _build_dashboard(
+    session: Session,
+    today: date,
+    grouped_schedule: Dict[int, List[ProgramSchedule]],
+    scheduled_workouts: Dict[int, schemas.WorkoutOut],
+    daily_rollups: Sequence[DailyTrainingRollup],
+) -> schemas.DashboardSummary:
+    """Assemble the dashboard from the schedule, workouts and rollups already loaded.
+
+    ``scheduled_workouts`` must hold at least the workouts of the next six
+    days and ``daily_rollups`` at least the days of ``_dashboard_days``; the
+    focus, habits, metrics and streak are queried here.
+    """
+
+    weekday = today.weekday()
+    rollups_by_day = {rollup.day: rollup for rollup in daily_rollups}
 
     def workout_from_schedule(day_index: int) -> List[schemas.WorkoutOut]:
-        templates = [session.get(WorkoutTemplate, entry.workout_id) for entry in grouped_schedule.get(day_index, [])]
-        return [_build_workout(session, template) for template in templates if template]
+        workouts = (scheduled_workouts.get(entry.workout_id) for entry in grouped_schedule.get(day_index, []))
+        return [workout for workout in workouts if workout]
 
     todays_workouts = workout_from_schedule(weekday)
     if not todays_workouts:
         # fallback to first available workout
-        all_templates = session.exec(select(WorkoutTemplate)).all()
-        todays_workouts = [_build_workout(session, all_templates[0])] if all_templates else []
+        first_template_id = session.exec(select(WorkoutTemplate.id)).first()
+        if first_template_id in scheduled_workouts:
+            todays_workouts = [scheduled_workouts[first_template_id]]
+        else:
+            todays_workouts = (
+                list(_load_workouts(session, [first_template_id]).values())
+                if first_template_id is not None
+                else []
+            )
 
     today_workout = todays_workouts[0] if todays_workouts else schemas.WorkoutOut(
         id=0,
@@ -245,7 +663,7 @@ def get_dashboard_summary(session: Session) -> schemas.DashboardSummary:
 
     habit_logs = session.exec(
         select(DailyHabitLog)
-        .where(DailyHabitLog.day >= today - timedelta(days=14))
+        .where(DailyHabitLog.athlete_id == DEFAULT_ATHLETE_ID, DailyHabitLog.day >= today - timedelta(days=14))
         .order_by(DailyHabitLog.day.desc())
     ).all()
     habit_schemas = [
@@ -259,52 +677,31 @@ def get_dashboard_summary(session: Session) -> schemas.DashboardSummary:
         for habit in habit_logs
     ]
 
-    metric_logs = session.exec(
-        select(MetricLog).where(MetricLog.logged_at >= datetime.utcnow() - timedelta(days=30))
-    ).all()
-
-    lookback_days = [today - timedelta(days=offset) for offset in range(6, -1, -1)]
-    weekly_training_load: List[schemas.TrainingLoadPoint] = []
-    for current_day in lookback_days:
-        day_logs = [log for log in all_logs if log.performed_at.date() == current_day]
-        sessions_count = len(day_logs)
-        total_duration = sum(log.duration_minutes for log in day_logs)
-        average_rpe = round(sum(log.rpe for log in day_logs) / sessions_count, 1) if sessions_count else 0.0
-        training_load = int(sum(log.duration_minutes * log.rpe for log in day_logs))
-        weekly_training_load.append(
-            schemas.TrainingLoadPoint(
-                day=current_day,
-                sessions=sessions_count,
-                total_duration=total_duration,
-                average_rpe=average_rpe,
-                training_load=training_load,
-            )
+    # Rollups hold one row per day, so one-day windows are the days themselves.
+    load_days = windows.rolling(daily_rollups, _by_day, _ROLLUP_FIELDS, today - timedelta(days=6), today)
+    weekly_training_load = [
+        schemas.TrainingLoadPoint(
+            day=load_day.end,
+            sessions=load_day.stats["sessions"].sum,
+            total_duration=load_day.stats["total_duration"].sum,
+            average_rpe=_average_rpe(load_day),
+            training_load=load_day.stats["training_load"].sum,
         )
+        for load_day in load_days
+    ]
 
-    week_start = today - timedelta(days=6)
-    recent_habits = [habit for habit in habit_logs if habit.day >= week_start]
-    habit_days_logged = {habit.day for habit in recent_habits}
-    average_sleep = round(
-        sum(habit.sleep_hours for habit in recent_habits) / len(recent_habits),
-        1,
-    ) if recent_habits else 0.0
-    average_water = round(
-        sum(habit.water_intake_liters for habit in recent_habits) / len(recent_habits),
-        1,
-    ) if recent_habits else 0.0
-    average_readiness = round(
-        sum(habit.readiness_score for habit in recent_habits) / len(recent_habits),
-        1,
-    ) if recent_habits else 0.0
-    mood_counts = Counter(habit.mood for habit in recent_habits if habit.mood)
-    dominant_mood = mood_counts.most_common(1)[0][0] if mood_counts else None
+    recovery = windows.window(reversed(habit_logs), _by_day, _HABIT_FIELDS, today - timedelta(days=6), today)
+    average_sleep, average_water, average_readiness = (
+        round(recovery.stats[name].mean, 1) if recovery.stats[name].count else 0.0
+        for name in ("sleep_hours", "water_intake_liters", "readiness_score")
+    )
 
     recovery_summary = schemas.RecoverySummary(
         average_sleep_hours=average_sleep,
         average_water_intake_liters=average_water,
         average_readiness_score=average_readiness,
-        dominant_mood=dominant_mood,
-        logged_days=len(habit_days_logged),
+        dominant_mood=recovery.stats["mood"].mode,
+        logged_days=recovery.days,
         expected_days=7,
     )
 
@@ -312,87 +709,278 @@ def get_dashboard_summary(session: Session) -> schemas.DashboardSummary:
         today=today,
         weekday=weekday,
         schedule_by_day=grouped_schedule,
-        logs=all_logs,
+        rollups=daily_rollups,
     )
-    training_streak = _calculate_training_streak(all_logs, today)
+    streak = rollups.read_streak(session, today)
 
     return schemas.DashboardSummary(
         today_workout=today_workout,
         upcoming_workouts=upcoming,
         focus=focus_schema,
         habits=habit_schemas,
-        metrics=_group_metrics(metric_logs),
+        metrics=_tonnage_trend(session, since=today - timedelta(days=30))
+        + _dashboard_metrics(session, since=datetime.utcnow() - timedelta(days=30)),
         weekly_progress=weekly_progress,
-        training_streak_days=training_streak,
+        training_streak_days=streak.current_days,
+        longest_streak_days=streak.longest_days,
         weekly_training_load=weekly_training_load,
         recovery_summary=recovery_summary,
     )
 
 
+def _encode_cursor(performed_at: datetime, session_id: int) -> str:
+    return urlsafe_b64encode(f"{performed_at.isoformat()}|{session_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        performed_at, session_id = urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(performed_at), int(session_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def get_session_history(
+    session: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    workout_id: Optional[int] = None,
+    focus_area: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    min_rpe: Optional[int] = None,
+    max_rpe: Optional[int] = None,
+    athlete_id: int = DEFAULT_ATHLETE_ID,
+) -> schemas.SessionPage:
+    """Return one page of ``athlete_id``'s sessions, newest first, with their workout.
+
+    Pages are keyed on ``(performed_at, id)``: ``cursor`` encodes the last
+    row of the previous page and the next page starts strictly after it
+    through an index seek, so page cost does not grow with the depth of
+    the history. ``start`` is inclusive and ``end`` exclusive. The workout
+    columns come from the same query through a left join. Raises
+    ``ValueError`` for a malformed cursor.
+    """
+
+    query = (
+        select(
+            SessionLog.id,
+            SessionLog.performed_at,
+            SessionLog.duration_minutes,
+            SessionLog.rpe,
+            SessionLog.energy_level,
+            SessionLog.calories_burned,
+            SessionLog.notes,
+            WorkoutTemplate.title,
+            WorkoutTemplate.focus_area,
+            WorkoutTemplate.difficulty,
+        )
+        .outerjoin(WorkoutTemplate, WorkoutTemplate.id == SessionLog.workout_id)
+        .where(SessionLog.athlete_id == athlete_id)
+        .order_by(SessionLog.performed_at.desc(), SessionLog.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor is not None:
+        query = query.where(tuple_(SessionLog.performed_at, SessionLog.id) < tuple_(*_decode_cursor(cursor)))
+    if workout_id is not None:
+        query = query.where(SessionLog.workout_id == workout_id)
+    if focus_area is not None:
+        query = query.where(WorkoutTemplate.focus_area == focus_area)
+    if start is not None:
+        query = query.where(SessionLog.performed_at >= start)
+    if end is not None:
+        query = query.where(SessionLog.performed_at < end)
+    if min_rpe is not None:
+        query = query.where(SessionLog.rpe >= min_rpe)
+    if max_rpe is not None:
+        query = query.where(SessionLog.rpe <= max_rpe)
+
+    rows = session.exec(query).all()
+    items = [
+        schemas.SessionSummary(
+            id=session_id,
+            workout_title=title if title is not None else "Séance personnalisée",
+            focus_area=focus if focus is not None else "Personnalisé",
+            difficulty=difficulty if difficulty is not None else "Libre",
+            performed_at=performed_at,
+            duration_minutes=duration_minutes,
+            rpe=rpe,
+            energy_level=energy_level,
+            calories_burned=calories_burned,
+            notes=notes,
+        )
+        for (
+            session_id,
+            performed_at,
+            duration_minutes,
+            rpe,
+            energy_level,
+            calories_burned,
+            notes,
+            title,
+            focus,
+            difficulty,
+        ) in rows[:limit]
+    ]
+    next_cursor = _encode_cursor(items[-1].performed_at, items[-1].id) if len(rows) > limit else None
+    return schemas.SessionPage(items=items, next_cursor=next_cursor)
+
+
 def get_recent_sessions(session: Session, limit: int = 5) -> List[schemas.SessionSummary]:
-    logs = session.exec(
-        select(SessionLog)
-        .order_by(SessionLog.performed_at.desc())
-        .limit(limit)
-    ).all()
+    return get_session_history(session, limit=limit).items
 
-    summaries: List[schemas.SessionSummary] = []
-    for log in logs:
-        if log.id is None:
-            continue
-        workout = session.get(WorkoutTemplate, log.workout_id)
-        summaries.append(
-            schemas.SessionSummary(
-                id=log.id,
-                workout_title=workout.title if workout else "Séance personnalisée",
-                focus_area=workout.focus_area if workout else "Personnalisé",
-                difficulty=workout.difficulty if workout else "Libre",
-                performed_at=log.performed_at,
-                duration_minutes=log.duration_minutes,
-                rpe=log.rpe,
-                energy_level=log.energy_level,
-                calories_burned=log.calories_burned,
-                notes=log.notes,
+
+_schedule_cache = cache.VersionedCache(
+    "weekly_schedule", ProgramSchedule.__tablename__, WorkoutTemplate.__tablename__, maxsize=8
+)
+
+
+def _schedule_labels(rows: Iterable[Tuple[int, str, str]]) -> Dict[int, Tuple[str, str]]:
+    """Fold ``(day_of_week, workout_title, focus)`` rows into one label pair per weekday."""
+
+    titles: Dict[int, List[str]] = defaultdict(list)
+    focuses: Dict[int, List[str]] = defaultdict(list)
+    for day_of_week, title, focus in rows:
+        titles[day_of_week].append(title)
+        focuses[day_of_week].append(focus)
+    return {
+        dow: (
+            " / ".join(titles[dow]) if titles[dow] else "Repos ou mobilité",
+            " & ".join(sorted(set(focuses[dow]))) if focuses[dow] else "recovery",
+        )
+        for dow in range(7)
+    }
+
+
+def _expand_weekly_schedule(session: Session) -> Dict[int, Tuple[str, str]]:
+    """Map each weekday to its calendar ``(workout_title, focus)`` labels."""
+
+    def compute() -> Dict[int, Tuple[str, str]]:
+        return _schedule_labels(
+            session.exec(
+                select(ProgramSchedule.day_of_week, WorkoutTemplate.title, ProgramSchedule.focus)
+                .join(WorkoutTemplate, WorkoutTemplate.id == ProgramSchedule.workout_id)
+                .where(ProgramSchedule.athlete_id == DEFAULT_ATHLETE_ID)
+                .order_by(ProgramSchedule.day_of_week, ProgramSchedule.id)
             )
         )
 
-    return summaries
+    return _schedule_cache.get(session, "weekly", compute)
+
+
+def _month_days(month: int, year: int) -> Tuple[date, date]:
+    """First day of the month and first day of the next one."""
+
+    first_day = date(year, month, 1)
+    return first_day, first_day + timedelta(days=monthrange(year, month)[1])
 
 
 def get_calendar(session: Session, month: int, year: int) -> schemas.CalendarMonth:
-    total_days = monthrange(year, month)[1]
-    schedule_by_day: Dict[int, List[ProgramSchedule]] = defaultdict(list)
-    for entry in session.exec(select(ProgramSchedule)).all():
-        schedule_by_day[entry.day_of_week].append(entry)
+    first_day, next_month = _month_days(month, year)
+    completed_days = {
+        performed_at.date()
+        for performed_at in session.exec(
+            select(SessionLog.performed_at).where(
+                SessionLog.athlete_id == DEFAULT_ATHLETE_ID,
+                SessionLog.performed_at >= datetime.combine(first_day, time.min),
+                SessionLog.performed_at < datetime.combine(next_month, time.min),
+            )
+        )
+    }
+    return _build_calendar(month, year, _expand_weekly_schedule(session), completed_days)
+
 
-    logs = session.exec(select(SessionLog)).all()
-    completed_by_day: Dict[date, List[int]] = defaultdict(list)
-    for log in logs:
-        completed_by_day[log.performed_at.date()].append(log.workout_id)
+def get_calendar_range(session: Session, start: date, end: date) -> heatmap.Heatmap:
+    return heatmap.training_heatmap(session, start, end, _expand_weekly_schedule(session))
 
+
+def _build_calendar(
+    month: int, year: int, schedule: Dict[int, Tuple[str, str]], completed_days: Set[date]
+) -> schemas.CalendarMonth:
+    first_day, next_month = _month_days(month, year)
+    today = date.today()
     days: List[schemas.CalendarDay] = []
-    for day in range(1, total_days + 1):
-        current_date = date(year, month, day)
-        dow = current_date.weekday()
-        scheduled = schedule_by_day.get(dow, [])
-        titles = []
-        focuses = []
-        for item in scheduled:
-            workout = session.get(WorkoutTemplate, item.workout_id)
-            if workout:
-                titles.append(workout.title)
-                focuses.append(item.focus)
-        workout_title = " / ".join(titles) if titles else "Repos ou mobilité"
-        focus = " & ".join(sorted(set(focuses))) if focuses else "recovery"
-        completed = current_date in completed_by_day
+    for offset in range((next_month - first_day).days):
+        current_date = first_day + timedelta(days=offset)
+        workout_title, focus = schedule[current_date.weekday()]
         days.append(
             schemas.CalendarDay(
                 date=current_date,
                 workout_title=workout_title,
                 focus=focus,
-                is_today=current_date == date.today(),
-                is_completed=completed,
+                is_today=current_date == today,
+                is_completed=current_date in completed_days,
             )
         )
 
     return schemas.CalendarMonth(month=month, year=year, days=days)
+
+
+def get_bootstrap(session: Session, month: int, year: int, recent_limit: int = 5) -> schemas.Bootstrap:
+    """Build the five startup views of the client from one shared load.
+
+    The exercises, templates, schedule and daily rollups are each read once
+    and feed every view that needs them: the catalog lists, the dashboard's
+    planned workouts, the calendar labels (the schedule joined to the loaded
+    titles) and its completed days (rollup days with sessions). The recent
+    sessions are the first page of ``get_session_history``, so ties on
+    ``performed_at`` come out in the same order. Each payload equals what
+    its own endpoint returns. The dashboard is cached under the clock and table versions read
+    before any load, so a commit landing during the loads cannot be stored
+    under versions that already include it.
+    """
+
+    clock = _dashboard_clock()
+    versions = _dashboard_snapshot.versions(session)
+    exercises = list_exercises(session)
+    workouts = _load_workouts(session, exercises={exercise.id: exercise for exercise in exercises})
+    grouped_schedule = _load_schedule(session)
+
+    today = clock[0]
+    first_day, last_day = _dashboard_days(today)
+    month_start, next_month = _month_days(month, year)
+    daily_rollups = session.exec(
+        select(DailyTrainingRollup)
+        .where(
+            or_(
+                DailyTrainingRollup.day.between(first_day, last_day),
+                and_(DailyTrainingRollup.day >= month_start, DailyTrainingRollup.day < next_month),
+            )
+        )
+        .order_by(DailyTrainingRollup.day)
+    ).all()
+
+    labels = _schedule_labels(
+        (day_of_week, workouts[entry.workout_id].title, entry.focus)
+        for day_of_week, entries in sorted(grouped_schedule.items())
+        for entry in entries
+        if entry.workout_id in workouts
+    )
+    completed_days = {
+        rollup.day for rollup in daily_rollups if rollup.sessions and month_start <= rollup.day < next_month
+    }
+
+    return schemas.Bootstrap(
+        dashboard=_dashboard_snapshot.get(
+            session,
+            clock,
+            lambda: _build_dashboard(session, today, grouped_schedule, workouts, daily_rollups),
+            versions,
+        ),
+        workouts=list(workouts.values()),
+        calendar=_build_calendar(month, year, labels, completed_days),
+        exercises=exercises,
+        recent_sessions=get_recent_sessions(session, recent_limit),
+    )
+
+
+def create_athlete(session: Session, payload: schemas.AthleteIn) -> schemas.AthleteOut:
+    athlete = Athlete(name=payload.name)
+    session.add(athlete)
+    session.commit()
+    session.refresh(athlete)
+    return schemas.AthleteOut(id=athlete.id, name=athlete.name)
+
+
+def get_roster(session: Session, day: date) -> roster.Roster:
+    return roster.team_roster(session, day)
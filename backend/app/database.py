@@ -1,22 +1,137 @@
-"""Database configuration for the sport training backend."""
+"""Database configuration for the sport training backend.
+
+Connection settings are read from the environment so each host can be tuned
+without code changes:
+
+``SPORT_DB_PATH``
+    SQLite file (default ``backend/data/sport.db``).
+``SPORT_SQLITE_JOURNAL_MODE`` / ``SPORT_SQLITE_SYNCHRONOUS``
+    Journal mode and durability level (default ``WAL`` / ``NORMAL``).
+``SPORT_SQLITE_MMAP_SIZE``
+    Bytes of the file mapped in memory (default 256 MiB).
+``SPORT_SQLITE_CACHE_SIZE``
+    Page cache per connection, negative values are KiB (default ``-65536``).
+``SPORT_SQLITE_BUSY_TIMEOUT_MS``
+    How long a connection waits for a lock (default 5000).
+``SPORT_DB_READ_POOL_SIZE`` / ``SPORT_DB_READ_POOL_OVERFLOW``
+    Read-only connections kept open / allowed on top (default 8 / 4).
+``SPORT_DB_POOL_TIMEOUT``
+    Seconds to wait for a pooled connection (default 30).
+``SPORT_CACHE_POLL_INTERVAL``
+    Seconds between two background checks of the writes made by other
+    processes, which rebuild the snapshots early (default 1). Reads check
+    for such writes themselves and never wait for it.
+
+Writes go through a single writer connection, reads through a pool of
+read-only connections; in WAL mode readers are never blocked by the writer.
+"""
 from __future__ import annotations
 
-from contextlib import contextmanager
+import os
+from contextlib import asynccontextmanager, contextmanager
 from pathlib import Path
-from typing import Iterator
+from typing import Any, AsyncIterator, Iterator, List, Optional, Tuple
 
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-DB_PATH = Path(__file__).resolve().parent.parent / "data" / "sport.db"
+# Registers the write tracking on every Session, so the writes of every
+# process using this module reach ``TableVersion``.
+from . import cache  # noqa: F401
+
+DB_PATH = Path(
+    os.getenv("SPORT_DB_PATH", Path(__file__).resolve().parent.parent / "data" / "sport.db")
+).resolve()
 DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+SQLITE_JOURNAL_MODE = os.getenv("SPORT_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SPORT_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SPORT_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SPORT_SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SPORT_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+READ_POOL_SIZE = int(os.getenv("SPORT_DB_READ_POOL_SIZE", "8"))
+READ_POOL_OVERFLOW = int(os.getenv("SPORT_DB_READ_POOL_OVERFLOW", "4"))
+POOL_TIMEOUT = float(os.getenv("SPORT_DB_POOL_TIMEOUT", "30"))
+CACHE_POLL_INTERVAL = float(os.getenv("SPORT_CACHE_POLL_INTERVAL", "1"))
+
+
+def configure_sqlite(bind: Engine, readonly: bool = False) -> None:
+    """Apply the connection pragmas to every new connection of ``bind``."""
+
+    @event.listens_for(bind, "connect")
+    def _set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        if readonly:
+            cursor.execute("PRAGMA query_only = ON")
+        else:
+            cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE:d}")
+        cursor.execute(f"PRAGMA cache_size = {SQLITE_CACHE_SIZE:d}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS:d}")
+        cursor.close()
+
+
+def sqlite_engine(path: Path) -> Engine:
+    """Return a configured synchronous engine on the SQLite file at ``path``."""
+
+    bind = create_engine(f"sqlite:///{path}", echo=False, connect_args={"check_same_thread": False})
+    configure_sqlite(bind)
+    return bind
+
+
 sqlite_url = f"sqlite:///{DB_PATH}"
-engine = create_engine(sqlite_url, echo=False, connect_args={"check_same_thread": False})
+# Used by init_db, the seed and the command line tools.
+engine = sqlite_engine(DB_PATH)
+
+# Single writer connection: SQLite serialises writes anyway, queueing them in
+# the pool avoids "database is locked" retries between concurrent requests.
+write_engine = create_engine(
+    sqlite_url,
+    echo=False,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=POOL_TIMEOUT,
+)
+configure_sqlite(write_engine)
+
+read_url = f"sqlite:///{DB_PATH.as_uri()}?mode=ro&uri=true"
+read_engine = create_engine(
+    read_url,
+    echo=False,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+)
+configure_sqlite(read_engine, readonly=True)
 
+# Async read-only pool, only used by ``app.loadtest`` to compare both paths.
+async_read_engine = create_async_engine(
+    read_url.replace("sqlite://", "sqlite+aiosqlite://", 1),
+    echo=False,
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_OVERFLOW,
+    pool_timeout=POOL_TIMEOUT,
+)
+configure_sqlite(async_read_engine.sync_engine, readonly=True)
 
-def init_db() -> None:
-    """Create all tables in the database."""
-    SQLModel.metadata.create_all(engine)
+
+def init_db(bind: Optional[Engine] = None) -> None:
+    """Create all tables in the database (``engine`` by default) and apply pending migrations."""
+    from .migrations import upgrade  # migrations depend on modules importing this one
+
+    bind = bind or engine
+    SQLModel.metadata.create_all(bind)
+    upgrade(bind)
 
 
 @contextmanager
@@ -24,3 +139,45 @@ def get_session() -> Iterator[Session]:
     """Provide a transactional scope around a series of operations."""
     with Session(engine) as session:
         yield session
+
+
+@contextmanager
+def get_write_session() -> Iterator[Session]:
+    """Session on the single writer connection, for the routes that write."""
+    with Session(write_engine, expire_on_commit=False) as session:
+        yield session
+
+
+@contextmanager
+def get_read_session() -> Iterator[Session]:
+    """Session on the read-only pool, for routes that never write."""
+    with Session(read_engine, expire_on_commit=False) as session:
+        yield session
+
+
+@asynccontextmanager
+async def get_async_read_session() -> AsyncIterator[AsyncSession]:
+    """Async counterpart of ``get_read_session``, used by ``app.loadtest``."""
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def dispose_engines() -> None:
+    write_engine.dispose()
+    read_engine.dispose()
+
+
+@contextmanager
+def record_statements(bind: Engine = engine) -> Iterator[List[Tuple[str, Any]]]:
+    """Collect every ``(statement, parameters)`` sent to ``bind`` while the block runs."""
+
+    statements: List[Tuple[str, Any]] = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany) -> None:
+        statements.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", _record)
+    try:
+        yield statements
+    finally:
+        event.remove(bind, "before_cursor_execute", _record)
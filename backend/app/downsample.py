@@ -0,0 +1,57 @@
+"""Largest-triangle-three-buckets downsampling over NumPy arrays.
+
+LTTB keeps the first and last points and, for every bucket in between, the
+point forming the largest triangle with the point kept in the previous bucket
+and the average of the next bucket. Peaks and troughs therefore survive, which
+plain striding or averaging would flatten.
+"""
+from __future__ import annotations
+
+import numpy as np
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Return the indices of the ``threshold`` points LTTB keeps from ``(x, y)``.
+
+    ``x`` must be sorted. Series that already fit are returned whole.
+    """
+
+    size = len(x)
+    if threshold >= size or threshold < 3:
+        return np.arange(size)
+
+    # Bucket boundaries for the ``threshold - 2`` inner buckets; the first and
+    # last points are buckets of their own.
+    edges = np.floor(np.linspace(1, size - 1, threshold - 1)).astype(np.intp)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Average of every bucket, vectorised with cumulative sums; the point after
+    # the last inner bucket is the final point itself. Timestamps are shifted
+    # to the origin first so the running sums keep their precision.
+    x = x - x[0]
+    x_sums = np.concatenate(([0.0], np.cumsum(x)))
+    y_sums = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    next_x = np.append((x_sums[ends[1:]] - x_sums[starts[1:]]) / counts[1:], x[-1])
+    next_y = np.append((y_sums[ends[1:]] - y_sums[starts[1:]]) / counts[1:], y[-1])
+
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, size - 1
+    previous = 0
+    for bucket, (start, end) in enumerate(zip(starts, ends)):
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        # Twice the triangle area; the constant factor does not change argmax.
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (bucket_y - y[previous])
+            - (x[previous] - bucket_x) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int):
+    """Downsample ``(x, y)`` to at most ``threshold`` points."""
+
+    indices = lttb_indices(x, y, threshold)
+    return x[indices], y[indices]
@@ -0,0 +1,81 @@
+"""Columnar training calendar over long date ranges.
+
+One date-bounded query reads the per-day session counts and loads from
+``DailyTrainingRollup`` (the sessions already grouped by day) off the DBAPI
+cursor; they are scattered into dense arrays with one slot per day. The
+weekly ``ProgramSchedule`` is expanded with NumPy: each day's weekday picks
+its label out of the seven weekday labels, so a range of several years
+costs the same handful of array operations as a month. Labels are sent
+once, and each day refers to its label by index.
+"""
+from __future__ import annotations
+
+from datetime import date
+from itertools import chain
+from typing import Dict, List, NamedTuple, Tuple
+
+import numpy as np
+from sqlalchemy import Integer, cast, func, select
+from sqlmodel import Session
+
+from .models import DailyTrainingRollup
+from .timeseries import UNIX_EPOCH_JULIAN_DAY
+
+# Longest range served at once, about ten years.
+MAX_DAYS = 3660
+# 1970-01-01 was a Thursday (weekday 3, Monday being 0).
+_EPOCH_WEEKDAY = 3
+
+
+class Heatmap(NamedTuple):
+    start: date
+    end: date
+    workout_titles: List[str]  # distinct labels, indexed by ``workout``
+    focuses: List[str]
+    workout: np.ndarray  # label index of each day
+    completed: np.ndarray
+    sessions: np.ndarray
+    training_load: np.ndarray
+
+
+def _day_number(day: date) -> int:
+    return int(np.datetime64(day, "D").astype(np.int64))
+
+
+def training_heatmap(
+    session: Session, start: date, end: date, schedule: Dict[int, Tuple[str, str]]
+) -> Heatmap:
+    """Return the calendar of every day from ``start`` to ``end`` inclusive.
+
+    ``schedule`` maps each weekday to its ``(workout_title, focus)`` labels.
+    """
+
+    first = _day_number(start)
+    length = _day_number(end) - first + 1
+
+    rollup = DailyTrainingRollup.__table__.c
+    query = select(
+        cast(func.julianday(rollup.day) - UNIX_EPOCH_JULIAN_DAY, Integer), rollup.sessions, rollup.training_load
+    ).where(rollup.day.between(start, end), rollup.sessions > 0)
+    result = session.connection().execute(query)
+    rows = result.cursor.fetchall()
+    result.close()
+    values = np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=3 * len(rows)).reshape(-1, 3)
+    sessions = np.zeros(length, dtype=np.int64)
+    training_load = np.zeros(length, dtype=np.int64)
+    sessions[values[:, 0] - first] = values[:, 1]
+    training_load[values[:, 0] - first] = values[:, 2]
+
+    labels = sorted(set(schedule.values()))
+    label_of_weekday = np.array([labels.index(schedule[weekday]) for weekday in range(7)])
+    weekdays = (np.arange(first, first + length) + _EPOCH_WEEKDAY) % 7
+    return Heatmap(
+        start=start,
+        end=end,
+        workout_titles=[title for title, _ in labels],
+        focuses=[focus for _, focus in labels],
+        workout=label_of_weekday[weekdays],
+        completed=sessions > 0,
+        sessions=sessions,
+        training_load=training_load,
+    )
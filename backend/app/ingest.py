@@ -0,0 +1,228 @@
+"""Streaming bulk ingestion of session logs.
+
+The request body is parsed while it arrives, either as a JSON array or as
+NDJSON (one object per line). Each row is validated on its own: invalid rows
+are reported with their index and skipped, valid rows are written in large
+batches, one transaction per batch.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, AsyncIterator, List, Set
+
+from pydantic import ValidationError
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import crud, schemas
+
+NDJSON_MEDIA_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+MAX_REPORTED_ERRORS = 1000
+# Longest text one row may span while it is incomplete (bytes of an NDJSON
+# line, characters of an array element): past it the row is rejected
+# instead of buffering more of the body.
+MAX_ROW_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# Longest partial token that can end a chunk (``-Infinity``, a ``\\uXXXX``
+# escape): a decoding error this close to the end may only mean the value
+# continues in the next chunk.
+_TOKEN_TAIL = 12
+
+
+class MalformedJSON(ValueError):
+    """Raised for a row, or the rest of a JSON array, that cannot be decoded."""
+
+
+async def iter_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Yield one decoded value, or a ``MalformedJSON``, per non-empty line.
+
+    A line still incomplete past ``MAX_ROW_SIZE`` bytes is reported once and
+    the rest of it is skipped without being buffered.
+    """
+
+    buffer = b""
+    skipping = False
+    async for chunk in chunks:
+        *lines, buffer = (buffer + chunk).split(b"\n")
+        if skipping:
+            if not lines:
+                buffer = b""
+                continue
+            del lines[0]  # the end of the overlong line
+            skipping = False
+        for line in lines:
+            if line.strip():
+                yield _decode_line(line)
+        if len(buffer) > MAX_ROW_SIZE:
+            yield MalformedJSON(f"Line longer than {MAX_ROW_SIZE} bytes")
+            buffer, skipping = b"", True
+    if buffer.strip():
+        yield _decode_line(buffer)
+
+
+def _decode_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError as exc:
+        return MalformedJSON(str(exc))
+
+
+def _truncated(exc: json.JSONDecodeError, length: int) -> bool:
+    """Whether decoding may have failed only because the text stops at ``length``."""
+
+    return exc.pos >= length - _TOKEN_TAIL or exc.msg.startswith("Unterminated string")
+
+
+async def iter_json_array(chunks: AsyncIterator[bytes]) -> AsyncIterator[Any]:
+    """Yield the elements of a top-level JSON array as they are completed.
+
+    A syntax error cannot be recovered from inside an array, so it is yielded
+    as a final ``MalformedJSON`` and parsing stops. More of the body is only
+    read when the element may be truncated, never past ``MAX_ROW_SIZE``
+    characters for one element, so a malformed body fails without being
+    buffered whole.
+    """
+
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    state = "start"  # start -> value -> separator -> ... -> end
+
+    async def more() -> bool:
+        nonlocal buffer, position
+        try:
+            chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            return False
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+        return True
+
+    while True:
+        while position < len(buffer) and buffer[position] in _WHITESPACE:
+            position += 1
+        if position == len(buffer):
+            if await more():
+                continue
+            if state != "end":
+                yield MalformedJSON("Unexpected end of the JSON array")
+            return
+
+        if state == "end":
+            yield MalformedJSON("Unexpected data after the JSON array")
+            return
+        if state == "start":
+            if buffer[position] != "[":
+                yield MalformedJSON("Expected a JSON array")
+                return
+            position += 1
+            state = "first"
+        elif state in ("first", "value"):
+            if state == "first" and buffer[position] == "]":
+                position += 1
+                state = "end"
+                continue
+            try:
+                value, end = _decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as exc:
+                if not _truncated(exc, len(buffer)):
+                    yield MalformedJSON(str(exc))
+                    return
+                if len(buffer) - position > MAX_ROW_SIZE:
+                    yield MalformedJSON(f"Array element longer than {MAX_ROW_SIZE} characters")
+                    return
+                if await more():
+                    continue
+                yield MalformedJSON(str(exc))
+                return
+            except RecursionError:
+                yield MalformedJSON("JSON value nested too deeply")
+                return
+            if end == len(buffer) and len(buffer) - position <= MAX_ROW_SIZE and await more():
+                # A number may continue in the next chunk: decode it again.
+                continue
+            position = end
+            state = "separator"
+            yield value
+        else:
+            character = buffer[position]
+            position += 1
+            if character == ",":
+                state = "value"
+            elif character == "]":
+                state = "end"
+            else:
+                yield MalformedJSON(f"Expected ',' or ']' but found {character!r}")
+                return
+
+
+async def ingest_sessions(
+    session: Session,
+    rows: AsyncIterator[Any],
+    batch_size: int,
+) -> schemas.BulkImportResult:
+    """Validate ``rows`` one by one and insert the valid ones in batches.
+
+    ``session`` is the writer session; its queries run in the threadpool. It
+    only holds the writer connection while a batch is written, never while
+    waiting for the client's body.
+    """
+
+    known_workouts: Set[int] = await run_in_threadpool(crud.list_workout_ids, session)
+    known_athletes: Set[int] = await run_in_threadpool(crud.list_athlete_ids, session)
+    # End the read transaction: it would keep the single writer connection
+    # checked out until the first batch commits, blocking every other write.
+    await run_in_threadpool(session.rollback)
+    result = schemas.BulkImportResult(received=0, inserted=0, failed=0, errors=[])
+    batch: List[schemas.SessionLogIn] = []
+
+    def reject(index: int, errors: List[Any]) -> None:
+        result.failed += 1
+        if len(result.errors) < MAX_REPORTED_ERRORS:
+            result.errors.append(schemas.BulkRowError(index=index, errors=errors))
+
+    async for value in rows:
+        index = result.received
+        result.received += 1
+        if isinstance(value, MalformedJSON):
+            reject(index, [{"loc": ["__root__"], "msg": str(value), "type": "value_error.jsondecode"}])
+            continue
+        try:
+            payload = schemas.SessionLogIn.parse_obj(value)
+        except ValidationError as exc:
+            reject(index, exc.errors())
+            continue
+        if payload.workout_id not in known_workouts:
+            reject(
+                index,
+                [
+                    {
+                        "loc": ["workout_id"],
+                        "msg": f"Workout {payload.workout_id} not found",
+                        "type": "value_error.missing_workout",
+                    }
+                ],
+            )
+            continue
+        if payload.athlete_id not in known_athletes:
+            reject(
+                index,
+                [
+                    {
+                        "loc": ["athlete_id"],
+                        "msg": f"Athlete {payload.athlete_id} not found",
+                        "type": "value_error.missing_athlete",
+                    }
+                ],
+            )
+            continue
+        batch.append(payload)
+        if len(batch) >= batch_size:
+            result.inserted += await run_in_threadpool(crud.log_sessions_bulk, session, batch)
+            batch = []
+
+    result.inserted += await run_in_threadpool(crud.log_sessions_bulk, session, batch)
+    return result
@@ -0,0 +1,327 @@
+"""Per-route request metrics in the Prometheus text format.
+
+``InstrumentationMiddleware`` opens a ``RequestStats`` for every HTTP request
+and SQLAlchemy event hooks add each statement to it: its duration, and the
+rows read from its cursor, counted as they are fetched. Routes built
+with ``InstrumentedRoute`` also split the handler time between the endpoint
+function (queries, ORM hydration and the Python aggregation in ``crud``)
+and the rest (``response_model`` validation, encoding and rendering). The
+totals per ``method``/``route`` are served by ``render_metrics``.
+
+``SPORT_SLOW_REQUEST_MS``
+    Requests slower than this are logged with their SQL statements
+    (default 500).
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+SLOW_REQUEST_MS = float(os.getenv("SPORT_SLOW_REQUEST_MS", "500"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RequestStats:
+    """What one request spent, filled in while it runs."""
+
+    statements: List[Tuple[str, float]] = field(default_factory=list)
+    sql_seconds: float = 0.0
+    rows_fetched: int = 0
+    endpoint_seconds: float = 0.0
+    handler_seconds: float = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    stats.statements.append((statement, elapsed))
+    stats.sql_seconds += elapsed
+    if cursor.description is not None and context is not None:
+        # The result is built from ``context.cursor`` right after this hook.
+        context.cursor = _CountingCursor(cursor, stats)
+
+
+class _CountingCursor:
+    """DBAPI cursor proxy adding the rows it hands out to a request's stats.
+
+    Rows are counted as the result fetches them, so nothing is buffered and
+    a result that is never read to the end only counts what was read.
+    """
+
+    def __init__(self, cursor: Any, stats: RequestStats) -> None:
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self) -> Any:
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows_fetched += 1
+        return row
+
+    def fetchmany(self, *args: Any, **kwargs: Any) -> List[Any]:
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.rows_fetched += len(rows)
+        return rows
+
+    def fetchall(self) -> List[Any]:
+        rows = self._cursor.fetchall()
+        self._stats.rows_fetched += len(rows)
+        return rows
+
+    def __iter__(self) -> Any:
+        for row in self._cursor:
+            self._stats.rows_fetched += 1
+            yield row
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class _Histogram:
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.total += value
+
+
+class _RouteMetrics:
+    def __init__(self) -> None:
+        self.latency = _Histogram()
+        self.statuses: Dict[int, int] = {}
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.rows_fetched = 0
+        self.endpoint_seconds = 0.0
+        self.serialization_seconds = 0.0
+
+
+class Registry:
+    """Thread-safe totals per ``(method, route)``."""
+
+    def __init__(self) -> None:
+        self._routes: Dict[Tuple[str, str], _RouteMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats) -> None:
+        with self._lock:
+            metrics = self._routes.get((method, route))
+            if metrics is None:
+                metrics = self._routes[(method, route)] = _RouteMetrics()
+            metrics.latency.observe(elapsed)
+            metrics.statuses[status] = metrics.statuses.get(status, 0) + 1
+            metrics.sql_statements += len(stats.statements)
+            metrics.sql_seconds += stats.sql_seconds
+            metrics.rows_fetched += stats.rows_fetched
+            metrics.endpoint_seconds += stats.endpoint_seconds
+            metrics.serialization_seconds += max(0.0, stats.handler_seconds - stats.endpoint_seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._routes.clear()
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+
+        with self._lock:
+            routes = sorted(self._routes.items())
+            lines: List[str] = [
+                "# HELP sport_http_requests_total Requests handled, by status code.",
+                "# TYPE sport_http_requests_total counter",
+            ]
+            for (method, route), metrics in routes:
+                for status, count in sorted(metrics.statuses.items()):
+                    lines.append(
+                        f'sport_http_requests_total{{{_labels(method, route)},status="{status}"}} {count}'
+                    )
+
+            lines += [
+                "# HELP sport_http_request_duration_seconds Request latency, up to the last body chunk.",
+                "# TYPE sport_http_request_duration_seconds histogram",
+            ]
+            for (method, route), metrics in routes:
+                labels = _labels(method, route)
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), metrics.latency.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'sport_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+                lines.append(f"sport_http_request_duration_seconds_sum{{{labels}}} {metrics.latency.total!r}")
+                lines.append(f"sport_http_request_duration_seconds_count{{{labels}}} {cumulative}")
+
+            for name, kind, description, value in (
+                ("sport_sql_statements_total", "counter", "SQL statements executed.", "sql_statements"),
+                ("sport_sql_duration_seconds_total", "counter", "Time spent executing SQL.", "sql_seconds"),
+                ("sport_sql_rows_fetched_total", "counter", "Rows fetched from SQL cursors.", "rows_fetched"),
+                (
+                    "sport_endpoint_duration_seconds_total",
+                    "counter",
+                    "Time in endpoint functions: SQL, ORM hydration and Python aggregation.",
+                    "endpoint_seconds",
+                ),
+                (
+                    "sport_serialization_duration_seconds_total",
+                    "counter",
+                    "Handler time outside the endpoint function: response validation, encoding and rendering.",
+                    "serialization_seconds",
+                ),
+            ):
+                lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+                for (method, route), metrics in routes:
+                    lines.append(f"{name}{{{_labels(method, route)}}} {getattr(metrics, value)!r}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(method: str, route: str) -> str:
+    route = route.replace("\\", "\\\\").replace('"', '\\"')
+    return f'method="{method}",route="{route}"'
+
+
+REGISTRY = Registry()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
+
+
+class InstrumentationMiddleware:
+    """ASGI middleware timing each request and recording it in ``registry``.
+
+    The latency runs until the last body chunk is sent, so streamed
+    responses are measured in full.
+    """
+
+    def __init__(self, app: ASGIApp, registry: Registry = REGISTRY, slow_request_ms: float = SLOW_REQUEST_MS) -> None:
+        self.app = app
+        self.registry = registry
+        self.slow_request_ms = slow_request_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - started
+            # Label by the route template so path parameters do not multiply series.
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            self.registry.record(scope["method"], path, status, elapsed, stats)
+            if elapsed * 1000 >= self.slow_request_ms:
+                _log_slow_request(scope["method"], scope["path"], status, elapsed, stats)
+
+
+def _log_slow_request(method: str, path: str, status: int, elapsed: float, stats: RequestStats) -> None:
+    queries = "\n".join(
+        f"  {duration * 1000:8.2f} ms  {' '.join(statement.split())}" for statement, duration in stats.statements
+    )
+    logger.warning(
+        "Slow request %s %s -> %d in %.1f ms (%d statements, %.1f ms SQL, %d rows)\n%s",
+        method,
+        path,
+        status,
+        elapsed * 1000,
+        len(stats.statements),
+        stats.sql_seconds * 1000,
+        stats.rows_fetched,
+        queries,
+    )
+
+
+class InstrumentedRoute(APIRoute):
+    """``APIRoute`` that times its endpoint function apart from the rest of the handler."""
+
+    def get_route_handler(self) -> Callable[[Request], Any]:
+        self.dependant.call = _timed(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def instrumented_handler(request: Request) -> Response:
+            started = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                stats = _current.get()
+                if stats is not None:
+                    stats.handler_seconds += time.perf_counter() - started
+
+        return instrumented_handler
+
+
+def _timed(call: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap an endpoint so its run time is added to the current request."""
+
+    if asyncio.iscoroutinefunction(call):
+
+        @functools.wraps(call)
+        async def timed_coroutine(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                _add_endpoint_time(time.perf_counter() - started)
+
+        return timed_coroutine
+
+    @functools.wraps(call)
+    def timed_function(*args: Any, **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            _add_endpoint_time(time.perf_counter() - started)
+
+    return timed_function
+
+
+def _add_endpoint_time(elapsed: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.endpoint_seconds += elapsed
@@ -0,0 +1,109 @@
+"""Side-by-side comparison of the sync and async database paths under load.
+
+``sync`` is the path used by the GET routes: each call is handed to the
+Starlette threadpool and runs ``crud`` on a blocking ``Session`` from the
+read-only pool. ``async`` runs ``async_crud`` on an ``AsyncSession`` from the
+aiosqlite read-only pool, driven by the event loop. Both run the same read
+workload against the configured database::
+
+    python -m app.loadtest --concurrency 200 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date
+from typing import Awaitable, Callable, Dict, List
+
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import async_crud, crud
+from .database import async_read_engine, get_async_read_session, get_read_session, init_db, read_engine
+
+
+def _sync_workload() -> List[Callable[[Session], object]]:
+    today = date.today()
+    return [
+        crud.get_dashboard_summary,
+        lambda session: crud.get_calendar(session, today.month, today.year),
+        lambda session: crud.get_recent_sessions(session, limit=20),
+    ]
+
+
+def _async_workload() -> List[Callable[..., Awaitable[object]]]:
+    today = date.today()
+    return [
+        async_crud.get_dashboard_summary,
+        lambda session: async_crud.get_calendar(session, today.month, today.year),
+        lambda session: async_crud.get_recent_sessions(session, limit=20),
+    ]
+
+
+async def _sync_call(index: int) -> None:
+    call = _sync_workload()[index % 3]
+
+    def run() -> None:
+        with get_read_session() as session:
+            call(session)
+
+    await run_in_threadpool(run)
+
+
+async def _async_call(index: int) -> None:
+    call = _async_workload()[index % 3]
+    async with get_async_read_session() as session:
+        await call(session)
+
+
+async def _drive(call: Callable[[int], Awaitable[None]], concurrency: int, requests: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def client() -> None:
+        for index in counter:
+            started = time.perf_counter()
+            await call(index)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "elapsed_s": elapsed,
+    }
+
+
+async def compare(concurrency: int, requests: int) -> Dict[str, Dict[str, float]]:
+    """Run the workload in both modes and return their latency statistics."""
+
+    results = {}
+    for mode, call in (("sync", _sync_call), ("async", _async_call)):
+        await _drive(call, min(concurrency, 10), 30)  # warm caches and pools
+        results[mode] = await _drive(call, concurrency, requests)
+    read_engine.dispose()
+    await async_read_engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+
+    init_db()
+    results = asyncio.run(compare(args.concurrency, args.requests))
+    print(f"{'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    for mode, stats in results.items():
+        print(f"{mode:<6} {stats['throughput']:>9.1f} {stats['p50_ms']:>9.1f} {stats['p95_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
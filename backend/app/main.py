@@ -1,17 +1,42 @@
 """FastAPI application exposing the sport training services."""
 from __future__ import annotations
 
-from datetime import date
-from typing import List
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
+import numpy as np
+
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
-from . import crud, schemas
-from .database import get_session, init_db
+from . import (
+    cache,
+    crud,
+    export,
+    heatmap,
+    ingest,
+    instrumentation,
+    refresh,
+    schemas,
+    serialization,
+    timeseries,
+)
+from .database import (
+    CACHE_POLL_INTERVAL,
+    dispose_engines,
+    get_read_session,
+    get_write_session,
+    init_db,
+    read_engine,
+)
+from .models import DEFAULT_ATHLETE_ID, Exercise, WorkoutExercise, WorkoutTemplate
 
 app = FastAPI(title="Programme Sportif Ultra", version="1.0.0")
+app.router.route_class = instrumentation.InstrumentedRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,32 +45,114 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(instrumentation.InstrumentationMiddleware)
+
+
+def _build_dashboard() -> None:
+    with get_read_session() as session:
+        crud.get_dashboard_summary(session)
+
+
+async def _rebuild_dashboard() -> None:
+    await run_in_threadpool(_build_dashboard)
+
+
+_dashboard_refresher = refresh.SnapshotRefresher(
+    "dashboard", crud.DASHBOARD_TABLES, _rebuild_dashboard, crud.next_dashboard_rollover
+)
+_write_poller = refresh.WritePoller(read_engine, CACHE_POLL_INTERVAL)
 
 
 @app.on_event("startup")
-def on_startup() -> None:
+async def on_startup() -> None:
     init_db()
+    _write_poller.start()
+    _dashboard_refresher.start()
+
 
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await _dashboard_refresher.stop()
+    await _write_poller.stop()
+    dispose_engines()
 
-def get_db_session() -> Session:
-    with get_session() as session:
+
+def get_db_session() -> Iterator[Session]:
+    with get_write_session() as session:
+        yield session
+
+
+def get_read_db_session() -> Iterator[Session]:
+    with get_read_session() as session:
         yield session
 
 
+class _CachedBody(NamedTuple):
+    body: bytes
+    etag: str
+
+
+_catalog_cache = cache.VersionedCache(
+    "catalog",
+    Exercise.__tablename__,
+    WorkoutTemplate.__tablename__,
+    WorkoutExercise.__tablename__,
+    maxsize=256,
+)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in header.split(",")}
+    return "*" in candidates or etag in candidates
+
+
+def _catalog_response(request: Request, session: Session, key: Any, load: Callable[[Session], Any]) -> Response:
+    """Serve catalog data from the versioned cache with a strong ETag.
+
+    A conditional request whose ETag matches a cached body is answered with
+    304 after the cache's write check, without loading or encoding anything.
+    """
+
+    def render() -> _CachedBody:
+        body = serialization.dumps(load(session))
+        return _CachedBody(body=body, etag=f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+
+    cached = _catalog_cache.get(session, key, render)
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, cached.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=cached.body, media_type=serialization.JSON_MEDIA_TYPE, headers=headers)
+
+
 @app.get("/api/dashboard", response_model=schemas.DashboardSummary)
-def read_dashboard(session: Session = Depends(get_db_session)) -> schemas.DashboardSummary:
-    return crud.get_dashboard_summary(session)
+def read_dashboard(session: Session = Depends(get_read_db_session)) -> Response:
+    return serialization.json_response(crud.get_dashboard_summary(session))
+
+
+@app.get("/api/bootstrap", response_model=schemas.Bootstrap)
+def read_bootstrap(
+    month: int = Query(default=date.today().month, ge=1, le=12),
+    year: int = Query(default=date.today().year, ge=2000, le=2100),
+    recent_limit: int = Query(default=5, ge=1, le=20),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    return serialization.json_response(crud.get_bootstrap(session, month=month, year=year, recent_limit=recent_limit))
 
 
 @app.get("/api/workouts", response_model=List[schemas.WorkoutOut])
-def read_workouts(session: Session = Depends(get_db_session)) -> List[schemas.WorkoutOut]:
-    return crud.list_workouts(session)
+def read_workouts(request: Request, session: Session = Depends(get_read_db_session)) -> Response:
+    return _catalog_response(request, session, "workouts", crud.list_workouts)
 
 
 @app.get("/api/workouts/{workout_id}", response_model=schemas.WorkoutOut)
-def read_workout(workout_id: int, session: Session = Depends(get_db_session)) -> schemas.WorkoutOut:
+def read_workout(request: Request, workout_id: int, session: Session = Depends(get_read_db_session)) -> Response:
     try:
-        return crud.get_workout(session, workout_id)
+        return _catalog_response(
+            request, session, ("workout", workout_id), lambda session: crud.get_workout(session, workout_id)
+        )
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
@@ -55,27 +162,277 @@ def create_session(
     payload: schemas.SessionLogIn,
     session: Session = Depends(get_db_session),
 ):
-    log = crud.log_session(session, payload)
-    return {"id": log.id, "performed_at": log.performed_at}
+    try:
+        log = crud.log_session(session, payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return serialization.json_response({"id": log.id, "performed_at": log.performed_at}, status_code=201)
+
+
+@app.post(
+    "/api/sessions/bulk",
+    response_model=schemas.BulkImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {
+                    "schema": {"type": "array", "items": {"$ref": "#/components/schemas/SessionLogIn"}}
+                },
+                "application/x-ndjson": {"schema": {"$ref": "#/components/schemas/SessionLogIn"}},
+            },
+        }
+    },
+)
+async def create_sessions_bulk(
+    request: Request,
+    batch_size: int = Query(default=5000, ge=1, le=50000),
+    session: Session = Depends(get_db_session),
+) -> Response:
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    parse = ingest.iter_ndjson if media_type in ingest.NDJSON_MEDIA_TYPES else ingest.iter_json_array
+    return serialization.json_response(await ingest.ingest_sessions(session, parse(request.stream()), batch_size))
+
+
+@app.post("/api/metrics", status_code=201)
+def create_metrics(
+    payload: List[schemas.MetricLogIn],
+    session: Session = Depends(get_db_session),
+):
+    try:
+        inserted = crud.log_metrics(session, payload)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return serialization.json_response({"inserted": inserted}, status_code=201)
+
+
+@app.post("/api/sessions/{session_id}/sets", response_model=schemas.SessionSets, status_code=201)
+def create_sets(
+    session_id: int,
+    payload: List[schemas.SetLogIn],
+    session: Session = Depends(get_db_session),
+) -> Response:
+    try:
+        sets = crud.log_sets(session, session_id, payload)
+    except LookupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return serialization.json_response(sets, status_code=201)
+
+
+@app.get("/api/sessions/{session_id}/sets", response_model=schemas.SessionSets)
+def read_sets(session_id: int, session: Session = Depends(get_read_db_session)) -> Response:
+    return serialization.json_response(crud.get_session_sets(session, session_id))
+
+
+_SERIES_CHUNK_POINTS = 1000
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC: normalise offset-aware bounds to match."""
+
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _iter_series_json(name: str, series: timeseries.SeriesArrays) -> Iterator[bytes]:
+    """Encode a ``MetricSeries`` body chunk by chunk from the series arrays."""
+
+    header = serialization.dumps({"name": name, "unit": series.unit, "resolution_seconds": series.resolution})
+    yield header[:-1] + b',"data":['
+    milliseconds = np.round(series.timestamps * 1000.0).astype("datetime64[ms]")
+    whole_seconds = not (milliseconds.astype(np.int64) % 1000).any()
+    timestamps = np.datetime_as_string(milliseconds, unit="s" if whole_seconds else "ms")
+    values = np.round(series.values, 2)
+    for offset in range(0, len(timestamps), _SERIES_CHUNK_POINTS):
+        window = slice(offset, offset + _SERIES_CHUNK_POINTS)
+        points = ",".join(
+            f'{{"timestamp":"{timestamp}","value":{value!r}}}'
+            for timestamp, value in zip(timestamps[window].tolist(), values[window].tolist())
+        )
+        yield (("," if offset else "") + points).encode("utf-8")
+    yield b"]}"
+
+
+@app.get("/api/metrics/{name}", response_model=schemas.MetricSeries)
+def read_metric_series(
+    name: str,
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None),
+    max_points: int = Query(default=500, ge=3, le=10000),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    start, end = _naive_utc(start), _naive_utc(end)
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=30)
+    if start >= end:
+        raise HTTPException(status_code=422, detail="start must be before end")
+    try:
+        series = crud.get_metric_series(session, name, start, end, max_points)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return StreamingResponse(_iter_series_json(name, series), media_type=serialization.JSON_MEDIA_TYPE)
+
+
+@app.get("/api/analytics/load", response_model=schemas.LoadAnalytics)
+def read_load_analytics(
+    start: Optional[date] = Query(default=None),
+    end: Optional[date] = Query(default=None),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    end = end or date.today()
+    start = start or end - timedelta(days=89)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    series = crud.get_load_analytics(session, start, end)
+    return serialization.json_response(
+        {
+            "start": start,
+            "end": end,
+            "days": series.days.tolist(),
+            **{name: np.round(values, 2) for name, values in series._asdict().items() if name != "days"},
+        }
+    )
+
+
+@app.get("/api/analytics/volume", response_model=List[schemas.ExerciseVolumeOut])
+def read_exercise_volume(
+    start: Optional[date] = Query(default=None),
+    end: Optional[date] = Query(default=None),
+    athlete_id: int = Query(default=DEFAULT_ATHLETE_ID),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    end = end or date.today()
+    start = start or end - timedelta(days=27)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    return serialization.json_response(crud.get_exercise_volume(session, start, end, athlete_id))
 
 
 @app.get("/api/sessions/recent", response_model=List[schemas.SessionSummary])
 def read_recent_sessions(
     limit: int = Query(default=5, ge=1, le=20),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    return serialization.json_response(crud.get_recent_sessions(session, limit=limit))
+
+
+@app.get("/api/sessions", response_model=schemas.SessionPage)
+def read_session_history(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = Query(default=None),
+    workout_id: Optional[int] = Query(default=None),
+    focus_area: Optional[str] = Query(default=None),
+    start: Optional[datetime] = Query(default=None),
+    end: Optional[datetime] = Query(default=None),
+    min_rpe: Optional[int] = Query(default=None, ge=1, le=10),
+    max_rpe: Optional[int] = Query(default=None, ge=1, le=10),
+    athlete_id: int = Query(default=DEFAULT_ATHLETE_ID),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    try:
+        page = crud.get_session_history(
+            session,
+            limit=limit,
+            cursor=cursor,
+            workout_id=workout_id,
+            focus_area=focus_area,
+            start=_naive_utc(start),
+            end=_naive_utc(end),
+            min_rpe=min_rpe,
+            max_rpe=max_rpe,
+            athlete_id=athlete_id,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    return serialization.json_response(page)
+
+
+@app.post("/api/athletes", response_model=schemas.AthleteOut, status_code=201)
+def create_athlete(
+    payload: schemas.AthleteIn,
     session: Session = Depends(get_db_session),
-) -> List[schemas.SessionSummary]:
-    return crud.get_recent_sessions(session, limit=limit)
+) -> Response:
+    return serialization.json_response(crud.create_athlete(session, payload), status_code=201)
+
+
+@app.get("/api/coach/roster", response_model=schemas.Roster)
+def read_roster(
+    day: Optional[date] = Query(default=None),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    roster = crud.get_roster(session, day or date.today())
+    return serialization.json_response(roster._asdict())
 
 
 @app.get("/api/calendar", response_model=schemas.CalendarMonth)
 def read_calendar(
     month: int = Query(default=date.today().month, ge=1, le=12),
     year: int = Query(default=date.today().year, ge=2000, le=2100),
-    session: Session = Depends(get_db_session),
-) -> schemas.CalendarMonth:
-    return crud.get_calendar(session, month=month, year=year)
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    return serialization.json_response(crud.get_calendar(session, month=month, year=year))
+
+
+@app.get("/api/calendar/range", response_model=schemas.CalendarRange)
+def read_calendar_range(
+    start: Optional[date] = Query(default=None),
+    end: Optional[date] = Query(default=None),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    end = end or date.today()
+    start = start or end - timedelta(days=364)
+    if start > end:
+        raise HTTPException(status_code=422, detail="start must not be after end")
+    if (end - start).days >= heatmap.MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"The range is limited to {heatmap.MAX_DAYS} days")
+    calendar = crud.get_calendar_range(session, start, end)
+    return serialization.json_response(calendar._asdict())
 
 
 @app.get("/api/exercises", response_model=List[schemas.ExerciseOut])
-def read_exercises(session: Session = Depends(get_db_session)) -> List[schemas.ExerciseOut]:
-    return crud.list_exercises(session)
+def read_exercises(request: Request, session: Session = Depends(get_read_db_session)) -> Response:
+    return _catalog_response(request, session, "exercises", crud.list_exercises)
+
+
+@app.get("/api/exercises/search", response_model=schemas.ExerciseSearchPage)
+def search_exercises(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=20, ge=1, le=100),
+    offset: int = Query(default=0, ge=0),
+    session: Session = Depends(get_read_db_session),
+) -> Response:
+    return serialization.json_response(crud.search_exercises(session, q, limit=limit, offset=offset))
+
+
+@app.get(
+    "/api/export/{table}",
+    response_class=StreamingResponse,
+    responses={
+        200: {"content": {media_type: {} for media_type in (*export.MEDIA_TYPES.values(), export.GZIP_MEDIA_TYPE)}}
+    },
+)
+def export_table(
+    table: export.ExportTable,
+    export_format: export.ExportFormat = Query(default=export.ExportFormat.csv, alias="format"),
+    gzip: bool = Query(default=False),
+    start: Optional[date] = Query(default=None),
+    end: Optional[date] = Query(default=None),
+) -> StreamingResponse:
+    return StreamingResponse(
+        export.stream_export(read_engine, table, export_format, start, end, compress=gzip),
+        media_type=export.GZIP_MEDIA_TYPE if gzip else export.MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{export.filename(table, export_format, gzip)}"'},
+    )
+
+
+@app.get("/api/cache/stats", response_model=Dict[str, schemas.CacheStats])
+async def read_cache_stats() -> Dict[str, Dict[str, int]]:
+    return cache.all_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics() -> Response:
+    return Response(content=instrumentation.render_metrics(), media_type=instrumentation.CONTENT_TYPE)
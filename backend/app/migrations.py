@@ -0,0 +1,197 @@
+"""Versioned schema migrations for existing SQLite databases.
+
+``SQLModel.metadata.create_all`` creates missing tables but never alters a
+database that already exists. Each migration below upgrades such a database
+by one step; the applied version is stored in ``PRAGMA user_version`` so
+``upgrade`` only runs the pending ones. Migrations must be idempotent because
+a fresh database already has the latest schema when they run. A numbered
+migration is never edited once released: every schema change gets a new
+one, so databases that already ran it receive the change too.
+"""
+from __future__ import annotations
+
+from typing import Callable, List, NamedTuple, Set, Type
+
+from sqlalchemy import delete, insert, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session, SQLModel
+
+from . import rollups, search, timeseries
+from .models import (
+    DEFAULT_ATHLETE_ID,
+    Athlete,
+    DailyHabitLog,
+    MetricLog,
+    MetricRollup,
+    ProgramSchedule,
+    SessionLog,
+    WorkoutExercise,
+)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[[Connection], None]
+
+
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str) -> Callable[[Callable[[Connection], None]], Callable[[Connection], None]]:
+    """Register the decorated function as the migration to ``version``."""
+
+    def register(apply: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        if MIGRATIONS and MIGRATIONS[-1].version >= version:
+            raise ValueError(f"Migration {version} is registered out of order")
+        MIGRATIONS.append(Migration(version, description, apply))
+        return apply
+
+    return register
+
+
+def _columns(connection: Connection, table: str) -> Set[str]:
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def _create_indexes(connection: Connection, *models: Type[SQLModel]) -> None:
+    """Create the declared indexes of ``models`` whose columns already exist.
+
+    Indexes on columns added by a later migration are created by that one.
+    """
+
+    for model in models:
+        existing = _columns(connection, model.__tablename__)
+        for index in model.__table__.indexes:
+            if {column.name for column in index.columns} <= existing:
+                index.create(connection, checkfirst=True)
+
+
+def _has_athlete_dimension(connection: Connection) -> bool:
+    return "athlete_id" in _columns(connection, SessionLog.__tablename__) and "athlete_id" in _columns(
+        connection, MetricLog.__tablename__
+    )
+
+
+@migration(1, "Secondary indexes for hot filters and sorts")
+def _create_secondary_indexes(connection: Connection) -> None:
+    _create_indexes(connection, SessionLog, MetricLog, WorkoutExercise, ProgramSchedule)
+
+
+# The rollup rebuilds read ``athlete_id``: databases older than migration 7
+# skip them here and have every rollup rebuilt there, once the column exists.
+
+
+@migration(2, "Backfill daily training rollups")
+def _backfill_training_rollups(connection: Connection) -> None:
+    if not _has_athlete_dimension(connection):
+        return
+    with Session(bind=connection) as session:
+        rollups.rebuild_training_rollups(session)
+        session.flush()
+
+
+@migration(3, "Backfill hourly and daily metric tiers")
+def _backfill_metric_tiers(connection: Connection) -> None:
+    if not _has_athlete_dimension(connection):
+        return
+    with Session(bind=connection) as session:
+        timeseries.rebuild_tiers(session)
+        session.flush()
+
+
+@migration(4, "Backfill activity runs and the training streak")
+def _backfill_streaks(connection: Connection) -> None:
+    if not _has_athlete_dimension(connection):
+        return
+    with Session(bind=connection) as session:
+        rollups.rebuild_streaks(session)
+        session.flush()
+
+
+@migration(5, "Index session history by workout")
+def _index_session_history(connection: Connection) -> None:
+    _create_indexes(connection, SessionLog)
+
+
+@migration(6, "Full-text index of the exercise catalog")
+def _create_exercise_search(connection: Connection) -> None:
+    search.create_index(connection)
+
+
+def _rebuild_habit_table(connection: Connection) -> None:
+    """Recreate ``dailyhabitlog`` with ``athlete_id`` and a unique ``(athlete_id, day)``.
+
+    SQLite cannot drop the column-level unique constraint on ``day``, so the
+    table is renamed, created again from the model and refilled.
+    """
+
+    table = DailyHabitLog.__tablename__
+    previous = f"_{table}_before_athletes"
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {previous}"))
+    # Named indexes follow the renamed table; free their names for the new one.
+    for index in inspect(connection).get_indexes(previous):
+        connection.execute(text(f'DROP INDEX "{index["name"]}"'))
+    DailyHabitLog.__table__.create(connection)
+    columns = ", ".join(name for name in DailyHabitLog.__table__.columns.keys() if name != "athlete_id")
+    connection.execute(
+        text(f"INSERT INTO {table} (athlete_id, {columns}) SELECT {DEFAULT_ATHLETE_ID:d}, {columns} FROM {previous}")
+    )
+    connection.execute(text(f"DROP TABLE {previous}"))
+
+
+@migration(7, "Athlete dimension on the history and program tables")
+def _add_athlete_dimension(connection: Connection) -> None:
+    connection.execute(
+        insert(Athlete.__table__).prefix_with("OR IGNORE").values(id=DEFAULT_ATHLETE_ID, name="Athlète principal")
+    )
+    rebuild_rollups = not _has_athlete_dimension(connection)
+    for model in (SessionLog, MetricLog, ProgramSchedule):
+        if "athlete_id" not in _columns(connection, model.__tablename__):
+            connection.execute(
+                text(
+                    f"ALTER TABLE {model.__tablename__} "
+                    f"ADD COLUMN athlete_id INTEGER NOT NULL DEFAULT {DEFAULT_ATHLETE_ID:d}"
+                )
+            )
+    if "athlete_id" not in _columns(connection, DailyHabitLog.__tablename__):
+        _rebuild_habit_table(connection)
+    # Superseded by the athlete-first index.
+    connection.execute(text("DROP INDEX IF EXISTS ix_metriclog_metric_logged_at"))
+    _create_indexes(connection, SessionLog, MetricLog, ProgramSchedule)
+
+    if rebuild_rollups:
+        with Session(bind=connection) as session:
+            rollups.rebuild_training_rollups(session)
+            timeseries.rebuild_tiers(session)
+            session.flush()
+
+
+@migration(8, "Drop the seeded tonnage metric superseded by exercise volumes")
+def _drop_legacy_tonnage_metric(connection: Connection) -> None:
+    for model in (MetricLog, MetricRollup):
+        connection.execute(delete(model.__table__).where(model.__table__.c.metric == rollups.TONNAGE_METRIC))
+
+
+@migration(9, "Drop the weekday index covered by the athlete-first one")
+def _drop_schedule_weekday_index(connection: Connection) -> None:
+    connection.execute(text("DROP INDEX IF EXISTS ix_programschedule_day_of_week"))
+
+
+def current_version(connection: Connection) -> int:
+    return connection.execute(text("PRAGMA user_version")).scalar_one()
+
+
+def upgrade(engine: Engine) -> int:
+    """Apply every pending migration and return the resulting version."""
+
+    with engine.connect() as connection:
+        version = current_version(connection)
+    for step in MIGRATIONS:
+        if step.version <= version:
+            continue
+        with engine.begin() as connection:
+            step.apply(connection)
+            connection.execute(text(f"PRAGMA user_version = {step.version:d}"))
+        version = step.version
+    return version
@@ -4,8 +4,20 @@ from __future__ import annotations
 from datetime import date, datetime
 from typing import Optional
 
+from sqlalchemy import Index, UniqueConstraint
 from sqlmodel import Field, SQLModel
 
+# Owner of the personal views (dashboard, calendar, streak, analytics) and of
+# every row written without an athlete.
+DEFAULT_ATHLETE_ID = 1
+
+
+class Athlete(SQLModel, table=True):
+    """A member of the team hosted by this instance."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    name: str
+
 
 class Exercise(SQLModel, table=True):
     """Catalog of all available exercises."""
@@ -34,6 +46,8 @@ class WorkoutTemplate(SQLModel, table=True):
 class WorkoutExercise(SQLModel, table=True):
     """Association between a workout template and its exercises."""
 
+    __table_args__ = (Index("ix_workoutexercise_workout_id_sequence", "workout_id", "sequence"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     workout_id: int = Field(foreign_key="workouttemplate.id")
     exercise_id: int = Field(foreign_key="exercise.id")
@@ -48,7 +62,10 @@ class WorkoutExercise(SQLModel, table=True):
 class ProgramSchedule(SQLModel, table=True):
     """Weekly program that maps days to workouts."""
 
+    __table_args__ = (Index("ix_programschedule_athlete_id_day_of_week", "athlete_id", "day_of_week"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    athlete_id: int = Field(default=DEFAULT_ATHLETE_ID, foreign_key="athlete.id")
     day_of_week: int  # 0=Monday
     workout_id: int = Field(foreign_key="workouttemplate.id")
     focus: str
@@ -57,9 +74,19 @@ class ProgramSchedule(SQLModel, table=True):
 class SessionLog(SQLModel, table=True):
     """Log of completed workout sessions."""
 
+    # History pages filtered on one workout seek straight to it. The index on
+    # ``performed_at`` alone already ends with the rowid, so it serves the
+    # ``(performed_at, id)`` keyset order of unfiltered pages, and the
+    # athlete index the same order for one athlete.
+    __table_args__ = (
+        Index("ix_sessionlog_workout_id_performed_at", "workout_id", "performed_at"),
+        Index("ix_sessionlog_athlete_id_performed_at", "athlete_id", "performed_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    athlete_id: int = Field(default=DEFAULT_ATHLETE_ID, foreign_key="athlete.id")
     workout_id: int = Field(foreign_key="workouttemplate.id")
-    performed_at: datetime = Field(default_factory=datetime.utcnow)
+    performed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     duration_minutes: int
     rpe: int
     energy_level: str
@@ -67,21 +94,112 @@ class SessionLog(SQLModel, table=True):
     calories_burned: Optional[int] = None
 
 
+class SetLog(SQLModel, table=True):
+    """One performed set of a strength session.
+
+    The largest table by far, so it is stored ``WITHOUT ROWID``: rows live in
+    the primary key b-tree, clustered by session, with no separate rowid
+    tree and key index. Loads are integer grams, which SQLite packs in three
+    bytes where a float takes eight.
+    """
+
+    __table_args__ = (
+        Index("ix_setlog_exercise_id", "exercise_id"),
+        {"sqlite_with_rowid": False},
+    )
+
+    session_id: int = Field(foreign_key="sessionlog.id", primary_key=True)
+    exercise_id: int = Field(foreign_key="exercise.id", primary_key=True)
+    set_index: int = Field(primary_key=True)  # 1 for the first set of the exercise in the session
+    workout_exercise_id: Optional[int] = Field(default=None, foreign_key="workoutexercise.id")
+    reps: int
+    load_grams: int
+    rir: Optional[int] = None  # repetitions in reserve
+
+
+class ExerciseVolume(SQLModel, table=True):
+    """Per athlete, exercise and day totals of ``SetLog``, kept up to date on every write."""
+
+    __table_args__ = (
+        Index("ix_exercisevolume_athlete_id_day", "athlete_id", "day"),
+        {"sqlite_with_rowid": False},
+    )
+
+    athlete_id: int = Field(foreign_key="athlete.id", primary_key=True)
+    exercise_id: int = Field(foreign_key="exercise.id", primary_key=True)
+    day: date = Field(primary_key=True)
+    sets: int = 0
+    reps: int = 0
+    tonnage_grams: int = 0  # sum of reps x load
+    top_load_grams: int = 0
+
+
+class DailyTrainingRollup(SQLModel, table=True):
+    """Per-day aggregates of the default athlete's ``SessionLog`` kept up to date on every write."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    day: date = Field(unique=True)
+    sessions: int = 0
+    total_duration: int = 0  # in minutes
+    total_rpe: int = 0
+    training_load: int = 0  # sum of duration x RPE
+    calories_burned: int = 0
+
+
+class ActivityRun(SQLModel, table=True):
+    """A maximal run of consecutive days with at least one session."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    first_day: date = Field(unique=True)
+    last_day: date = Field(unique=True)
+
+
+class TrainingStreak(SQLModel, table=True):
+    """Single-row summary of ``ActivityRun``, updated with it on every write."""
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    current_days: int = 0  # length of the run ending on ``last_active``
+    longest_days: int = 0
+    last_active: Optional[date] = None
+
+
 class MetricLog(SQLModel, table=True):
     """Time series of tracked wellness metrics."""
 
+    __table_args__ = (Index("ix_metriclog_athlete_id_metric_logged_at", "athlete_id", "metric", "logged_at"),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
+    athlete_id: int = Field(default=DEFAULT_ATHLETE_ID, foreign_key="athlete.id")
     metric: str
     value: float
     unit: str
-    logged_at: datetime = Field(default_factory=datetime.utcnow)
+    logged_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class MetricRollup(SQLModel, table=True):
+    """Hourly and daily buckets of the default athlete's ``MetricLog``, kept up to date at ingest."""
+
+    __table_args__ = (UniqueConstraint("resolution", "metric", "bucket_start"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    resolution: int  # bucket width in seconds
+    metric: str
+    bucket_start: datetime
+    unit: str
+    count: int
+    total: float
+    minimum: float
+    maximum: float
 
 
 class DailyHabitLog(SQLModel, table=True):
-    """Daily lifestyle and recovery habits."""
+    """Daily lifestyle and recovery habits, one row per athlete and day."""
+
+    __table_args__ = (UniqueConstraint("athlete_id", "day"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    day: date = Field(default_factory=date.today, unique=True)
+    athlete_id: int = Field(default=DEFAULT_ATHLETE_ID, foreign_key="athlete.id")
+    day: date = Field(default_factory=date.today)
     sleep_hours: float
     water_intake_liters: float
     mood: str
@@ -96,3 +214,10 @@ class FocusRecommendation(SQLModel, table=True):
     summary: str
     action_steps: str
     emphasis: str
+
+
+class TableVersion(SQLModel, table=True):
+    """Number of committed writes to each table, bumped in the writing transaction (see ``cache``)."""
+
+    name: str = Field(primary_key=True)
+    version: int = 0
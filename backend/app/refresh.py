@@ -0,0 +1,122 @@
+"""Background rebuilds of materialized snapshots.
+
+A ``SnapshotRefresher`` runs one task on the event loop that calls its
+``rebuild`` coroutine at start, after every commit touching one of its
+tables (through ``cache.add_listener``) and at each rollover time, such as
+local midnight for values depending on ``date.today()``. Commits arriving
+during a rebuild are coalesced into a single next rebuild, so a bulk import
+does not queue one rebuild per batch.
+
+The refresher only keeps snapshots warm: reads still check the table
+versions and the date, and rebuild on the spot when the background task has
+not caught up yet, so they are never stale.
+
+A ``WritePoller`` calls ``cache.poll_writes`` every few seconds, so commits
+from other processes wake the refreshers too. Reads do not depend on it:
+``cache.check_writes`` notices those commits on the reading connection.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, FrozenSet, Iterable, Optional
+
+from sqlalchemy.engine import Engine
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotRefresher:
+    def __init__(
+        self,
+        name: str,
+        tables: Iterable[str],
+        rebuild: Callable[[], Awaitable[object]],
+        next_rollover: Callable[[datetime], datetime],
+    ) -> None:
+        self.name = name
+        self.tables = frozenset(tables)
+        self.rebuilds = 0
+        self._rebuild = rebuild
+        self._next_rollover = next_rollover
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stale: Optional[asyncio.Event] = None
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        """Start the refresh task on the running loop."""
+
+        self._loop = asyncio.get_running_loop()
+        self._stale = asyncio.Event()
+        cache.add_listener(self._on_bump)
+        self._task = self._loop.create_task(self._run(), name=f"refresh-{self.name}")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        cache.remove_listener(self._on_bump)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _on_bump(self, tables: FrozenSet[str]) -> None:
+        if self.tables & tables and self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stale.set)
+
+    async def _run(self) -> None:
+        while True:
+            self._stale.clear()
+            try:
+                await self._rebuild()
+                self.rebuilds += 1
+            except Exception:
+                logger.exception("Rebuilding the %s snapshot failed", self.name)
+            now = datetime.now()
+            delay = (self._next_rollover(now) - now).total_seconds()
+            try:
+                await asyncio.wait_for(self._stale.wait(), timeout=max(delay, 0.0))
+            except asyncio.TimeoutError:
+                pass
+
+
+class WritePoller:
+    """Bump the tables committed to by other processes every ``interval`` seconds, to rebuild early."""
+
+    def __init__(self, engine: Engine, interval: float) -> None:
+        self.engine = engine
+        self.interval = interval
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run(), name="poll-writes")
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def poll(self) -> FrozenSet[str]:
+        return await asyncio.to_thread(self._poll)
+
+    def _poll(self) -> FrozenSet[str]:
+        with self.engine.connect() as connection:
+            return cache.poll_writes(connection)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception("Polling the table versions failed")
+            await asyncio.sleep(self.interval)
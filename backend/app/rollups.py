@@ -0,0 +1,354 @@
+"""Incrementally maintained aggregate tables.
+
+``record_session`` and ``record_sessions`` are called by ``crud.log_session``
+and ``crud.log_sessions_bulk`` inside the write transaction; they also keep
+the training streak current through ``record_active_days``. ``rebuild``
+recomputes every rollup from the raw logs and is the repair path for
+databases created before the rollups existed. The rollups and the streak
+feed the personal views, so they only count the sessions of
+``DEFAULT_ATHLETE_ID``; team-wide figures are aggregated from the logs.
+``record_sets`` folds strength sets into ``ExerciseVolume``, which is kept
+for every athlete since set volumes are never read from the raw sets::
+
+    python -m app.rollups
+"""
+from __future__ import annotations
+
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import Integer, cast, delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session
+
+from . import timeseries
+from .database import get_session, init_db
+from .models import (
+    DEFAULT_ATHLETE_ID,
+    ActivityRun,
+    DailyTrainingRollup,
+    ExerciseVolume,
+    SessionLog,
+    SetLog,
+    TrainingStreak,
+)
+
+_rollup = DailyTrainingRollup.__table__
+_runs = ActivityRun.__table__
+_streak = TrainingStreak.__table__
+_volume = ExerciseVolume.__table__
+_STREAK_ID = 1
+# Name of the dashboard tonnage curve, read from ``ExerciseVolume``. Older
+# seeds stored a random metric under it; migration 8 removes those samples.
+TONNAGE_METRIC = "Charge tonnage"
+
+# Past this many distinct days in one write, recomputing every run in SQL is
+# cheaper than merging the days one at a time.
+STREAK_REBUILD_DAYS = 64
+
+
+class Streak(NamedTuple):
+    current_days: int
+    longest_days: int
+    last_active: Optional[date]
+
+
+def record_sessions(session: Session, logs: Iterable[Mapping[str, Any]]) -> None:
+    """Add session rows to the rollup rows of the days they were performed on.
+
+    Rows are keyed by ``performed_at`` rather than by the write time, so
+    backdated sessions land on the right day. ``logs`` are mappings with the
+    ``SessionLog`` column names; they are summed per day first so a batch
+    costs one upsert per distinct day. Sessions of other athletes are skipped.
+    """
+
+    totals: Dict[date, Dict[str, int]] = {}
+    for log in logs:
+        if log.get("athlete_id", DEFAULT_ATHLETE_ID) != DEFAULT_ATHLETE_ID:
+            continue
+        day = log["performed_at"].date()
+        duration, rpe = log["duration_minutes"], log["rpe"]
+        row = totals.get(day)
+        if row is None:
+            row = totals[day] = {
+                "day": day,
+                "sessions": 0,
+                "total_duration": 0,
+                "total_rpe": 0,
+                "training_load": 0,
+                "calories_burned": 0,
+            }
+        row["sessions"] += 1
+        row["total_duration"] += duration
+        row["total_rpe"] += rpe
+        row["training_load"] += duration * rpe
+        row["calories_burned"] += log.get("calories_burned") or 0
+    if not totals:
+        return
+
+    statement = insert(_rollup)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_rollup.c.day],
+            set_={
+                column: _rollup.c[column] + statement.excluded[column]
+                for column in ("sessions", "total_duration", "total_rpe", "training_load", "calories_burned")
+            },
+        ),
+        list(totals.values()),
+    )
+    record_active_days(session, totals)
+
+
+def record_session(session: Session, log: SessionLog) -> None:
+    """Add ``log`` to the rollup row of the day it was performed on."""
+
+    record_sessions(
+        session,
+        [
+            {
+                "athlete_id": log.athlete_id,
+                "performed_at": log.performed_at,
+                "duration_minutes": log.duration_minutes,
+                "rpe": log.rpe,
+                "calories_burned": log.calories_burned,
+            }
+        ],
+    )
+
+
+def record_sets(session: Session, athlete_id: int, day: date, sets: Iterable[Mapping[str, Any]]) -> None:
+    """Add the sets of one session to the exercise volumes of its athlete and day.
+
+    ``sets`` are mappings with the ``SetLog`` column names; they are summed
+    per exercise first so a session costs one upsert per exercise.
+    """
+
+    totals: Dict[int, Dict[str, Any]] = {}
+    for row in sets:
+        volume = totals.get(row["exercise_id"])
+        if volume is None:
+            volume = totals[row["exercise_id"]] = {
+                "athlete_id": athlete_id,
+                "exercise_id": row["exercise_id"],
+                "day": day,
+                "sets": 0,
+                "reps": 0,
+                "tonnage_grams": 0,
+                "top_load_grams": 0,
+            }
+        volume["sets"] += 1
+        volume["reps"] += row["reps"]
+        volume["tonnage_grams"] += row["reps"] * row["load_grams"]
+        volume["top_load_grams"] = max(volume["top_load_grams"], row["load_grams"])
+    if not totals:
+        return
+
+    statement = insert(_volume)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_volume.c.athlete_id, _volume.c.exercise_id, _volume.c.day],
+            set_={
+                **{
+                    column: _volume.c[column] + statement.excluded[column]
+                    for column in ("sets", "reps", "tonnage_grams")
+                },
+                "top_load_grams": func.max(_volume.c.top_load_grams, statement.excluded.top_load_grams),
+            },
+        ),
+        list(totals.values()),
+    )
+
+
+def _add_active_day(session: Session, day: date) -> Optional[Tuple[date, date]]:
+    """Insert ``day`` into the activity runs and return the run now holding it.
+
+    Returns ``None`` when ``day`` already belonged to a run. Two index
+    lookups find the neighbours: the first run ending on or after ``day``
+    (it either holds ``day`` or may start the day after) and the run ending
+    the day before. A day between two runs merges them.
+    """
+
+    following = session.execute(
+        select(_runs.c.id, _runs.c.first_day, _runs.c.last_day)
+        .where(_runs.c.last_day >= day)
+        .order_by(_runs.c.last_day)
+        .limit(1)
+    ).first()
+    if following is not None and following.first_day <= day:
+        return None
+    previous = session.execute(
+        select(_runs.c.id, _runs.c.first_day).where(_runs.c.last_day == day - timedelta(days=1))
+    ).first()
+    if following is not None and following.first_day != day + timedelta(days=1):
+        following = None
+
+    if previous is not None and following is not None:
+        session.execute(delete(_runs).where(_runs.c.id == following.id))
+        session.execute(update(_runs).where(_runs.c.id == previous.id).values(last_day=following.last_day))
+        return previous.first_day, following.last_day
+    if previous is not None:
+        session.execute(update(_runs).where(_runs.c.id == previous.id).values(last_day=day))
+        return previous.first_day, day
+    if following is not None:
+        session.execute(update(_runs).where(_runs.c.id == following.id).values(first_day=day))
+        return day, following.last_day
+    session.execute(insert(_runs).values(first_day=day, last_day=day))
+    return day, day
+
+
+def record_active_days(session: Session, days: Iterable[date]) -> None:
+    """Fold days that now have a session into the activity runs and the streak.
+
+    Each day costs a constant number of indexed statements, however long
+    the history, and may be backdated: a day filling the gap between two
+    runs joins them. Batches of more than ``STREAK_REBUILD_DAYS`` days are
+    handled by ``rebuild_streaks`` instead.
+    """
+
+    days = sorted(set(days))
+    if not days:
+        return
+    if len(days) > STREAK_REBUILD_DAYS:
+        rebuild_streaks(session)
+        return
+
+    state = _read_streak_state(session)
+    current_days, longest_days, last_active = state
+    for day in days:
+        run = _add_active_day(session, day)
+        if run is None:
+            continue
+        first_day, last_day = run
+        length = (last_day - first_day).days + 1
+        longest_days = max(longest_days, length)
+        if last_active is None or last_day >= last_active:
+            current_days, last_active = length, last_day
+    if (current_days, longest_days, last_active) != state:
+        _write_streak_state(session, Streak(current_days, longest_days, last_active))
+
+
+def _read_streak_state(session: Session) -> Streak:
+    row = session.execute(
+        select(_streak.c.current_days, _streak.c.longest_days, _streak.c.last_active).where(_streak.c.id == _STREAK_ID)
+    ).first()
+    return Streak(*row) if row is not None else Streak(0, 0, None)
+
+
+def _write_streak_state(session: Session, state: Streak) -> None:
+    values = state._asdict()
+    statement = insert(_streak).values(id=_STREAK_ID, **values)
+    session.execute(statement.on_conflict_do_update(index_elements=[_streak.c.id], set_=values))
+
+
+def read_streak(session: Session, today: date) -> Streak:
+    """Return the streak as of ``today`` from the stored summary.
+
+    ``current_days`` counts the consecutive active days ending today, so it
+    is 0 when nothing was logged today. Sessions dated after ``today`` only
+    cost one extra lookup of the run holding ``today``.
+    """
+
+    state = _read_streak_state(session)
+    if state.last_active is None or state.last_active < today:
+        return state._replace(current_days=0)
+    if state.last_active == today:
+        return state
+    run = session.execute(
+        select(_runs.c.first_day).where(_runs.c.last_day >= today).order_by(_runs.c.last_day).limit(1)
+    ).first()
+    current_days = (today - run.first_day).days + 1 if run is not None and run.first_day <= today else 0
+    return state._replace(current_days=current_days)
+
+
+def rebuild_streaks(session: Session) -> None:
+    """Recompute ``ActivityRun`` and ``TrainingStreak`` from ``DailyTrainingRollup``.
+
+    Consecutive active days share the same ``julianday(day) - row_number()``,
+    which groups them into runs in one statement.
+    """
+
+    rollup = _rollup.c
+    active = (
+        select(
+            rollup.day,
+            (func.julianday(rollup.day) - func.row_number().over(order_by=rollup.day)).label("island"),
+        )
+        .where(rollup.sessions > 0)
+        .subquery()
+    )
+    session.execute(delete(_runs))
+    session.execute(
+        insert(_runs).from_select(
+            ["first_day", "last_day"],
+            select(func.min(active.c.day), func.max(active.c.day)).group_by(active.c.island),
+        )
+    )
+    length = cast(func.julianday(_runs.c.last_day) - func.julianday(_runs.c.first_day), Integer) + 1
+    longest_days = session.execute(select(func.coalesce(func.max(length), 0))).scalar_one()
+    latest = session.execute(select(length, _runs.c.last_day).order_by(_runs.c.last_day.desc()).limit(1)).first()
+    current_days, last_active = latest if latest is not None else (0, None)
+    _write_streak_state(session, Streak(current_days, longest_days, last_active))
+
+
+def rebuild_training_rollups(session: Session) -> None:
+    """Recompute ``DailyTrainingRollup`` and the streaks from the full ``SessionLog`` table."""
+
+    logs = SessionLog.__table__.c
+    day = func.date(logs.performed_at)
+    session.execute(delete(_rollup))
+    session.execute(
+        insert(_rollup).from_select(
+            ["day", "sessions", "total_duration", "total_rpe", "training_load", "calories_burned"],
+            select(
+                day,
+                func.count(),
+                func.sum(logs.duration_minutes),
+                func.sum(logs.rpe),
+                func.sum(logs.duration_minutes * logs.rpe),
+                func.coalesce(func.sum(logs.calories_burned), 0),
+            )
+            .where(logs.athlete_id == DEFAULT_ATHLETE_ID)
+            .group_by(day),
+        )
+    )
+    rebuild_streaks(session)
+
+
+def rebuild_exercise_volumes(session: Session) -> None:
+    """Recompute ``ExerciseVolume`` from the full ``SetLog`` table."""
+
+    sets, logs = SetLog.__table__.c, SessionLog.__table__.c
+    session.execute(delete(_volume))
+    session.execute(
+        insert(_volume).from_select(
+            ["athlete_id", "exercise_id", "day", "sets", "reps", "tonnage_grams", "top_load_grams"],
+            select(
+                logs.athlete_id,
+                sets.exercise_id,
+                func.date(logs.performed_at),
+                func.count(),
+                func.sum(sets.reps),
+                func.sum(sets.reps * sets.load_grams),
+                func.max(sets.load_grams),
+            )
+            .join_from(SetLog.__table__, SessionLog.__table__, logs.id == sets.session_id)
+            .group_by(logs.athlete_id, sets.exercise_id, func.date(logs.performed_at)),
+        )
+    )
+
+
+def rebuild(session: Session) -> None:
+    """Recompute every rollup table and commit."""
+
+    rebuild_training_rollups(session)
+    rebuild_exercise_volumes(session)
+    timeseries.rebuild_tiers(session)
+    session.commit()
+
+
+if __name__ == "__main__":
+    init_db()
+    with get_session() as session:
+        rebuild(session)
+    print("Agrégats recalculés avec succès !")
@@ -0,0 +1,147 @@
+"""Team roster for coaches: weekly load, adherence and readiness per athlete.
+
+The figures follow the dashboard: sessions, duration, load (duration x RPE)
+and completion rate over the training week of the requested day (Monday to
+Sunday), readiness over the seven days ending on that day. They come from
+one statement joining the athletes to three aggregates, each grouped by
+athlete in SQL, instead of one dashboard per athlete. The session and
+habit aggregates seek each athlete's rows through the ``(athlete_id, ...)``
+indexes. Rows are read off the DBAPI cursor into columns: with thousands of
+athletes, building one validated object per athlete would cost more than
+the query.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.sql import Select
+from sqlmodel import Session
+
+from .models import Athlete, DailyHabitLog, ProgramSchedule, SessionLog
+
+READINESS_DAYS = 7
+
+_athletes = Athlete.__table__
+_logs = SessionLog.__table__
+_schedule = ProgramSchedule.__table__
+_habits = DailyHabitLog.__table__
+
+
+class Roster(NamedTuple):
+    week_start: date
+    day: date
+    athlete_id: List[int]
+    name: List[str]
+    sessions: List[int]
+    total_duration: List[int]
+    training_load: List[int]
+    scheduled_days: List[int]
+    completed_days: List[int]
+    completion_rate: List[float]
+    average_readiness_score: List[Optional[float]]
+    latest_readiness_score: List[Optional[int]]
+    logged_days: List[int]
+
+
+def completion_rate(completed_days: int, scheduled_days: int) -> float:
+    """Share of the scheduled weekdays with a session, in percent (100 when nothing is scheduled)."""
+
+    if not scheduled_days:
+        return 100.0
+    return min(100.0, round(completed_days / scheduled_days * 100, 1))
+
+
+def roster_query(day: date) -> Select:
+    week_start = day - timedelta(days=day.weekday())
+    athletes, logs, schedule, habits = _athletes.c, _logs.c, _schedule.c, _habits.c
+
+    weekly_sessions = (
+        select(
+            athletes.id.label("athlete_id"),
+            func.count().label("sessions"),
+            func.sum(logs.duration_minutes).label("total_duration"),
+            func.sum(logs.duration_minutes * logs.rpe).label("training_load"),
+            func.count(func.distinct(func.date(logs.performed_at))).label("completed_days"),
+        )
+        .join_from(_athletes, _logs, logs.athlete_id == athletes.id)
+        .where(
+            logs.performed_at >= datetime.combine(week_start, time.min),
+            logs.performed_at < datetime.combine(week_start + timedelta(days=7), time.min),
+        )
+        .group_by(athletes.id)
+        .subquery()
+    )
+    scheduled = (
+        select(schedule.athlete_id, func.count(func.distinct(schedule.day_of_week)).label("scheduled_days"))
+        .group_by(schedule.athlete_id)
+        .subquery()
+    )
+    readiness = (
+        select(
+            athletes.id.label("athlete_id"),
+            func.avg(habits.readiness_score).label("average"),
+            func.count().label("logged_days"),
+            # SQLite takes the bare column from the row holding max(day).
+            func.max(habits.day),
+            habits.readiness_score.label("latest"),
+        )
+        .join_from(_athletes, _habits, habits.athlete_id == athletes.id)
+        .where(habits.day.between(day - timedelta(days=READINESS_DAYS - 1), day))
+        .group_by(athletes.id)
+        .subquery()
+    )
+    return (
+        select(
+            athletes.id,
+            athletes.name,
+            func.coalesce(weekly_sessions.c.sessions, 0),
+            func.coalesce(weekly_sessions.c.total_duration, 0),
+            func.coalesce(weekly_sessions.c.training_load, 0),
+            func.coalesce(scheduled.c.scheduled_days, 0),
+            func.coalesce(weekly_sessions.c.completed_days, 0),
+            readiness.c.average,
+            readiness.c.latest,
+            func.coalesce(readiness.c.logged_days, 0),
+        )
+        .outerjoin(weekly_sessions, weekly_sessions.c.athlete_id == athletes.id)
+        .outerjoin(scheduled, scheduled.c.athlete_id == athletes.id)
+        .outerjoin(readiness, readiness.c.athlete_id == athletes.id)
+        .order_by(athletes.id)
+    )
+
+
+def team_roster(session: Session, day: date) -> Roster:
+    """Return the roster of every athlete for the week of ``day``, ordered by athlete id."""
+
+    result = session.connection().execute(roster_query(day))
+    rows = result.cursor.fetchall()
+    result.close()
+    (
+        athlete_id,
+        name,
+        sessions,
+        total_duration,
+        training_load,
+        scheduled_days,
+        completed_days,
+        average,
+        latest,
+        logged_days,
+    ) = (list(column) for column in zip(*rows)) if rows else ([] for _ in range(10))
+    return Roster(
+        week_start=day - timedelta(days=day.weekday()),
+        day=day,
+        athlete_id=athlete_id,
+        name=name,
+        sessions=sessions,
+        total_duration=total_duration,
+        training_load=training_load,
+        scheduled_days=scheduled_days,
+        completed_days=completed_days,
+        completion_rate=list(map(completion_rate, completed_days, scheduled_days)),
+        average_readiness_score=[None if value is None else round(value, 1) for value in average],
+        latest_readiness_score=latest,
+        logged_days=logged_days,
+    )
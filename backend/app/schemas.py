@@ -2,9 +2,11 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from .models import DEFAULT_ATHLETE_ID
 
 
 class ExerciseOut(BaseModel):
@@ -21,6 +23,11 @@ class ExerciseOut(BaseModel):
         orm_mode = True
 
 
+class ExerciseSearchPage(BaseModel):
+    items: List[ExerciseOut]
+    next_offset: Optional[int]
+
+
 class WorkoutExerciseOut(BaseModel):
     exercise: ExerciseOut
     sets: int
@@ -42,6 +49,7 @@ class WorkoutOut(BaseModel):
 
 
 class SessionLogIn(BaseModel):
+    athlete_id: int = DEFAULT_ATHLETE_ID
     workout_id: int
     duration_minutes: int
     rpe: int
@@ -51,6 +59,59 @@ class SessionLogIn(BaseModel):
     performed_at: Optional[datetime] = None
 
 
+class MetricLogIn(BaseModel):
+    athlete_id: int = DEFAULT_ATHLETE_ID
+    metric: str
+    value: float
+    unit: str
+    logged_at: Optional[datetime] = None
+
+
+class SetLogIn(BaseModel):
+    exercise_id: Optional[int] = None  # taken from the prescription when omitted
+    workout_exercise_id: Optional[int] = None
+    set_index: int = Field(ge=1)
+    reps: int = Field(ge=0)
+    load_kg: float = Field(ge=0)
+    rir: Optional[int] = Field(default=None, ge=0)
+
+
+class SetLogOut(BaseModel):
+    exercise_id: int
+    workout_exercise_id: Optional[int]
+    set_index: int
+    reps: int
+    load_kg: float
+    rir: Optional[int]
+
+
+class SessionSets(BaseModel):
+    session_id: int
+    sets: List[SetLogOut]
+    tonnage_kg: float
+
+
+class ExerciseVolumeOut(BaseModel):
+    exercise_id: int
+    name: str
+    sets: int
+    reps: int
+    tonnage_kg: float
+    top_load_kg: float
+
+
+class BulkRowError(BaseModel):
+    index: int
+    errors: List[Dict[str, Any]]
+
+
+class BulkImportResult(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[BulkRowError]
+
+
 class TrainingLoadPoint(BaseModel):
     day: date
     sessions: int
@@ -79,6 +140,28 @@ class TrendMetric(BaseModel):
     data: List[MetricPoint]
 
 
+class MetricSeries(BaseModel):
+    name: str
+    unit: str
+    resolution_seconds: int
+    data: List[MetricPoint]
+
+
+class LoadAnalytics(BaseModel):
+    start: date
+    end: date
+    days: List[date]
+    load: List[float]
+    acute_load: List[float]
+    chronic_load: List[float]
+    acwr: List[Optional[float]]
+    fitness: List[float]
+    fatigue: List[float]
+    form: List[float]
+    monotony: List[Optional[float]]
+    strain: List[Optional[float]]
+
+
 class HabitSnapshot(BaseModel):
     day: date
     sleep_hours: float
@@ -115,6 +198,11 @@ class SessionSummary(BaseModel):
     notes: Optional[str]
 
 
+class SessionPage(BaseModel):
+    items: List[SessionSummary]
+    next_cursor: Optional[str]
+
+
 class DashboardSummary(BaseModel):
     today_workout: WorkoutOut
     upcoming_workouts: List[WorkoutOut]
@@ -123,6 +211,7 @@ class DashboardSummary(BaseModel):
     metrics: List[TrendMetric]
     weekly_progress: WeeklyProgress
     training_streak_days: int
+    longest_streak_days: int
     weekly_training_load: List[TrainingLoadPoint]
     recovery_summary: RecoverySummary
 
@@ -139,3 +228,54 @@ class CalendarMonth(BaseModel):
     month: int
     year: int
     days: List[CalendarDay]
+
+
+class CalendarRange(BaseModel):
+    start: date
+    end: date
+    workout_titles: List[str]
+    focuses: List[str]
+    workout: List[int]
+    completed: List[bool]
+    sessions: List[int]
+    training_load: List[int]
+
+
+class Bootstrap(BaseModel):
+    dashboard: DashboardSummary
+    workouts: List[WorkoutOut]
+    calendar: CalendarMonth
+    exercises: List[ExerciseOut]
+    recent_sessions: List[SessionSummary]
+
+
+class AthleteIn(BaseModel):
+    name: str
+
+
+class AthleteOut(BaseModel):
+    id: int
+    name: str
+
+
+class Roster(BaseModel):
+    week_start: date
+    day: date
+    athlete_id: List[int]
+    name: List[str]
+    sessions: List[int]
+    total_duration: List[int]
+    training_load: List[int]
+    scheduled_days: List[int]
+    completed_days: List[int]
+    completion_rate: List[float]
+    average_readiness_score: List[Optional[float]]
+    latest_readiness_score: List[Optional[int]]
+    logged_days: List[int]
+
+
+class CacheStats(BaseModel):
+    hits: int
+    misses: int
+    size: int
+    maxsize: int
@@ -0,0 +1,72 @@
+"""Full-text search over the exercise catalog with SQLite FTS5.
+
+``exercise_fts`` is an external-content FTS5 table: it indexes the text
+columns of ``exercise`` without storing a second copy, and triggers keep it
+in sync with every insert, update and delete (Core bulk loads included).
+The ``unicode61`` tokenizer with ``remove_diacritics 2`` folds case and
+accents, so ``epaule`` finds ``Épaules``; the 2 and 3 character prefix
+indexes keep autocomplete queries on short prefixes fast.
+"""
+from __future__ import annotations
+
+import re
+from typing import List
+
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql.elements import ColumnElement
+
+FTS_TABLE = "exercise_fts"
+# Indexed columns and their BM25 weights: a hit in the name counts most.
+COLUMNS = {
+    "name": 10.0,
+    "category": 2.0,
+    "primary_muscles": 4.0,
+    "secondary_muscles": 2.0,
+    "equipment": 2.0,
+    "instructions": 1.0,
+}
+
+fts = table(FTS_TABLE, column("rowid"))
+
+_TOKEN = re.compile(r"\w+")
+
+
+def create_index(connection: Connection) -> None:
+    """Create the FTS table and its sync triggers if missing, then rebuild it."""
+
+    names = ", ".join(COLUMNS)
+    new_values = ", ".join(f"new.{name}" for name in COLUMNS)
+    old_values = ", ".join(f"old.{name}" for name in COLUMNS)
+    delete_old = f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {names}) VALUES (new.id, {new_values});"
+    for statement in (
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({names}, content='exercise', "
+        "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON exercise BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON exercise BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE ON exercise BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+    ):
+        connection.execute(text(statement))
+
+
+def match_expression(query: str) -> str:
+    """Turn free text into an FTS5 query: every word, as a prefix, must match.
+
+    Only word characters are kept, so FTS5 operators and quotes typed by the
+    user cannot produce a syntax error. Returns ``""`` when nothing is left.
+    """
+
+    tokens: List[str] = _TOKEN.findall(query)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def matches(expression: str) -> ColumnElement:
+    return literal_column(FTS_TABLE).op("MATCH")(expression)
+
+
+def rank() -> ColumnElement:
+    """BM25 score of the current row, lower is better."""
+
+    return func.bm25(literal_column(FTS_TABLE), *COLUMNS.values())
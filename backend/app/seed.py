@@ -1,22 +1,49 @@
-"""Utility to populate the database with realistic demo data."""
+"""Utility to populate the database with realistic demo data.
+
+Every load goes through ``bulk_load``: one transaction, Core ``executemany``
+batches streamed from generators, primary keys assigned in memory so foreign
+keys never need a round trip, and durability pragmas relaxed until the load
+commits. The rollups and metric tiers are rebuilt in SQL once at the end.
+
+``python -m app.seed`` writes the demo program; ``--scale`` adds that many
+athlete-years of synthetic history (see ``app.synthetic``).
+"""
 from __future__ import annotations
 
+import argparse
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
+from itertools import islice
 import random
+from typing import Any, Dict, Iterable, Iterator, Mapping
 
-from sqlmodel import Session, select
+from sqlalchemy import Table, func, insert, select
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
 
-from .database import get_session, init_db
+from . import cache, rollups, timeseries
+from .database import engine, init_db
 from .models import (
+    ActivityRun,
     DailyHabitLog,
+    DailyTrainingRollup,
     Exercise,
+    ExerciseVolume,
     FocusRecommendation,
     MetricLog,
+    MetricRollup,
     ProgramSchedule,
+    TrainingStreak,
     WorkoutExercise,
     WorkoutTemplate,
 )
 
+BATCH_SIZE = 20000
+
+# Connection pragmas while a bulk load runs: no fsync until the end and a
+# 256 MiB page cache.
+BULK_PRAGMAS = {"synchronous": "OFF", "cache_size": "-262144"}
+
 
 EXERCISES = [
     dict(
@@ -125,7 +152,7 @@ SCHEDULE = [
 ]
 
 
-FOCUS = FocusRecommendation(
+FOCUS = dict(
     title="Semaine progressive",
     summary="Accent sur la force fonctionnelle et le contrôle postural.",
     action_steps="Priorise les charges contrôlées, respiration diaphragmatique et récupération active.",
@@ -133,89 +160,183 @@ FOCUS = FocusRecommendation(
 )
 
 
+@contextmanager
+def bulk_load(bind: Engine = engine) -> Iterator[Connection]:
+    """Yield a connection inside one transaction tuned for loading many rows.
+
+    The pragmas of ``BULK_PRAGMAS`` apply until the transaction ends, then
+    the previous values are restored. The load is still atomic: an exception
+    rolls everything back.
+    """
+
+    with bind.connect() as connection:
+        previous = {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in BULK_PRAGMAS}
+        _set_pragmas(connection, BULK_PRAGMAS)
+        try:
+            with connection.begin():
+                yield connection
+        finally:
+            _set_pragmas(connection, previous)
+
+
+def _set_pragmas(connection: Connection, values: Mapping[str, Any]) -> None:
+    for name, value in values.items():
+        connection.exec_driver_sql(f"PRAGMA {name} = {value}")
+    # Pragmas run outside SQLite transactions; close the one SQLAlchemy began.
+    connection.commit()
+
+
+def insert_rows(
+    connection: Connection, table: Table, rows: Iterable[Mapping[str, Any]], batch_size: int = BATCH_SIZE
+) -> int:
+    """Insert ``rows`` with one ``executemany`` per batch and return the count.
+
+    ``rows`` is consumed lazily, so a generator of millions of rows only ever
+    holds one batch in memory. The write is counted in ``TableVersion`` so a
+    running server drops what it cached from ``table``.
+    """
+
+    written = 0
+    iterator = iter(rows)
+    statement = insert(table)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            if written:
+                cache.record_writes(connection, [table.name])
+            return written
+        connection.execute(statement, batch)
+        written += len(batch)
+
+
+def next_id(connection: Connection, table: Table) -> int:
+    """Return the first primary key free after the rows already in ``table``."""
+
+    return connection.execute(select(func.coalesce(func.max(table.c.id), 0) + 1)).scalar_one()
+
+
+def rebuild_rollups(connection: Connection) -> None:
+    """Recompute the training rollups and metric tiers in the current transaction."""
+
+    with Session(bind=connection) as session:
+        rollups.rebuild_training_rollups(session)
+        rollups.rebuild_exercise_volumes(session)
+        timeseries.rebuild_tiers(session)
+        session.flush()
+    cache.record_writes(
+        connection,
+        [
+            model.__tablename__
+            for model in (DailyTrainingRollup, ActivityRun, TrainingStreak, ExerciseVolume, MetricRollup)
+        ],
+    )
+
+
+def is_seeded(connection: Connection) -> bool:
+    return connection.execute(select(Exercise.__table__.c.id).limit(1)).first() is not None
+
+
+def seed_catalog(connection: Connection) -> Dict[str, Dict[str, Any]]:
+    """Add the exercises, workouts, schedule and focus; return workout rows by title."""
+
+    exercise_ids: Dict[str, int] = {}
+    exercise_rows = []
+    for exercise_id, payload in enumerate(EXERCISES, start=next_id(connection, Exercise.__table__)):
+        exercise_ids[payload["name"]] = exercise_id
+        exercise_rows.append({"id": exercise_id, **payload})
+
+    workouts: Dict[str, Dict[str, Any]] = {}
+    link_rows = []
+    for workout_id, payload in enumerate(WORKOUTS, start=next_id(connection, WorkoutTemplate.__table__)):
+        row = {key: value for key, value in payload.items() if key != "exercises"}
+        workouts[row["title"]] = {"id": workout_id, **row}
+        link_rows.extend(
+            {
+                "workout_id": workout_id,
+                "exercise_id": exercise_ids[exercise_cfg["name"]],
+                "sets": exercise_cfg["sets"],
+                "reps": exercise_cfg["reps"],
+                "rest_seconds": exercise_cfg["rest_seconds"],
+                "tempo": exercise_cfg.get("tempo"),
+                "sequence": exercise_cfg["sequence"],
+                "notes": None,
+            }
+            for exercise_cfg in payload["exercises"]
+        )
+
+    insert_rows(connection, Exercise.__table__, exercise_rows)
+    insert_rows(connection, WorkoutTemplate.__table__, workouts.values())
+    insert_rows(connection, WorkoutExercise.__table__, link_rows)
+    insert_rows(
+        connection,
+        ProgramSchedule.__table__,
+        (
+            {
+                "day_of_week": item["day_of_week"],
+                "workout_id": workouts[item["workout_title"]]["id"],
+                "focus": item["focus"],
+            }
+            for item in SCHEDULE
+        ),
+    )
+    insert_rows(connection, FocusRecommendation.__table__, [FOCUS])
+    return workouts
+
+
+def _demo_habits() -> Iterator[Dict[str, Any]]:
+    today = date.today()
+    for delta in range(0, 21):
+        yield dict(
+            day=today - timedelta(days=delta),
+            sleep_hours=round(random.uniform(6.2, 8.3), 1),
+            water_intake_liters=round(random.uniform(2.0, 3.5), 1),
+            mood=random.choice(["Motivé", "Concentré", "Fatigué mais présent", "Explosif"]),
+            readiness_score=random.randint(70, 95),
+        )
+
+
+def _demo_metrics() -> Iterator[Dict[str, Any]]:
+    # The tonnage is not a sample: it is derived from the logged sets.
+    metrics = [
+        ("Fréquence cardiaque au repos", "bpm"),
+        ("Variabilité HRV", "ms"),
+    ]
+    for name, unit in metrics:
+        for delta in range(0, 30):
+            timestamp = datetime.utcnow() - timedelta(days=delta)
+            if name == "Fréquence cardiaque au repos":
+                value = 52 + random.uniform(-4, 3)
+            else:
+                value = 78 + random.uniform(-6, 8)
+            yield dict(metric=name, value=round(value, 2), unit=unit, logged_at=timestamp)
+
+
 def seed() -> None:
     init_db()
-    with get_session() as session:
-        if session.exec(select(Exercise)).first():
+    with bulk_load() as connection:
+        if is_seeded(connection):
             return
+        seed_catalog(connection)
+        insert_rows(connection, DailyHabitLog.__table__, _demo_habits())
+        insert_rows(connection, MetricLog.__table__, _demo_metrics())
+        rebuild_rollups(connection)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, help="athlete-years of synthetic history to add")
+    parser.add_argument("--metric-interval", type=int, default=60, help="seconds between heart-rate samples")
+    args = parser.parse_args()
+
+    if args.scale is None:
+        seed()
+        print("Base de données initialisée avec succès !")
+        return
+    from .synthetic import populate  # the generators build on this module
 
-        exercise_map = {}
-        for payload in EXERCISES:
-            exercise = Exercise(**payload)
-            session.add(exercise)
-            session.commit()
-            session.refresh(exercise)
-            exercise_map[payload["name"]] = exercise
-
-        workout_map = {}
-        for payload in WORKOUTS:
-            exercises = payload.pop("exercises")
-            workout = WorkoutTemplate(**payload)
-            session.add(workout)
-            session.commit()
-            session.refresh(workout)
-            workout_map[workout.title] = workout
-            for exercise_cfg in exercises:
-                exercise = exercise_map[exercise_cfg["name"]]
-                link = WorkoutExercise(
-                    workout_id=workout.id,
-                    exercise_id=exercise.id,
-                    sets=exercise_cfg["sets"],
-                    reps=exercise_cfg["reps"],
-                    rest_seconds=exercise_cfg["rest_seconds"],
-                    tempo=exercise_cfg.get("tempo"),
-                    sequence=exercise_cfg["sequence"],
-                    notes=None,
-                )
-                session.add(link)
-
-        for item in SCHEDULE:
-            template = workout_map[item["workout_title"]]
-            schedule = ProgramSchedule(
-                day_of_week=item["day_of_week"],
-                workout_id=template.id,
-                focus=item["focus"],
-            )
-            session.add(schedule)
-
-        session.add(FOCUS)
-
-        today = date.today()
-        for delta in range(0, 21):
-            day = today - timedelta(days=delta)
-            session.add(
-                DailyHabitLog(
-                    day=day,
-                    sleep_hours=round(random.uniform(6.2, 8.3), 1),
-                    water_intake_liters=round(random.uniform(2.0, 3.5), 1),
-                    mood=random.choice(["Motivé", "Concentré", "Fatigué mais présent", "Explosif"]),
-                    readiness_score=random.randint(70, 95),
-                )
-            )
-
-        metrics = [
-            ("Charge tonnage", "kg"),
-            ("Fréquence cardiaque au repos", "bpm"),
-            ("Variabilité HRV", "ms"),
-        ]
-        for name, unit in metrics:
-            for delta in range(0, 30):
-                timestamp = datetime.utcnow() - timedelta(days=delta)
-                base = 0
-                if name == "Charge tonnage":
-                    base = 12000
-                    value = base + random.uniform(-1000, 1400)
-                elif name == "Fréquence cardiaque au repos":
-                    base = 52
-                    value = base + random.uniform(-4, 3)
-                else:
-                    base = 78
-                    value = base + random.uniform(-6, 8)
-                session.add(MetricLog(metric=name, value=round(value, 2), unit=unit, logged_at=timestamp))
-
-        session.commit()
+    counts = populate(engine, args.scale, metric_interval=args.metric_interval)
+    print(", ".join(f"{table}: {count}" for table, count in counts.items()))
 
 
 if __name__ == "__main__":
-    seed()
-    print("Base de données initialisée avec succès !")
+    main()
@@ -0,0 +1,57 @@
+"""Single-pass JSON rendering of the response schemas.
+
+``crud`` already returns validated ``schemas`` objects; letting FastAPI apply
+``response_model`` would validate and copy the whole tree again, then encode
+it with ``jsonable_encoder`` and the stdlib ``json``. Routes instead return
+``json_response(result)``: orjson walks the objects once, and each schema
+class is turned into a dict by an encoder built the first time the class is
+seen (its output keys plus one ``attrgetter`` for the values). NumPy arrays
+are encoded natively, ``NaN`` as ``null``. The routes keep their
+``response_model`` so the OpenAPI schema is unchanged.
+"""
+from __future__ import annotations
+
+from operator import attrgetter
+from typing import Any, Callable, Dict, Type
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel
+
+JSON_MEDIA_TYPE = "application/json"
+
+_encoders: Dict[Type[BaseModel], Callable[[BaseModel], Dict[str, Any]]] = {}
+
+
+def _build_encoder(model: Type[BaseModel]) -> Callable[[BaseModel], Dict[str, Any]]:
+    fields = list(model.__fields__.values())
+    keys = [field.alias for field in fields]
+    if not fields:
+        return lambda value: {}
+    if len(fields) == 1:
+        name = fields[0].name
+        return lambda value: {keys[0]: getattr(value, name)}
+    values = attrgetter(*(field.name for field in fields))
+    return lambda value: dict(zip(keys, values(value)))
+
+
+def _default(value: Any) -> Any:
+    """orjson fallback for the types it does not encode natively."""
+
+    if isinstance(value, BaseModel):
+        model = type(value)
+        encoder = _encoders.get(model)
+        if encoder is None:
+            encoder = _encoders[model] = _build_encoder(model)
+        return encoder(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode schemas, lists, dicts, dates and NumPy arrays to compact UTF-8 JSON."""
+
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    return Response(content=dumps(content), status_code=status_code, media_type=JSON_MEDIA_TYPE)
@@ -0,0 +1,208 @@
+"""Synthetic training history at a chosen scale.
+
+The scale is expressed in athlete-years: ``--scale 10`` writes ten years of
+history ending today, with the weekly program followed most weeks and the
+sets of its strength exercises, a habit log every day, two daily wellness
+metrics and a heart-rate sample every
+``--metric-interval`` seconds (one per minute by default, about 525,000
+samples per year). Rows are produced by generators and streamed into one
+``seed.bulk_load`` transaction; the rollups and metric tiers are rebuilt at
+the end::
+
+    python -m app.synthetic --scale 1 --database data/bench/sf-1.db
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import random
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.engine import Engine
+
+from . import seed
+from .database import init_db, sqlite_engine
+from .models import DailyHabitLog, MetricLog, SessionLog, SetLog, WorkoutExercise
+
+DAILY_METRICS = (
+    ("Fréquence cardiaque au repos", "bpm", 52.0, 3.0),
+    ("Variabilité HRV", "ms", 78.0, 7.0),
+)
+HEART_RATE = ("Fréquence cardiaque", "bpm")
+ENERGY_LEVELS = ["Explosif", "Solide", "Correct", "Fatigué"]
+MOODS = ["Motivé", "Concentré", "Fatigué mais présent", "Explosif"]
+
+
+def history_days(athlete_years: float, today: Optional[date] = None) -> List[date]:
+    """Return the days covered by ``athlete_years`` of history, oldest first."""
+
+    today = today or date.today()
+    count = max(1, round(athlete_years * 365.25))
+    return [today - timedelta(days=offset) for offset in range(count - 1, -1, -1)]
+
+
+def iter_sessions(
+    days: Iterable[date],
+    schedule: Mapping[int, Mapping[str, Any]],
+    rng: random.Random,
+    adherence: float = 0.85,
+) -> Iterator[Dict[str, Any]]:
+    """Yield ``SessionLog`` rows following the weekly ``schedule``.
+
+    ``schedule`` maps a weekday to the workout of that day (``id`` and
+    ``estimated_duration``). Planned days are trained with probability
+    ``adherence``; rest days get an occasional extra session.
+    """
+
+    extra = list(schedule.values())
+    for day in days:
+        workout = schedule.get(day.weekday())
+        if workout is None:
+            if rng.random() >= 0.08:
+                continue
+            workout = rng.choice(extra)
+        elif rng.random() >= adherence:
+            continue
+        duration = max(15, round(workout["estimated_duration"] * rng.uniform(0.8, 1.15)))
+        rpe = rng.randint(5, 9)
+        yield {
+            "workout_id": workout["id"],
+            "performed_at": datetime.combine(day, time(rng.randint(6, 20), rng.randrange(60))),
+            "duration_minutes": duration,
+            "rpe": rpe,
+            "energy_level": rng.choice(ENERGY_LEVELS),
+            "notes": None,
+            "calories_burned": round(duration * (5 + rpe * 0.9)),
+        }
+
+
+def iter_sets(
+    sessions: Sequence[Mapping[str, Any]],
+    prescriptions: Mapping[int, Sequence[Mapping[str, Any]]],
+    rng: random.Random,
+) -> Iterator[Dict[str, Any]]:
+    """Yield the ``SetLog`` rows of ``sessions``, oldest first, following their prescriptions.
+
+    ``prescriptions`` maps a workout id to its ``WorkoutExercise`` rows.
+    Timed exercises ("45 sec") get no set. Each exercise starts from its own
+    load, which grows by a quarter over the history, in 2.5 kg steps.
+    """
+
+    start_loads: Dict[int, float] = {}
+    for index, log in enumerate(sessions):
+        progression = 1 + 0.25 * index / len(sessions)
+        for prescription in prescriptions.get(log["workout_id"], ()):
+            target = prescription["reps"].split()[0]
+            if "sec" in prescription["reps"]:
+                continue
+            load = start_loads.setdefault(prescription["exercise_id"], rng.randint(8, 40) * 2.5) * progression
+            for set_index in range(1, prescription["sets"] + 1):
+                yield {
+                    "session_id": log["id"],
+                    "exercise_id": prescription["exercise_id"],
+                    "set_index": set_index,
+                    "workout_exercise_id": prescription["id"],
+                    "reps": max(1, (int(target) if target.isdigit() else 8) + rng.randint(-2, 1)),
+                    "load_grams": round(load / 2.5) * 2500,
+                    "rir": rng.randint(0, 3),
+                }
+
+
+def iter_habits(days: Iterable[date], rng: random.Random) -> Iterator[Dict[str, Any]]:
+    """Yield one ``DailyHabitLog`` row per day."""
+
+    for day in days:
+        yield {
+            "day": day,
+            "sleep_hours": round(rng.uniform(6.2, 8.3), 1),
+            "water_intake_liters": round(rng.uniform(2.0, 3.5), 1),
+            "mood": rng.choice(MOODS),
+            "readiness_score": rng.randint(70, 95),
+        }
+
+
+def iter_metrics(days: Iterable[date], rng: random.Random, interval: int = 60) -> Iterator[Dict[str, Any]]:
+    """Yield ``MetricLog`` rows: the daily metrics and a heart-rate trace.
+
+    The trace follows a daily cycle (low at night, higher in the afternoon)
+    with noise, one sample every ``interval`` seconds; ``interval=0``
+    leaves it out.
+    """
+
+    per_day = 86400 // interval if interval else 0
+    step = timedelta(seconds=interval) if interval else None
+    metric, unit = HEART_RATE
+    for day in days:
+        morning = datetime.combine(day, time(7))
+        for name, daily_unit, base, spread in DAILY_METRICS:
+            value = round(base + rng.uniform(-spread, spread), 2)
+            yield {"metric": name, "value": value, "unit": daily_unit, "logged_at": morning}
+        moment = datetime.combine(day, time())
+        for index in range(per_day):
+            phase = 2 * math.pi * (index / per_day - 0.25)
+            value = round(62 + 14 * math.sin(phase) + rng.gauss(0, 4), 1)
+            yield {"metric": metric, "value": value, "unit": unit, "logged_at": moment}
+            moment += step
+
+
+def populate(
+    bind: Engine,
+    athlete_years: float,
+    seed_value: int = 0,
+    metric_interval: int = 60,
+    today: Optional[date] = None,
+) -> Dict[str, int]:
+    """Fill an empty database with ``athlete_years`` of history.
+
+    Everything is written in a single ``seed.bulk_load`` transaction. Returns
+    the number of rows written per table. Raises ``ValueError`` if the
+    database already holds a catalog.
+    """
+
+    init_db(bind)
+    rng = random.Random(seed_value)
+    days = history_days(athlete_years, today)
+    with seed.bulk_load(bind) as connection:
+        if seed.is_seeded(connection):
+            raise ValueError("The database is not empty")
+        workouts = seed.seed_catalog(connection)
+        schedule = {item["day_of_week"]: workouts[item["workout_title"]] for item in seed.SCHEDULE}
+        sessions = [
+            {"id": session_id, **row}
+            for session_id, row in enumerate(
+                iter_sessions(days, schedule, rng), start=seed.next_id(connection, SessionLog.__table__)
+            )
+        ]
+        prescriptions: Dict[int, List[Mapping[str, Any]]] = {}
+        for row in connection.execute(select(WorkoutExercise.__table__).order_by(WorkoutExercise.sequence)).mappings():
+            prescriptions.setdefault(row["workout_id"], []).append(row)
+        counts = {
+            "sessions": seed.insert_rows(connection, SessionLog.__table__, sessions),
+            "habits": seed.insert_rows(connection, DailyHabitLog.__table__, iter_habits(days, rng)),
+            "metrics": seed.insert_rows(connection, MetricLog.__table__, iter_metrics(days, rng, metric_interval)),
+            "sets": seed.insert_rows(connection, SetLog.__table__, iter_sets(sessions, prescriptions, rng)),
+        }
+        seed.rebuild_rollups(connection)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="athlete-years of history")
+    parser.add_argument("--database", type=Path, required=True, help="SQLite file to create")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metric-interval", type=int, default=60, help="seconds between heart-rate samples")
+    args = parser.parse_args()
+
+    args.database.parent.mkdir(parents=True, exist_ok=True)
+    bind = sqlite_engine(args.database.resolve())
+    counts = populate(bind, args.scale, args.seed, args.metric_interval)
+    bind.dispose()
+    print(", ".join(f"{table}: {count}" for table, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""Tiered storage for wellness metrics.
+
+Raw samples stay in ``MetricLog``. Every ingest also folds them into hourly
+and daily ``MetricRollup`` buckets (count, sum, min, max), so reading a long
+range never has to touch the raw samples: ``query_arrays`` picks the coarsest
+tier whose buckets are still no wider than the requested resolution and
+reads it straight into NumPy arrays, which the metric series endpoint
+downsamples. Like the training rollups, the tiers and the series read from
+them belong to ``DEFAULT_ATHLETE_ID``.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from itertools import chain
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session
+
+from .models import DEFAULT_ATHLETE_ID, MetricLog, MetricRollup
+
+RAW = 0
+HOUR = 3600
+DAY = 86400
+TIERS = (DAY, HOUR)  # coarsest first
+
+_rollup = MetricRollup.__table__
+_samples = MetricLog.__table__
+
+# SQLite expressions flooring a stored DATETIME to the start of its bucket,
+# in the storage format SQLAlchemy uses for DATETIME columns.
+_BUCKET_EXPRESSIONS = {
+    HOUR: lambda column: func.strftime("%Y-%m-%d %H:00:00.000000", column),
+    DAY: lambda column: func.strftime("%Y-%m-%d 00:00:00.000000", column),
+}
+
+
+# Julian day of 1970-01-01: turns a stored DATE or DATETIME into days or
+# seconds since the epoch.
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def _epoch_seconds(column):
+    return (func.julianday(column) - UNIX_EPOCH_JULIAN_DAY) * 86400.0
+
+
+class SeriesArrays(NamedTuple):
+    unit: str
+    resolution: int
+    timestamps: np.ndarray  # seconds since the epoch (UTC), ascending
+    values: np.ndarray  # raw values, or bucket means for the tiers
+
+
+def bucket_start(moment: datetime, resolution: int) -> datetime:
+    if resolution == DAY:
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown resolution {resolution}")
+
+
+def choose_tier(resolution: timedelta) -> int:
+    """Return the coarsest tier whose buckets fit in ``resolution`` (``RAW`` if none)."""
+
+    seconds = resolution.total_seconds()
+    for tier in TIERS:
+        if tier <= seconds:
+            return tier
+    return RAW
+
+
+def record_samples(session: Session, samples: Iterable[Mapping[str, Any]]) -> None:
+    """Fold raw samples (``MetricLog`` column mappings) into every tier, skipping other athletes."""
+
+    buckets: Dict[Tuple[int, str, datetime], Dict[str, Any]] = {}
+    for sample in samples:
+        if sample.get("athlete_id", DEFAULT_ATHLETE_ID) != DEFAULT_ATHLETE_ID:
+            continue
+        value = sample["value"]
+        for resolution in TIERS:
+            key = (resolution, sample["metric"], bucket_start(sample["logged_at"], resolution))
+            row = buckets.get(key)
+            if row is None:
+                buckets[key] = {
+                    "resolution": resolution,
+                    "metric": sample["metric"],
+                    "bucket_start": key[2],
+                    "unit": sample["unit"],
+                    "count": 1,
+                    "total": value,
+                    "minimum": value,
+                    "maximum": value,
+                }
+            else:
+                row["count"] += 1
+                row["total"] += value
+                row["minimum"] = min(row["minimum"], value)
+                row["maximum"] = max(row["maximum"], value)
+    if not buckets:
+        return
+
+    statement = insert(_rollup)
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[_rollup.c.resolution, _rollup.c.metric, _rollup.c.bucket_start],
+            set_={
+                "count": _rollup.c.count + statement.excluded.count,
+                "total": _rollup.c.total + statement.excluded.total,
+                "minimum": func.min(_rollup.c.minimum, statement.excluded.minimum),
+                "maximum": func.max(_rollup.c.maximum, statement.excluded.maximum),
+            },
+        ),
+        list(buckets.values()),
+    )
+
+
+def rebuild_tiers(session: Session) -> None:
+    """Recompute every ``MetricRollup`` bucket from the raw samples."""
+
+    session.execute(delete(_rollup))
+    for resolution, bucket in _BUCKET_EXPRESSIONS.items():
+        start = bucket(_samples.c.logged_at)
+        session.execute(
+            insert(_rollup).from_select(
+                ["resolution", "metric", "bucket_start", "unit", "count", "total", "minimum", "maximum"],
+                select(
+                    literal(resolution),
+                    _samples.c.metric,
+                    start,
+                    func.max(_samples.c.unit),
+                    func.count(),
+                    func.sum(_samples.c.value),
+                    func.min(_samples.c.value),
+                    func.max(_samples.c.value),
+                )
+                .where(_samples.c.athlete_id == DEFAULT_ATHLETE_ID)
+                .group_by(_samples.c.metric, start),
+            )
+        )
+
+
+def query_arrays(
+    session: Session,
+    metric: str,
+    start: datetime,
+    end: datetime,
+    resolution: timedelta,
+) -> SeriesArrays:
+    """Return ``metric`` between ``start`` and ``end`` as NumPy arrays.
+
+    Timestamps are converted by SQLite, so no ``datetime`` is built per row.
+    Raises ``ValueError`` if the metric has never been logged.
+    """
+
+    unit = session.execute(
+        select(_samples.c.unit).where(_samples.c.athlete_id == DEFAULT_ATHLETE_ID, _samples.c.metric == metric).limit(1)
+    ).scalar_one_or_none()
+    if unit is None:
+        raise ValueError(f"Metric {metric} not found")
+
+    tier = choose_tier(resolution)
+    if tier == RAW:
+        query = select(_epoch_seconds(_samples.c.logged_at), _samples.c.value).where(
+            _samples.c.athlete_id == DEFAULT_ATHLETE_ID,
+            _samples.c.metric == metric,
+            _samples.c.logged_at >= start,
+            _samples.c.logged_at < end,
+        ).order_by(_samples.c.logged_at)
+    else:
+        query = select(
+            _epoch_seconds(_rollup.c.bucket_start), _rollup.c.total / _rollup.c.count
+        ).where(
+            _rollup.c.resolution == tier,
+            _rollup.c.metric == metric,
+            _rollup.c.bucket_start >= bucket_start(start, tier),
+            _rollup.c.bucket_start < end,
+        ).order_by(_rollup.c.bucket_start)
+
+    # Read the DB-API rows directly: building a ``Row`` per sample costs more
+    # than the query itself on the raw tier.
+    result = session.connection().execute(query)
+    rows = result.cursor.fetchall()
+    result.close()
+    points = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=2 * len(rows)).reshape(-1, 2)
+    return SeriesArrays(unit, tier, points[:, 0], points[:, 1])
@@ -0,0 +1,161 @@
+"""Sliding day-window aggregates over date-ordered rows, in one pass.
+
+``rolling`` walks rows sorted by day once and keeps, for each field, a
+running count and sum, monotonic queues for the minimum and maximum and
+value counts for the mode. Rows enter the window when its end reaches their
+day and leave it in the same order once they fall behind its start, so
+every window of ``size`` days ending on each day of a range costs one
+addition and one removal per row. ``window`` is the single window covering
+a fixed range. The dashboard uses them for its load chart, the weekly
+progress and the recovery summary.
+"""
+from __future__ import annotations
+
+from collections import deque
+from datetime import date, timedelta
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Mapping, NamedTuple, Optional, Tuple, TypeVar
+
+Row = TypeVar("Row")
+
+
+class Stats(NamedTuple):
+    count: int  # values that were not None
+    sum: float
+    mean: Optional[float]
+    min: Any
+    max: Any
+    mode: Optional[Hashable]  # most frequent value, the most recent one on ties
+
+
+class Window(NamedTuple):
+    start: date
+    end: date
+    rows: int
+    days: int  # distinct days with at least one row
+    stats: Dict[str, Stats]
+
+
+class Aggregate:
+    """Statistics of the values of one field; values leave in the order they came in."""
+
+    __slots__ = ("count", "total", "_minima", "_maxima", "_counts", "_last_seen", "_added")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0
+        self._minima: Deque[Any] = deque()
+        self._maxima: Deque[Any] = deque()
+        self._counts: Dict[Hashable, int] = {}
+        self._last_seen: Dict[Hashable, int] = {}
+        self._added = 0
+
+    def add(self, value: Any) -> None:
+        if value is None:
+            return
+        self.count += 1
+        self._added += 1
+        if isinstance(value, (int, float)):
+            self.total += value
+            # Each queue keeps the values that can still become the minimum
+            # (maximum) once the older ones have left.
+            while self._minima and self._minima[-1] > value:
+                self._minima.pop()
+            self._minima.append(value)
+            while self._maxima and self._maxima[-1] < value:
+                self._maxima.pop()
+            self._maxima.append(value)
+        self._counts[value] = self._counts.get(value, 0) + 1
+        self._last_seen[value] = self._added
+
+    def remove(self, value: Any) -> None:
+        """Remove the oldest value still counted, which must be ``value``."""
+
+        if value is None:
+            return
+        self.count -= 1
+        if isinstance(value, (int, float)):
+            self.total -= value
+            if self._minima[0] == value:
+                self._minima.popleft()
+            if self._maxima[0] == value:
+                self._maxima.popleft()
+        self._counts[value] -= 1
+        if not self._counts[value]:
+            del self._counts[value]
+            del self._last_seen[value]
+
+    def stats(self) -> Stats:
+        mode = max(self._counts, key=lambda value: (self._counts[value], self._last_seen[value]), default=None)
+        return Stats(
+            count=self.count,
+            sum=self.total,
+            mean=self.total / self.count if self.count and self._minima else None,
+            min=self._minima[0] if self._minima else None,
+            max=self._maxima[0] if self._maxima else None,
+            mode=mode,
+        )
+
+
+def rolling(
+    rows: Iterable[Row],
+    day_of: Callable[[Row], date],
+    fields: Mapping[str, Callable[[Row], Any]],
+    start: date,
+    end: date,
+    size: int = 1,
+) -> List[Window]:
+    """Aggregate the ``size``-day window ending on each day from ``start`` to ``end``.
+
+    ``rows`` must be sorted by day, oldest first. ``fields`` maps each
+    statistic name to the function reading its value from a row; ``None``
+    values are skipped. Numeric fields get every statistic, others only the
+    count and the mode.
+    """
+
+    aggregates = {name: Aggregate() for name in fields}
+    inside: Deque[Tuple[date, Tuple[Any, ...]]] = deque()
+    days: Dict[date, int] = {}
+    pending = iter(rows)
+    upcoming = next(pending, None)
+    windows = []
+    for offset in range((end - start).days + 1):
+        last = start + timedelta(days=offset)
+        first = last - timedelta(days=size - 1)
+        while upcoming is not None and day_of(upcoming) <= last:
+            day = day_of(upcoming)
+            if day >= first:
+                values = tuple(read(upcoming) for read in fields.values())
+                inside.append((day, values))
+                days[day] = days.get(day, 0) + 1
+                for aggregate, value in zip(aggregates.values(), values):
+                    aggregate.add(value)
+            upcoming = next(pending, None)
+        while inside and inside[0][0] < first:
+            day, values = inside.popleft()
+            days[day] -= 1
+            if not days[day]:
+                del days[day]
+            for aggregate, value in zip(aggregates.values(), values):
+                aggregate.remove(value)
+        windows.append(
+            Window(
+                start=first,
+                end=last,
+                rows=len(inside),
+                days=len(days),
+                stats={name: aggregate.stats() for name, aggregate in aggregates.items()},
+            )
+        )
+    return windows
+
+
+def window(
+    rows: Iterable[Row],
+    day_of: Callable[[Row], date],
+    fields: Mapping[str, Callable[[Row], Any]],
+    start: date,
+    end: date,
+) -> Window:
+    """Aggregate the rows whose day falls between ``start`` and ``end`` inclusive."""
+
+    return rolling(rows, day_of, fields, end, end, size=(end - start).days + 1)[0]
@@ -2,7 +2,7 @@ import { useCallback, useEffect, useMemo, useState } from 'react';
 import dayjs from 'dayjs';
 import 'dayjs/locale/fr';
 import { CalendarMonth, DashboardSummary, Exercise, SessionSummary, Workout } from './types';
-import { fetchCalendar, fetchDashboard, fetchExercises, fetchRecentSessions, fetchWorkouts } from './services';
+import { fetchBootstrap, fetchCalendar, fetchDashboard, fetchRecentSessions } from './services';
 import { HeroHeader } from './components/HeroHeader';
 import { WorkoutGrid } from './components/WorkoutGrid';
 import { MetricsBoard } from './components/MetricsBoard';
@@ -37,19 +37,13 @@ export default function App() {
         setLoading(true);
         setError(null);
         const now = dayjs();
-        const [dashboardData, workoutData, calendarData, exerciseData, recentSessionData] = await Promise.all([
-          fetchDashboard(),
-          fetchWorkouts(),
-          fetchCalendar(now.month() + 1, now.year()),
-          fetchExercises(),
-          fetchRecentSessions()
-        ]);
+        const data = await fetchBootstrap(now.month() + 1, now.year());
         if (!active) return;
-        setDashboard(dashboardData);
-        setWorkouts(workoutData);
-        setCalendar(calendarData);
-        setExercises(exerciseData);
-        setRecentSessions(recentSessionData);
+        setDashboard(data.dashboard);
+        setWorkouts(data.workouts);
+        setCalendar(data.calendar);
+        setExercises(data.exercises);
+        setRecentSessions(data.recent_sessions);
       } catch (err) {
         if (active) {
           setError("Impossible de charger les données. Vérifie que l'API est démarrée.");
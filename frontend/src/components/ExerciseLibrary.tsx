@@ -1,11 +1,56 @@
+import { useEffect, useState } from 'react';
 import { Dumbbell, Play } from 'lucide-react';
+import { searchExercises } from '../services';
 import { Exercise } from '../types';
 
 type Props = {
   exercises: Exercise[];
 };
 
+const SEARCH_DELAY_MS = 250;
+
 export function ExerciseLibrary({ exercises }: Props) {
+  const [query, setQuery] = useState('');
+  const [results, setResults] = useState<Exercise[] | null>(null);
+  const [nextOffset, setNextOffset] = useState<number | null>(null);
+
+  useEffect(() => {
+    const q = query.trim();
+    if (!q) {
+      setResults(null);
+      setNextOffset(null);
+      return;
+    }
+    let active = true;
+    const timer = window.setTimeout(async () => {
+      try {
+        const page = await searchExercises(q);
+        if (!active) return;
+        setResults(page.items);
+        setNextOffset(page.next_offset);
+      } catch (err) {
+        console.error(err);
+      }
+    }, SEARCH_DELAY_MS);
+    return () => {
+      active = false;
+      window.clearTimeout(timer);
+    };
+  }, [query]);
+
+  const handleLoadMore = async () => {
+    if (nextOffset === null) return;
+    try {
+      const page = await searchExercises(query.trim(), nextOffset);
+      setResults((previous) => [...(previous ?? []), ...page.items]);
+      setNextOffset(page.next_offset);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
+  const visibleExercises = results ?? exercises;
+
   return (
     <section className="glass-panel flex flex-col gap-6 p-6 lg:p-8">
       <div className="flex flex-col gap-2">
@@ -16,9 +61,19 @@ export function ExerciseLibrary({ exercises }: Props) {
         <p className="text-sm text-slate-300">
           Comprends l'exécution et les points clés de chaque exercice pour gagner en efficacité et sécurité.
         </p>
+        <input
+          type="search"
+          value={query}
+          onChange={(event) => setQuery(event.target.value)}
+          placeholder="Rechercher : squat, épaules, haltères..."
+          className="rounded-2xl border border-white/10 bg-white/5 px-4 py-3 text-base text-white focus:border-[var(--accent-color)] focus:outline-none"
+        />
       </div>
+      {results !== null && results.length === 0 && (
+        <p className="text-sm text-slate-400">Aucun exercice ne correspond à « {query.trim()} ».</p>
+      )}
       <div className="grid grid-auto-fit gap-4">
-        {exercises.map((exercise) => (
+        {visibleExercises.map((exercise) => (
           <article key={exercise.id} className="rounded-3xl border border-white/10 bg-white/5 p-4 shadow-sm">
             <div className="flex items-start justify-between gap-3">
               <div>
@@ -47,6 +102,15 @@ export function ExerciseLibrary({ exercises }: Props) {
           </article>
         ))}
       </div>
+      {nextOffset !== null && (
+        <button
+          type="button"
+          onClick={handleLoadMore}
+          className="self-center rounded-full border border-white/10 bg-white/5 px-5 py-2 text-sm text-slate-200 hover:bg-white/10"
+        >
+          Plus de résultats
+        </button>
+      )}
     </section>
   );
 }
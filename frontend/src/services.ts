@@ -1,5 +1,13 @@
 import axios from 'axios';
-import { CalendarMonth, DashboardSummary, Workout, Exercise, SessionSummary } from './types';
+import {
+  Bootstrap,
+  CalendarMonth,
+  DashboardSummary,
+  Workout,
+  Exercise,
+  ExerciseSearchPage,
+  SessionSummary
+} from './types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL ?? '/api';
 
@@ -8,6 +16,13 @@ const client = axios.create({
   timeout: 10000
 });
 
+export async function fetchBootstrap(month: number, year: number, recentLimit = 5): Promise<Bootstrap> {
+  const { data } = await client.get<Bootstrap>('/bootstrap', {
+    params: { month, year, recent_limit: recentLimit }
+  });
+  return data;
+}
+
 export async function fetchDashboard(): Promise<DashboardSummary> {
   const { data } = await client.get<DashboardSummary>('/dashboard');
   return data;
@@ -40,6 +55,11 @@ export async function fetchExercises(): Promise<Exercise[]> {
   return data;
 }
 
+export async function searchExercises(q: string, offset = 0, limit = 20): Promise<ExerciseSearchPage> {
+  const { data } = await client.get<ExerciseSearchPage>('/exercises/search', { params: { q, offset, limit } });
+  return data;
+}
+
 export async function fetchRecentSessions(limit = 5): Promise<SessionSummary[]> {
   const { data } = await client.get<SessionSummary[]>('/sessions/recent', { params: { limit } });
   return data;
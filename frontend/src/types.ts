@@ -9,6 +9,11 @@ export interface Exercise {
   video_url?: string | null;
 }
 
+export interface ExerciseSearchPage {
+  items: Exercise[];
+  next_offset: number | null;
+}
+
 export interface WorkoutExercise {
   exercise: Exercise;
   sets: number;
@@ -80,6 +85,7 @@ export interface DashboardSummary {
   metrics: TrendMetric[];
   weekly_progress: WeeklyProgress;
   training_streak_days: number;
+  longest_streak_days: number;
   weekly_training_load: TrainingLoadPoint[];
   recovery_summary: RecoverySummary;
 }
@@ -151,3 +157,11 @@ export interface UserPreferences {
   customFocus: CustomFocus;
   goals: Goal[];
 }
+
+export interface Bootstrap {
+  dashboard: DashboardSummary;
+  workouts: Workout[];
+  calendar: CalendarMonth;
+  exercises: Exercise[];
+  recent_sessions: SessionSummary[];
+}